@@ -1,19 +1,39 @@
-from fastapi import APIRouter, Depends, Query
-from sqlalchemy.ext.asyncio import AsyncSession
+from fastapi import APIRouter, HTTPException, Query
 from typing import Optional
 from datetime import datetime, timedelta
-from app.core.database import get_db
+# from app.core.database import get_db
 
 router = APIRouter()
 
 
-@router.get("/dashboard/{repo_id}")
+@router.get("/dashboard/{repo_id:path}")
 async def get_dashboard_metrics(
     repo_id: str,
-    db: AsyncSession = Depends(get_db)
+    token: Optional[str] = Query(None, description="GitHub access token"),
+    # db=Depends(get_db)
 ):
     """Get dashboard metrics for a repository"""
-    # TODO: Get repository analytics
+    from app.services.analysis.metrics_calculator import MetricsCalculator
+    from app.services.git.git_service import GitService
+    
+    if '/' not in repo_id:
+        raise HTTPException(
+            status_code=400,
+            detail="Repository must be in format 'owner/repository'"
+        )
+    
+    git_service = GitService()
+    calculator = MetricsCalculator()
+    
+    try:
+        repo_path = await git_service.clone_or_update_repo(repo_id, access_token=token)
+        # Unchanged blobs come from the parse cache, so this is cheap after the first visit
+        table = await calculator.calculate_repository(repo_path)
+        health = calculator.aggregate_metrics(table)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    
+    # TODO: Get the remaining repository analytics
     return {
         "repository_id": repo_id,
         "metrics": {
@@ -28,10 +48,11 @@ async def get_dashboard_metrics(
                 "new_last_month": 0
             },
             "code_health": {
-                "score": 0.0,
+                "score": health["code_health"],
                 "test_coverage": 0.0,
-                "code_complexity": 0.0,
-                "technical_debt": 0.0
+                "code_complexity": health["average_complexity"],
+                "maintainability": health["overall_maintainability"],
+                "technical_debt": health["technical_debt_hours"]
             },
             "activity": {
                 "last_commit": None,
@@ -43,30 +64,114 @@ async def get_dashboard_metrics(
     }
 
 
-@router.get("/trends/{repo_id}")
+@router.get("/trends/{repo_id:path}")
 async def get_repository_trends(
     repo_id: str,
     period: str = Query("30d", regex="^(7d|30d|90d|1y|all)$"),
-    db: AsyncSession = Depends(get_db)
+    top: int = Query(10, ge=1, le=100, description="Number of most-churned files"),
+    token: Optional[str] = Query(None, description="GitHub access token")
 ):
     """Get repository trends over time"""
-    # TODO: Calculate trends based on period
+    import asyncio
+    from app.services.git.churn_matrix import ChurnMatrix
+    from app.services.git.git_service import GitService
+    
+    if '/' not in repo_id:
+        raise HTTPException(
+            status_code=400,
+            detail="Repository must be in format 'owner/repository'"
+        )
+    
+    git_service = GitService()
+    
+    try:
+        repo_path = await git_service.clone_or_update_repo(repo_id, access_token=token)
+        # One numstat walk over the period, bucketed per day, week or month
+        matrix = await asyncio.to_thread(ChurnMatrix.for_period, repo_path, period)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    
+    buckets = matrix.bucket_totals()
     return {
         "repository_id": repo_id,
         "period": period,
+        "bucket_seconds": matrix.bucket_seconds,
         "trends": {
-            "commits": [],
-            "contributors": [],
-            "languages": [],
-            "file_changes": []
+            "commits": [{"date": b["date"], "count": b["commits"]} for b in buckets],
+            "contributors": [{"date": b["date"], "count": b["authors"]} for b in buckets],
+            "languages": matrix.totals_by_extension(),
+            "file_changes": [
+                {
+                    "date": b["date"],
+                    "files_changed": b["files_changed"],
+                    "additions": b["additions"],
+                    "deletions": b["deletions"]
+                }
+                for b in buckets
+            ],
+            "top_files": matrix.top_files(top)
         }
     }
 
 
+@router.get("/quality-trends/{repo_id:path}")
+async def get_quality_trends(
+    repo_id: str,
+    period: str = Query("1y", regex="^(7d|30d|90d|1y|all)$"),
+    sample: str = Query("period", regex="^(period|commits|tags)$", description="One point per day/week/month of the period, every Nth commit, or per tag"),
+    every: int = Query(10, ge=1, description="Commits between points when sampling commits"),
+    points: int = Query(52, ge=1, le=200, description="Maximum number of points"),
+    token: Optional[str] = Query(None, description="GitHub access token")
+):
+    """Get code quality and technical debt over time"""
+    import asyncio
+    import time
+    from app.services.analysis.metrics_calculator import MetricsCalculator
+    from app.services.git.churn_matrix import PERIODS
+    from app.services.git.commit_sampler import CommitSampler
+    from app.services.git.git_service import GitService
+    
+    if '/' not in repo_id:
+        raise HTTPException(
+            status_code=400,
+            detail="Repository must be in format 'owner/repository'"
+        )
+    
+    git_service = GitService()
+    calculator = MetricsCalculator()
+    
+    try:
+        repo_path = await git_service.clone_or_update_repo(repo_id, access_token=token)
+        sampler = CommitSampler(repo_path)
+        if sample == "tags":
+            samples = await asyncio.to_thread(sampler.tags, points)
+        elif sample == "commits":
+            samples = await asyncio.to_thread(sampler.every, every, "HEAD", points)
+        else:
+            # Same buckets as the churn trends: days for short periods, weeks for a year
+            lookback, bucket_seconds = PERIODS[period]
+            since = int(time.time()) - lookback if lookback else None
+            samples = await asyncio.to_thread(sampler.per_period, bucket_seconds, "HEAD", points, since)
+        # Each distinct blob is measured once across all points
+        history = await calculator.calculate_history(repo_path, samples)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    
+    return {
+        "repository_id": repo_id,
+        "period": period,
+        "sample": sample,
+        "points": history,
+        "technical_debt": calculator.debt_trend(history, repo_id, period)
+    }
+
+
 @router.get("/insights/{repo_id}")
 async def get_ai_insights(
     repo_id: str,
-    db: AsyncSession = Depends(get_db)
+    # db=Depends(get_db)
 ):
     """Get AI-powered insights for repository"""
     # TODO: Get cached insights or generate new ones
@@ -85,7 +190,7 @@ async def get_ai_insights(
 @router.get("/team/{repo_id}")
 async def get_team_analytics(
     repo_id: str,
-    db: AsyncSession = Depends(get_db)
+    # db=Depends(get_db)
 ):
     """Get team analytics for repository"""
     # TODO: Calculate team metrics
@@ -103,7 +208,7 @@ async def get_team_analytics(
 @router.get("/health/{repo_id}")
 async def get_code_health_metrics(
     repo_id: str,
-    db: AsyncSession = Depends(get_db)
+    # db=Depends(get_db)
 ):
     """Get detailed code health metrics"""
     # TODO: Calculate code health metrics
@@ -3,12 +3,15 @@ Quality API
 Handles endpoints related to code quality analysis.
 """
 
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Query
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
 from typing import List, Optional
 from datetime import datetime
+import json
 
 from ..services.analysis.code_quality_analyzer import CodeQualityAnalyzer
-# from ..models.quality_models import QualityReport, QualityMetrics
+from ..models.quality_models import CodeQualityMetric, CodeQualityReport
 from ..services.git.git_service import GitService
 # from ..core.database import get_db
 
@@ -17,32 +20,59 @@ router = APIRouter()
 @router.post("/analyze")
 async def analyze_quality(
     repo_name: str,
-    branch: Optional[str] = "main",
+    branch: Optional[str] = Query(None, description="Branch or revision, defaults to the default branch"),
+    time_budget: Optional[float] = Query(None, gt=0, le=600, description="Seconds for the whole run"),
+    stream: bool = Query(False, description="Stream newline-delimited JSON, one line per file, then the report"),
+    token: Optional[str] = Query(None, description="GitHub access token"),
     # db=Depends(get_db)
 ):
     """Run code quality analysis on a repository."""
+    analyzer = CodeQualityAnalyzer()
+    git_service = GitService()
+    
     try:
-        analyzer = CodeQualityAnalyzer()
-        git_service = GitService()
-        
         # Clone or update repository
-        repo_path = await git_service.clone_or_update_repo(repo_name)
+        repo_path = await git_service.clone_or_update_repo(repo_name, access_token=token)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    
+    rev = branch or "HEAD"
+    if stream:
+        async def lines():
+            try:
+                async for item in analyzer.stream(repo_path, repo_name, rev, time_budget=time_budget):
+                    if isinstance(item, CodeQualityReport):
+                        record = {"type": "report", **item.dict(exclude={"quality_metrics", "skipped_files"})}
+                    elif isinstance(item, CodeQualityMetric):
+                        record = {"type": "file", **item.dict()}
+                    else:
+                        record = {"type": "skipped", **item.dict()}
+                    yield json.dumps(jsonable_encoder(record)) + "\n"
+            except Exception as e:
+                # Headers are already sent, so failures become the last line
+                yield json.dumps({"type": "error", "detail": str(e)}) + "\n"
         
+        return StreamingResponse(lines(), media_type="application/x-ndjson")
+    
+    try:
         # Run quality analysis
-        report = await analyzer.analyze_repository(repo_path)
-        
-        # Save report to database
-# Database save to be implemented later
-        
-        return {
-            "status": "success",
-            "message": "Code quality analysis completed",
-            "report_id": report.id,
-            "issues_found": len(report.issues),
-            "technical_debt": report.technical_debt
-        }
+        report = await analyzer.analyze_repository(repo_path, repo_name, rev, time_budget=time_budget)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+    
+    # Save report to database
+# Database save to be implemented later
+    
+    return {
+        "status": "success" if report.complete else "partial",
+        "message": "Code quality analysis completed" if report.complete
+        else "Time budget ran out; files not reached are listed as skipped",
+        "issues_found": report.total_issues,
+        "technical_debt": report.technical_debt_hours,
+        "report": report
+    }
 
 @router.get("/metrics")
 async def get_quality_metrics(
@@ -5,6 +5,21 @@ import base64
 router = APIRouter()
 
 
+def decode_token(token: Optional[str]) -> Optional[str]:
+    """Unwrap a base64-encoded GitHub token; anything else is used as is"""
+    if not token:
+        return token
+    try:
+        decoded_token = base64.b64decode(token).decode('utf-8')
+        # Check if it looks like a GitHub token
+        if decoded_token.startswith(('gho_', 'ghp_')):
+            return decoded_token
+    except Exception:
+        # If decoding fails, use token as is
+        pass
+    return token
+
+
 @router.get("/")
 async def list_repositories(
     token: str = Query(..., description="GitHub access token"),
@@ -15,15 +30,7 @@ async def list_repositories(
     """List user's repositories from GitHub"""
     import httpx
     
-    # Decode token if it's base64 encoded
-    try:
-        decoded_token = base64.b64decode(token).decode('utf-8')
-        # Check if it looks like a GitHub token
-        if decoded_token.startswith(('gho_', 'ghp_')):
-            token = decoded_token
-    except:
-        # If decoding fails, use token as is
-        pass
+    token = decode_token(token)
     
     headers = {
         "Authorization": f"Bearer {token}",
@@ -97,15 +104,7 @@ async def analyze_repository(
     """Trigger repository analysis"""
     from app.services.analysis.analyzer import RepositoryAnalyzer
     
-    # Decode token if it's base64 encoded
-    try:
-        decoded_token = base64.b64decode(token).decode('utf-8')
-        # Check if it looks like a GitHub token
-        if decoded_token.startswith(('gho_', 'ghp_')):
-            token = decoded_token
-    except:
-        # If decoding fails, use token as is
-        pass
+    token = decode_token(token)
     
     # Combine owner and name to get full repository path
     repo_full_name = f"{repo_owner}/{repo_name}"
@@ -125,17 +124,141 @@ async def analyze_repository(
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@router.get("/{repo_id}/commits")
+@router.get("/{repo_id:path}/commits")
 async def get_repository_commits(
     repo_id: str,
     skip: int = Query(0, ge=0),
-    limit: int = Query(50, ge=1, le=200)
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = Query(None, description="Cursor from the previous page"),
+    token: Optional[str] = Query(None, description="GitHub access token")
 ):
-    """Get repository commits"""
-    # TODO: Get commits from database or GitHub
+    """Get repository commits, one cursor-paginated page at a time"""
+    import asyncio
+    from app.services.git.git_service import GitService
+    
+    if '/' not in repo_id:
+        raise HTTPException(
+            status_code=400,
+            detail="Repository must be in format 'owner/repository'"
+        )
+    
+    token = decode_token(token)
+    
+    git_service = GitService()
+    
+    try:
+        # Only the first page fetches; later pages read the pinned history from the mirror
+        repo_path = git_service.cached_mirror(repo_id) if cursor else None
+        if repo_path is None:
+            repo_path = await git_service.clone_or_update_repo(repo_id, access_token=token)
+        
+        page = await asyncio.to_thread(
+            git_service.get_commit_page, repo_path, cursor=cursor, limit=limit, skip=skip
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    
     return {
-        "commits": [],
-        "total": 0,
+        "commits": page["commits"],
+        "next_cursor": page["next_cursor"],
+        "has_more": page["has_more"],
+        "total_commits": page["total_commits"],
         "skip": skip,
         "limit": limit
     }
+
+
+@router.get("/{repo_id:path}/diffs")
+async def get_repository_diffs(
+    repo_id: str,
+    ranges: List[str] = Query(..., description="Ranges to compare, as 'A..B' (e.g. v1.0..v1.1)"),
+    hunks: bool = Query(False, description="Include per-hunk line ranges"),
+    token: Optional[str] = Query(None, description="GitHub access token")
+):
+    """Summarize the changes in many commit ranges at once, e.g. for release notes"""
+    import asyncio
+    from app.services.git.diff_analyzer import DiffAnalyzer
+    from app.services.git.git_service import GitService
+    
+    if '/' not in repo_id:
+        raise HTTPException(
+            status_code=400,
+            detail="Repository must be in format 'owner/repository'"
+        )
+    
+    pairs = []
+    for commit_range in ranges:
+        commit_a, separator, commit_b = commit_range.partition('..')
+        if not separator or not commit_a or not commit_b or commit_b.startswith('.'):
+            raise HTTPException(status_code=400, detail=f"Invalid range: {commit_range}")
+        pairs.append((commit_a, commit_b))
+    
+    token = decode_token(token)
+    
+    git_service = GitService()
+    
+    try:
+        repo_path = await git_service.clone_or_update_repo(repo_id, access_token=token)
+        results = await asyncio.to_thread(DiffAnalyzer.analyze_pairs, repo_path, pairs, hunks)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    
+    return {"diffs": results}
+
+
+@router.get("/{repo_id:path}/symbols")
+async def get_repository_symbols(
+    repo_id: str,
+    name: Optional[str] = Query(None, description="Find where this name is defined, e.g. 'parse' or 'CodeParser.parse'"),
+    module: Optional[str] = Query(None, description="Find the files importing this module or its submodules"),
+    path: Optional[str] = Query(None, description="List the definitions and imports of this file"),
+    rev: str = Query("HEAD", description="Revision to index"),
+    refresh: bool = Query(False, description="Fetch the repository and update the index first"),
+    limit: int = Query(100, ge=1, le=1000),
+    token: Optional[str] = Query(None, description="GitHub access token")
+):
+    """Query the symbol and import index, building or updating it when needed"""
+    import asyncio
+    from app.services.git.git_service import GitService
+    from app.services.git.symbol_index import get_symbol_index
+    
+    if '/' not in repo_id:
+        raise HTTPException(
+            status_code=400,
+            detail="Repository must be in format 'owner/repository'"
+        )
+    if sum(value is not None for value in (name, module, path)) != 1:
+        raise HTTPException(status_code=400, detail="Give exactly one of name, module or path")
+    
+    token = decode_token(token)
+    
+    index = get_symbol_index()
+    
+    try:
+        status = await asyncio.to_thread(index.status, repo_id)
+        # Queries are served from the index as is; only a refresh or a new revision fetches
+        if refresh or status is None or status["rev"] != rev:
+            git_service = GitService()
+            repo_path = await git_service.clone_or_update_repo(repo_id, access_token=token)
+            await index.update(repo_id, repo_path, rev)
+            status = await asyncio.to_thread(index.status, repo_id)
+        
+        if name is not None:
+            results = await asyncio.to_thread(index.definitions, repo_id, name, limit)
+        elif module is not None:
+            results = await asyncio.to_thread(index.importers, repo_id, module, limit)
+        else:
+            results = await asyncio.to_thread(index.file_symbols, repo_id, path)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    
+    return {
+        "results": results,
+        "commit": status["commit"],
+        "indexed_files": status["files"],
+        "failed_files": status["failed"]
+    }
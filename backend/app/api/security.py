@@ -45,20 +45,15 @@ async def analyze_security(
         if authorization and authorization.startswith("Bearer "):
             token = authorization.replace("Bearer ", "")
         
-        # Clone with token if provided
-        repo_path = git_service.clone_repository(repo_url, access_token=token)
+        # Update the cached mirror; the analyzer reads it directly, without a checkout
+        repo_path = await git_service.clone_or_update_repo(repo_name, access_token=token)
+        rev = branch if branch and git_service.resolve_revision(repo_path, branch) else "HEAD"
         
         # Run security analysis
-        report = await security_analyzer.analyze_repository(repo_path)
+        report = await security_analyzer.analyze_repository(repo_path, rev=rev)
         
         # Save vulnerabilities to in-memory storage
         await security_analyzer.save_vulnerabilities(repo_name, report.vulnerabilities)
-
-        # Clean up the cloned repository
-        try:
-            git_service.cleanup(repo_path)
-        except:
-            pass  # Ignore cleanup errors
         
         return {
             "status": "success",
@@ -53,6 +53,22 @@ class Settings(BaseSettings):
     MAX_COMMITS_TO_ANALYZE: int = 1000
     MAX_FILE_SIZE_MB: int = 10
     ANALYSIS_CACHE_TTL_SECONDS: int = 3600  # 1 hour
+    REPO_CACHE_DIR: Optional[str] = None  # Bare mirrors; defaults to <tempdir>/reposcope-cache
+    REPO_CACHE_DISK_BUDGET_MB: int = 20480  # Mirrors plus the parse cache and symbol index stored beside them
+    REPO_CACHE_EVICT_GRACE_SECONDS: float = 300.0  # Mirrors used this recently are never evicted
+    WORKSPACE_DIR: Optional[str] = None  # Clones and worktrees; defaults to <tempdir>
+    WORKSPACE_DISK_BUDGET_MB: int = 5120
+    BLOB_READER_REPOS: int = 16  # Repositories with live cat-file processes; the least recently used are closed
+    BLOB_READER_IDLE_SECONDS: float = 300.0  # Close a repository's cat-file processes after this long unused
+    DIFF_BATCH_WORKERS: int = 4  # Concurrent git diff processes per batch request
+    DIFF_CACHE_ENTRIES: int = 1024  # Diff summaries cached by tree pair
+    PARSE_WORKERS: Optional[int] = None  # Code parsing processes; defaults to the CPU count
+    PARSE_TIMEOUT_SECONDS: float = 10.0  # Per-file parse limit
+    PARSE_CACHE_PATH: Optional[str] = None  # Parse results by blob SHA; defaults to <REPO_CACHE_DIR>/parse-cache.sqlite3
+    PARSE_CACHE_MB: int = 256
+    QUALITY_TIME_BUDGET_SECONDS: float = 60.0  # Per quality analysis; files not reached in time are reported as skipped
+    QUALITY_FILE_TIMEOUT_SECONDS: float = 2.0  # Per-file limit during quality analysis
+    SYMBOL_INDEX_PATH: Optional[str] = None  # Definitions and imports per repository; defaults to <REPO_CACHE_DIR>/symbol-index.sqlite3
     
     # AI Configuration
     GEMINI_MODEL: str = "gemini-2.0-flash"
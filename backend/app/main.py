@@ -3,10 +3,12 @@ from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
 import logging
 from app.core.config import settings
+from app.services.git.mirror_cache import MirrorCache
+from app.services.git.workspace_manager import get_workspace_manager
 from app.api import auth, repositories
-from app.api import dependencies, insights, performance, quality, security
+from app.api import analytics, dependencies, insights, performance, quality, security
 # Temporarily disabled due to SQLAlchemy/Python 3.13 compatibility issues
-# from app.api import analytics, projects
+# from app.api import projects
 # Commented out due to Python 3.13 compatibility issues
 # from app.core.database import engine
 # from app.models.base import BaseModel
@@ -22,6 +24,9 @@ async def lifespan(app: FastAPI):
     """Handle application startup and shutdown events"""
     # Startup
     logger.info("Starting up RepoScope API...")
+    # Remove clones and worktrees leaked by a previous crash
+    get_workspace_manager().sweep_orphans()
+    MirrorCache().prune_worktrees()
     yield
     # Shutdown
     logger.info("Shutting down RepoScope API...")
@@ -49,8 +54,8 @@ app.add_middleware(
 # Include routers
 app.include_router(auth.router, prefix="/api/auth", tags=["Authentication"])
 app.include_router(repositories.router, prefix="/api/repositories", tags=["Repositories"])
+app.include_router(analytics.router, prefix="/api/analytics", tags=["Analytics"])
 # Temporarily disabled due to SQLAlchemy/Python 3.13 compatibility issues
-# app.include_router(analytics.router, prefix="/api/analytics", tags=["Analytics"])
 # app.include_router(projects.router, prefix="/api/projects", tags=["Projects"])
 
 # Advanced Analytics routers
@@ -80,6 +85,12 @@ async def health_check():
     }
 
 
+@app.get("/metrics/workspaces")
+async def workspace_metrics():
+    """Disk occupancy and reuse of repository workspaces"""
+    return get_workspace_manager().metrics()
+
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(
@@ -1,7 +1,7 @@
 """
 Code Quality Models - Data structures for code quality analysis
 """
-from typing import List, Dict, Optional
+from typing import Any, List, Dict, Optional
 from pydantic import BaseModel, Field
 from datetime import datetime
 
@@ -16,16 +16,33 @@ class CodeQualityMetric(BaseModel):
     issues_identified: List[str] = Field(default_factory=list)
 
 
+class SkippedFile(BaseModel):
+    """A file left out of a quality report"""
+    file_path: str
+    reason: str  # "generated", "too_large", "binary", "missing", "file_budget", "run_budget"
+
+
 class CodeQualityReport(BaseModel):
     """Complete code quality report for a repository"""
     repository_url: str
     analyzed_at: datetime
+    commit: Optional[str] = None
     quality_metrics: List[CodeQualityMetric] = Field(default_factory=list)
+    skipped_files: List[SkippedFile] = Field(default_factory=list)
+    excluded_files: int = 0  # Vendored or generated by path, never read
+    complete: bool = True  # False if the run budget ran out before every file was analyzed
+    duration_seconds: float = 0.0
     total_files_analyzed: int = 0
+    total_issues: int = 0
+    technical_debt_hours: float = 0.0
+    summary: Dict[str, Any] = Field(default_factory=dict)  # MetricsTable.summary of the analyzed files
     
     def calculate_overall_stats(self):
         """Consolidate stats from quality metrics"""
         self.total_files_analyzed = len(self.quality_metrics)
+        self.total_issues = sum(len(metric.issues_identified) for metric in self.quality_metrics)
+        self.technical_debt_hours = round(sum(metric.technical_debt_hours for metric in self.quality_metrics), 1)
+        self.complete = not any(skipped.reason == "run_budget" for skipped in self.skipped_files)
 
 
 class TechnicalDebtTrend(BaseModel):
@@ -37,14 +37,14 @@ class RepositoryAnalyzer:
         logger.info(f"Starting analysis {analysis_id} for {repo_url}")
         
         try:
-            # Step 1: Clone repository
-            logger.info("Step 1: Cloning repository...")
-            repo_path = self.git_service.clone_repository(repo_url, access_token)
+            # Step 1: Clone repository, or fetch into the cached mirror
+            logger.info("Step 1: Updating repository mirror...")
+            repo_path = self.git_service.update_mirror(repo_url, access_token)
             
             # Step 2: Extract git data
             logger.info("Step 2: Extracting git history...")
             commits = self.git_service.get_commit_history(repo_path, limit=100)
-            repo_stats = self.git_service.get_repository_stats(repo_path)
+            repo_stats = self.git_service.get_repository_stats(repo_path, incremental=True)
             
             # Step 3: AI analysis of commits
             logger.info("Step 3: Analyzing commit patterns with AI...")
@@ -112,9 +112,6 @@ class RepositoryAnalyzer:
                 'recent_commits': [{'sha': c['sha'], 'author': c['author'], 'date': c['date'], 'message': c['message'], 'additions': c['additions'], 'deletions': c['deletions']} for c in commits[:10]]
             }
             
-            # Cleanup
-            self.git_service.cleanup(repo_path)
-            
             logger.info(f"Analysis {analysis_id} completed successfully")
             return results
             
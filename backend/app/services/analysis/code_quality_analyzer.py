@@ -2,10 +2,49 @@
 Code Quality Analyzer
 Evaluates code quality through various metrics: cyclomatic complexity, maintainability index, etc.
 """
+import asyncio
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, Iterable, Optional, Union
+from app.core.config import settings
+from app.models.quality_models import CodeQualityMetric, CodeQualityReport, SkippedFile
+from app.services.analysis.metrics_calculator import (
+    RATING_THRESHOLDS,
+    REMEDIATION_MINUTES_PER_LINE,
+    MetricsTable,
+    halstead_measures,
+    maintainability_index,
+)
+from app.services.git.code_lint import RULES
+from app.services.git.code_parser import CodeParser
+from app.services.git.tree_reader import TreeReader
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Directories holding other projects' code, never analyzed
+VENDORED_DIRS = frozenset({
+    'node_modules', 'bower_components', 'jspm_packages', 'vendor', 'vendors', '_vendor',
+    'third_party', 'third-party', 'thirdparty', 'site-packages', '.venv', 'venv', 'dist',
+})
+# File names build tools and code generators produce
+GENERATED_SUFFIXES = (
+    '.min.js', '-min.js', '.bundle.js', '.generated.ts', '.d.ts', '_pb2.py', '_pb2_grpc.py', '.pb.cc', '.pb.h',
+)
+
+# File-level limits; complexity is summed over a file's functions
+COMPLEXITY_LIMIT = 50
+SOURCE_LINES_LIMIT = 1000
+
+# Reasons parse results give for not parsing a file
+PARSE_SKIPS = ('too_large', 'binary', 'missing')
+
 
 class CodeQualityAnalyzer:
     def __init__(self):
-        pass  # Initialize quality checker tools like PyLint, flake8, etc.
+        # Linting and metrics come from one parse per file on the shared worker pool
+        self.parser = CodeParser()
 
     def analyze(self, repo_path: str):
         """
@@ -14,9 +53,180 @@ class CodeQualityAnalyzer:
         :param repo_path: Path to the local clone of the repository
         :return: Dictionary containing code quality analysis results
         """
-        # Placeholder for code quality logic
-        # Tools like Radon (for cyclomatic complexity), Pylint, flake8 can be integrated
-
+        report = asyncio.run(self.analyze_repository(repo_path))
         return {
-            "quality_metrics": []
+            "quality_metrics": [metric.dict() for metric in report.quality_metrics]
         }
+
+    async def analyze_repository(
+        self,
+        repo_path: str,
+        repository_url: Optional[str] = None,
+        rev: str = 'HEAD',
+        time_budget: Optional[float] = None,
+        file_timeout: Optional[float] = None,
+        exclude: Iterable[str] = ()
+    ) -> CodeQualityReport:
+        """
+        Analyze every supported file of a revision within a time budget.
+
+        :param repo_path: Path to repository, bare mirrors work
+        :param repository_url: URL recorded in the report, defaults to repo_path
+        :param rev: Revision to analyze
+        :param time_budget: Seconds for the whole run, defaults to QUALITY_TIME_BUDGET_SECONDS
+        :param file_timeout: Seconds per file, defaults to QUALITY_FILE_TIMEOUT_SECONDS
+        :param exclude: Extra directory names or path prefixes to leave out
+        :return: CodeQualityReport; files not reached in time are listed as skipped for run_budget
+        """
+        report = None
+        async for item in self.stream(repo_path, repository_url, rev, time_budget, file_timeout, exclude):
+            report = item
+        return report
+
+    async def stream(
+        self,
+        repo_path: str,
+        repository_url: Optional[str] = None,
+        rev: str = 'HEAD',
+        time_budget: Optional[float] = None,
+        file_timeout: Optional[float] = None,
+        exclude: Iterable[str] = ()
+    ) -> AsyncIterator[Union[CodeQualityMetric, SkippedFile, CodeQualityReport]]:
+        """
+        Analyze a revision, yielding each file's result as soon as it is known.
+
+        Files are parsed and linted on the shared process pool, served from the parse
+        cache when their blob was seen before. Each file gets file_timeout seconds;
+        when the run's time_budget is spent, chunks not yet started are cancelled,
+        running ones stop at the same deadline, and the remaining files are reported
+        as skipped.
+
+        :param repo_path: Path to repository, bare mirrors work
+        :param repository_url: URL recorded in the report, defaults to repo_path
+        :param rev: Revision to analyze
+        :param time_budget: Seconds for the whole run, defaults to QUALITY_TIME_BUDGET_SECONDS
+        :param file_timeout: Seconds per file, defaults to QUALITY_FILE_TIMEOUT_SECONDS
+        :param exclude: Extra directory names or path prefixes to leave out
+        :return: Async iterator of CodeQualityMetric and SkippedFile items, in completion
+                 order, then the finished CodeQualityReport
+        """
+        loop = asyncio.get_running_loop()
+        started = time.perf_counter()
+        if time_budget is None:
+            time_budget = settings.QUALITY_TIME_BUDGET_SECONDS
+        deadline = loop.time() + time_budget
+        if file_timeout is None:
+            file_timeout = settings.QUALITY_FILE_TIMEOUT_SECONDS
+        repository_url = repository_url or repo_path
+        exclude = tuple(exclude)
+
+        commit = await asyncio.to_thread(TreeReader.resolve_commit, repo_path, rev)
+        listing = await asyncio.to_thread(TreeReader(repo_path, commit).list_files)
+        report = CodeQualityReport(repository_url=repository_url, analyzed_at=datetime.now(timezone.utc), commit=commit)
+        waiting: Dict[str, str] = {}
+        for entry in listing:
+            path = entry['path']
+            if Path(path).suffix.lower() not in self.parser.language_parsers:
+                continue
+            if is_excluded(path, exclude):
+                report.excluded_files += 1
+            else:
+                waiting[path] = entry['sha']
+
+        measured = []
+        # Workers compare against the wall clock, so they get the deadline as Unix time
+        results = self.parser.parse_blobs(
+            repo_path, list(waiting.items()), timeout=file_timeout,
+            deadline=time.time() + (deadline - loop.time())
+        )
+        try:
+            while waiting:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    result = await asyncio.wait_for(results.__anext__(), remaining)
+                except (StopAsyncIteration, asyncio.TimeoutError):
+                    break
+                del waiting[result['path']]
+                item = self._assess(result, repository_url)
+                if isinstance(item, SkippedFile):
+                    report.skipped_files.append(item)
+                else:
+                    report.quality_metrics.append(item)
+                    measured.append(result)
+                yield item
+        finally:
+            # Cancels the chunks still queued on the pool
+            await results.aclose()
+
+        for path in waiting:
+            item = SkippedFile(file_path=path, reason='run_budget')
+            report.skipped_files.append(item)
+            yield item
+
+        report.summary = MetricsTable.from_results(measured, commit=commit).summary()
+        report.duration_seconds = round(time.perf_counter() - started, 2)
+        report.calculate_overall_stats()
+        logger.info(
+            f"Quality of {repository_url} at {commit[:12]}: {report.total_files_analyzed} files analyzed, "
+            f"{len(report.skipped_files)} skipped, {report.excluded_files} excluded in {report.duration_seconds}s"
+        )
+        yield report
+
+    def _assess(self, result: Dict[str, Any], repository_url: str) -> Union[CodeQualityMetric, SkippedFile]:
+        """Run the metric checks on one parse result and collect its lint findings"""
+        path = result['path']
+        if result.get('timed_out'):
+            return SkippedFile(file_path=path, reason='file_budget')
+        if result.get('skipped') == 'deadline':
+            # A worker got to it only after the run's time was up
+            return SkippedFile(file_path=path, reason='run_budget')
+        if result.get('skipped') in PARSE_SKIPS:
+            return SkippedFile(file_path=path, reason=result['skipped'])
+        if result.get('generated'):
+            return SkippedFile(file_path=path, reason='generated')
+
+        issues = []
+        metrics = result.get('metrics')
+        complexity = result.get('complexity', 0)
+        maintainability = 0.0
+        debt_hours = 0.0
+        if metrics is None:
+            issues.append(f"syntax_error: {result.get('error', 'could not be parsed')}")
+        else:
+            source_lines = metrics['source_lines']
+            volume = halstead_measures(metrics['halstead'])['volume']
+            maintainability = float(maintainability_index(volume, complexity, source_lines))
+            # Rated before rounding, as MetricsTable does, so the debt adds up to its summary
+            rating = sum(maintainability >= threshold for threshold in RATING_THRESHOLDS)
+            maintainability = round(maintainability, 2)
+            debt_hours = round(source_lines * REMEDIATION_MINUTES_PER_LINE[rating] / 60, 2)
+            if maintainability < RATING_THRESHOLDS[0]:
+                issues.append(f"low_maintainability: maintainability index {maintainability} (below {RATING_THRESHOLDS[0]})")
+            if complexity > COMPLEXITY_LIMIT:
+                issues.append(f"high_complexity: cyclomatic complexity {complexity} (limit {COMPLEXITY_LIMIT})")
+            if source_lines > SOURCE_LINES_LIMIT:
+                issues.append(f"large_file: {source_lines} source lines (limit {SOURCE_LINES_LIMIT})")
+        for rule, (count, line) in sorted(result.get('lint', {}).items()):
+            issues.append(f"{rule}: {RULES[rule]} ({count}, first at line {line})")
+
+        return CodeQualityMetric(
+            file_path=path,
+            repository_url=repository_url,
+            cyclomatic_complexity=complexity,
+            maintainability_index=maintainability,
+            technical_debt_hours=debt_hours,
+            issues_identified=issues
+        )
+
+
+def is_excluded(path: str, exclude: Iterable[str] = ()) -> bool:
+    """Whether a path is vendored or generated by its name, or under an extra exclusion"""
+    if path.endswith(GENERATED_SUFFIXES):
+        return True
+    parts = path.split('/')
+    if not VENDORED_DIRS.isdisjoint(parts[:-1]):
+        return True
+    # Extra exclusions match a directory name anywhere or a path prefix
+    return any(pattern in parts[:-1] or path.startswith(pattern) for pattern in exclude)
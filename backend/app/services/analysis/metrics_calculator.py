@@ -2,39 +2,708 @@
 Metrics Calculator
 Computes various code metrics and health indicators for repositories.
 """
+import asyncio
+import bisect
+from array import array
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
+import numpy as np
+from app.services.git.code_parser import CodeParser
+from app.services.git.diff_reader import DiffReader
+from app.services.git.tree_reader import FILE_MODES, TreeReader
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Languages with size metrics; MetricsTable.language holds indexes into this
+LANGUAGES = ('python', 'javascript', 'typescript', 'java', 'c', 'cpp')
+LANGUAGE_CODES = {name: code for code, name in enumerate(LANGUAGES)}
+# Reported percentiles: the high tail matters for complexity, the low one for maintainability
+COMPLEXITY_PERCENTILES = (50, 90, 95, 99)
+MAINTAINABILITY_PERCENTILES = (1, 5, 10, 50)
+# Visual Studio's bands: below 10 is hard to maintain, 10-19 moderate, 20 and up maintainable
+RATINGS = ('low', 'moderate', 'good')
+RATING_THRESHOLDS = (10, 20)
+# Rough remediation cost per source line, by rating: hard-to-maintain code is close to a
+# rewrite, moderate code needs refactoring, maintainable code nothing
+REMEDIATION_MINUTES_PER_LINE = (1.0, 0.25, 0.0)
+# Relative change in debt below which a trend counts as stable
+DEBT_TREND_TOLERANCE = 0.05
+# Maintainability histogram bins, 0.01 wide over 0..100
+MAINTAINABILITY_BINS = 10001
+# How many least maintainable rows are kept ranked between patches
+WORST_KEPT = 100
+# Columns of MetricsTable.halstead, in the order CodeParser reports them
+HALSTEAD_COUNTS = ('distinct_operators', 'distinct_operands', 'total_operators', 'total_operands')
+
+
+def halstead_measures(counts) -> Dict[str, np.ndarray]:
+    """
+    Halstead volume, difficulty and effort from operator and operand counts.
+
+    :param counts: Array of HALSTEAD_COUNTS, one row per file, or a single row
+    :return: Dict of arrays: volume N log2(n), difficulty n1/2 * N2/n2, effort D * V
+    """
+    counts = np.asarray(counts, dtype=np.float64)
+    distinct_operators, distinct_operands, total_operators, total_operands = np.moveaxis(counts, -1, 0)
+    vocabulary = distinct_operators + distinct_operands
+    with np.errstate(divide='ignore', invalid='ignore'):
+        volume = np.where(vocabulary > 1, (total_operators + total_operands) * np.log2(vocabulary), 0.0)
+        difficulty = np.where(distinct_operands > 0, distinct_operators / 2 * total_operands / distinct_operands, 0.0)
+    return {'volume': volume, 'difficulty': difficulty, 'effort': difficulty * volume}
+
+
+def maintainability_index(volume, complexity, source_lines) -> np.ndarray:
+    """
+    Maintainability index on a 0-100 scale, as Visual Studio reports it:
+    (171 - 5.2 ln(V) - 0.23 G - 16.2 ln(L)) * 100 / 171, clipped to 0..100.
+
+    Takes scalars or arrays; files without volume or source lines score 100.
+
+    :param volume: Halstead volume V
+    :param complexity: Cyclomatic complexity G
+    :param source_lines: Lines holding code L
+    :return: Array of indexes, 0-d for scalar input
+    """
+    volume = np.asarray(volume, dtype=np.float64)
+    source_lines = np.asarray(source_lines, dtype=np.float64)
+    measurable = (volume > 0) & (source_lines > 0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        raw = (171 - 5.2 * np.log(volume) - 0.23 * np.asarray(complexity) - 16.2 * np.log(source_lines)) * (100 / 171)
+    return np.where(measurable, np.clip(raw, 0, 100), 100.0)
+
+
+class MetricsTable:
+    """
+    Per-file metrics as NumPy columns, with the repository aggregates kept current
+
+    Rows are found through `path_index`, and `alive` marks the rows in use: rows of
+    removed files are reused by later additions, and columns grow with spare
+    capacity. `language` holds indexes into LANGUAGES and `halstead` one row of
+    HALSTEAD_COUNTS per file; volume, difficulty, effort and maintainability are
+    derived from them. Sums, per-language and per-rating totals and value histograms
+    are updated as rows come and go, so `patch` costs time in the number of files
+    changed, not in the size of the table.
+    """
+
+    def __init__(
+        self,
+        paths: List[str],
+        language: np.ndarray,
+        lines: np.ndarray,
+        source_lines: np.ndarray,
+        complexity: np.ndarray,
+        halstead: np.ndarray,
+        commit: Optional[str] = None
+    ):
+        self.commit = commit
+        self.paths: List[Optional[str]] = list(paths)
+        self.path_index = {path: row for row, path in enumerate(self.paths)}
+        size = len(self.paths)
+        self.alive = np.ones(size, dtype=bool)
+        self.language = np.array(language, dtype=np.int8)
+        self.lines = np.array(lines, dtype=np.int64)
+        self.source_lines = np.array(source_lines, dtype=np.int64)
+        self.complexity = np.array(complexity, dtype=np.int64)
+        self.halstead = np.array(halstead, dtype=np.intc).reshape(-1, len(HALSTEAD_COUNTS))
+        self.volume = np.zeros(size)
+        self.difficulty = np.zeros(size)
+        self.effort = np.zeros(size)
+        self.maintainability = np.zeros(size)
+        self._free: List[int] = []
+        # Least maintainable rows, in order; every other row ranks after the last one
+        self._worst: Optional[List[int]] = None
+        self._totals = {
+            'files': 0,
+            'lines': 0,
+            'source_lines': 0,
+            'complexity': 0,
+            'volume': 0.0,
+            'difficulty': 0.0,
+            'effort': 0.0,
+            'maintainability': 0.0,
+            'weighted_maintainability': 0.0,
+            'language_files': np.zeros(len(LANGUAGES), dtype=np.int64),
+            'language_lines': np.zeros(len(LANGUAGES)),
+            'language_weighted': np.zeros(len(LANGUAGES)),
+            'rating_files': np.zeros(len(RATINGS), dtype=np.int64),
+            'rating_lines': np.zeros(len(RATINGS)),
+            'complexity_histogram': np.zeros(1, dtype=np.int64),
+            'maintainability_histogram': np.zeros(MAINTAINABILITY_BINS, dtype=np.int64),
+        }
+        rows = np.arange(size)
+        self._derive(rows)
+        self._account(rows, 1)
+
+    @classmethod
+    def from_results(cls, results: Iterable[Dict[str, Any]], commit: Optional[str] = None) -> 'MetricsTable':
+        """
+        Build the table from CodeParser results
+
+        Results without metrics (parse errors, skipped or unsupported files) are left out.
+        """
+        paths = []
+        language, lines, source_lines = array('b'), array('q'), array('q')
+        complexity, counts = array('q'), array('i')
+        for result in results:
+            metrics = result.get('metrics')
+            if metrics is None:
+                continue
+            paths.append(result['path'])
+            language.append(LANGUAGE_CODES[result['language']])
+            lines.append(result['lines_of_code'])
+            source_lines.append(metrics['source_lines'])
+            complexity.append(result['complexity'])
+            counts.extend(metrics['halstead'])
+        return cls(paths, language, lines, source_lines, complexity, counts, commit=commit)
+
+    @classmethod
+    def from_metrics(cls, file_metrics: Iterable[Dict[str, Any]]) -> 'MetricsTable':
+        """Build the table from MetricsCalculator.calculate_metrics results"""
+        paths = []
+        language, lines, source_lines = array('b'), array('q'), array('q')
+        complexity, counts = array('q'), array('i')
+        for metrics in file_metrics:
+            code = LANGUAGE_CODES.get(metrics.get('language'))
+            if code is None:
+                continue
+            paths.append(metrics['path'])
+            language.append(code)
+            lines.append(metrics['lines_of_code'])
+            source_lines.append(metrics['source_lines'])
+            complexity.append(metrics['cyclomatic_complexity'])
+            counts.extend(metrics['halstead'][name] for name in HALSTEAD_COUNTS)
+        return cls(paths, language, lines, source_lines, complexity, counts)
+
+    def __len__(self) -> int:
+        return self._totals['files']
+
+    def patch(
+        self,
+        removed: Iterable[str],
+        results: Iterable[Dict[str, Any]],
+        renamed: Iterable[Tuple[str, str]] = (),
+        commit: Optional[str] = None
+    ) -> Dict[str, int]:
+        """
+        Apply a change set in place
+
+        :param removed: Paths to drop
+        :param results: CodeParser results for added and changed paths; a result
+                        without metrics drops its path
+        :param renamed: (old path, new path) pairs whose contents did not change
+        :param commit: Commit the table describes afterwards
+        :return: Numbers of paths removed, added or replaced, and renamed
+        """
+        moved = 0
+        for old_path, new_path in renamed:
+            row = self.path_index.pop(old_path, None)
+            if row is None:
+                continue
+            self._release(self.path_index.pop(new_path, None))
+            self.path_index[new_path] = row
+            self.paths[row] = new_path
+            moved += 1
+            if self._worst is not None:
+                # Paths break ties in the ranking, so the renamed row may move
+                if row in self._worst:
+                    self._worst.remove(row)
+                if self._worst:
+                    self._rank(row)
+                else:
+                    self._worst = None
+
+        results = list(results)
+        dropped = {path for path in removed if path in self.path_index}
+        dropped.update(result['path'] for result in results if result['path'] in self.path_index)
+        self._release(*(self.path_index.pop(path) for path in dropped))
+
+        added = [self._fill(result) for result in results if result.get('metrics') is not None]
+        dropped.difference_update(self.paths[row] for row in added)
+        if added:
+            rows = np.array(added)
+            self._derive(rows)
+            self._account(rows, 1)
+            if self._worst is not None:
+                for row in added:
+                    self._rank(row)
+
+        if commit is not None:
+            self.commit = commit
+        return {'removed': len(dropped), 'added': len(added), 'renamed': moved}
+
+    def summary(self, top: int = 10) -> Dict[str, Any]:
+        """
+        Repository-level aggregates, read from the running totals
+
+        Overall maintainability weighs each file by its source lines, so a large
+        unmaintainable module counts for more than a small one. The index of a
+        whole module drops quickly with size, so code_health is instead the share
+        of source lines (0-100) in files rated good. Technical debt prices the
+        source lines of lower-rated files at REMEDIATION_MINUTES_PER_LINE. Percentiles come from value
+        histograms: exact for complexity, to 0.01 for maintainability.
+
+        :param top: Number of least maintainable files to list
+        :return: Totals, means, percentiles, per-language figures and the worst files
+        """
+        totals = self._totals
+        files = totals['files']
+        if not files:
+            return {
+                'files': 0,
+                'total_lines': 0,
+                'source_lines': 0,
+                'average_complexity': 0.0,
+                'overall_maintainability': 0.0,
+                'code_health': 0.0,
+                'technical_debt_hours': 0.0,
+                'complexity': {},
+                'maintainability': {},
+                'ratings': {rating: 0 for rating in RATINGS},
+                'halstead': {'volume': 0.0, 'effort': 0.0, 'mean_difficulty': 0.0},
+                'languages': [],
+                'worst_files': []
+            }
+
+        total_source = totals['source_lines']
+        if total_source:
+            overall = totals['weighted_maintainability'] / total_source
+            health = 100 * totals['rating_lines'][-1] / total_source
+        else:
+            overall = totals['maintainability'] / files
+            health = 100 * totals['rating_files'][-1] / files
+        complexity_histogram = totals['complexity_histogram']
+        maintainability_histogram = totals['maintainability_histogram']
+        complexity = _histogram_percentiles(complexity_histogram, COMPLEXITY_PERCENTILES)
+        maintainability = _histogram_percentiles(maintainability_histogram, MAINTAINABILITY_PERCENTILES) / 100
+
+        return {
+            'files': files,
+            'total_lines': totals['lines'],
+            'source_lines': total_source,
+            'average_complexity': round(totals['complexity'] / files, 2),
+            'overall_maintainability': round(float(overall), 2),
+            'code_health': round(float(health), 1),
+            'technical_debt_hours': round(float(np.dot(totals['rating_lines'], REMEDIATION_MINUTES_PER_LINE)) / 60, 1),
+            'complexity': {
+                'mean': round(totals['complexity'] / files, 2),
+                'max': int(np.flatnonzero(complexity_histogram)[-1]),
+                **{f'p{q}': round(float(v), 2) for q, v in zip(COMPLEXITY_PERCENTILES, complexity)}
+            },
+            'maintainability': {
+                'mean': round(totals['maintainability'] / files, 2),
+                'min': round(float(np.flatnonzero(maintainability_histogram)[0]) / 100, 2),
+                **{f'p{q}': round(float(v), 2) for q, v in zip(MAINTAINABILITY_PERCENTILES, maintainability)}
+            },
+            'ratings': {rating: int(count) for rating, count in zip(RATINGS, totals['rating_files'])},
+            'halstead': {
+                'volume': round(totals['volume'], 2),
+                'effort': round(totals['effort'], 2),
+                'mean_difficulty': round(totals['difficulty'] / files, 2)
+            },
+            'languages': self.by_language(),
+            'worst_files': self.worst_files(top)
+        }
+
+    def by_language(self) -> List[Dict[str, Any]]:
+        """Files, source lines and weighted maintainability per language, most source lines first"""
+        totals = self._totals
+        files, source, weighted = totals['language_files'], totals['language_lines'], totals['language_weighted']
+        result = []
+        for code in np.argsort(-source, kind='stable'):
+            if not files[code]:
+                continue
+            result.append({
+                'language': LANGUAGES[code],
+                'files': int(files[code]),
+                'source_lines': int(round(source[code])),
+                'maintainability': round(float(weighted[code] / source[code]), 2) if source[code] > 0 else 100.0
+            })
+        return result
+
+    def worst_files(self, n: int = 10) -> List[Dict[str, Any]]:
+        """Least maintainable files, most complex first among equals, then by path"""
+        n = min(n, len(self))
+        if n <= 0:
+            return []
+        if self._worst is None or len(self._worst) < n:
+            # Partial selection over the live rows, then sort only the candidates; every row
+            # tied with the cut-off is a candidate, so ties resolve the same way as in _rank
+            live = np.flatnonzero(self.alive)
+            keep = min(max(n, WORST_KEPT), len(live))
+            maintainability = self.maintainability[live]
+            cutoff = np.partition(maintainability, keep - 1)[keep - 1]
+            rows = live[maintainability <= cutoff].tolist()
+            self._worst = sorted(rows, key=self._rank_key)[:keep]
+        return [
+            {
+                'path': self.paths[row],
+                'language': LANGUAGES[self.language[row]],
+                'source_lines': int(self.source_lines[row]),
+                'cyclomatic_complexity': int(self.complexity[row]),
+                'maintainability_index': round(float(self.maintainability[row]), 2)
+            }
+            for row in self._worst[:n]
+        ]
+
+    def _release(self, *rows: Optional[int]):
+        """Take rows out of the totals and the ranking, and free them for reuse"""
+        rows = [row for row in rows if row is not None]
+        if not rows:
+            return
+        self._account(np.array(rows), -1)
+        self.alive[rows] = False
+        for row in rows:
+            self.paths[row] = None
+        self._free.extend(rows)
+        if self._worst is not None:
+            gone = set(rows)
+            # The remaining rows still rank before every row outside the list
+            self._worst = [row for row in self._worst if row not in gone] or None
+
+    def _fill(self, result: Dict[str, Any]) -> int:
+        """Store one parse result in a free row and return it; totals are updated by the caller"""
+        if not self._free:
+            self._grow()
+        row = self._free.pop()
+        metrics = result['metrics']
+        self.paths[row] = result['path']
+        self.path_index[result['path']] = row
+        self.alive[row] = True
+        self.language[row] = LANGUAGE_CODES[result['language']]
+        self.lines[row] = result['lines_of_code']
+        self.source_lines[row] = metrics['source_lines']
+        self.complexity[row] = result['complexity']
+        self.halstead[row] = metrics['halstead']
+        return row
+
+    def _grow(self):
+        """Double the capacity of every column, so appending stays amortized constant time"""
+        size = len(self.paths)
+        extra = max(size, 64)
+        for name in ('alive', 'language', 'lines', 'source_lines', 'complexity', 'halstead',
+                     'volume', 'difficulty', 'effort', 'maintainability'):
+            column = getattr(self, name)
+            grown = np.zeros((size + extra,) + column.shape[1:], dtype=column.dtype)
+            grown[:size] = column
+            setattr(self, name, grown)
+        self.paths.extend([None] * extra)
+        # Lowest rows first, so the table stays dense
+        self._free.extend(range(size + extra - 1, size - 1, -1))
+
+    def _derive(self, rows: np.ndarray):
+        measures = halstead_measures(self.halstead[rows])
+        self.volume[rows] = measures['volume']
+        self.difficulty[rows] = measures['difficulty']
+        self.effort[rows] = measures['effort']
+        self.maintainability[rows] = maintainability_index(
+            measures['volume'], self.complexity[rows], self.source_lines[rows]
+        )
+
+    def _account(self, rows: np.ndarray, sign: int):
+        """Add (sign 1) or subtract (sign -1) the rows' contributions to every total"""
+        totals = self._totals
+        source_lines = self.source_lines[rows]
+        maintainability = self.maintainability[rows]
+        weighted = maintainability * source_lines
+        totals['files'] += sign * len(rows)
+        totals['lines'] += sign * int(self.lines[rows].sum())
+        totals['source_lines'] += sign * int(source_lines.sum())
+        totals['complexity'] += sign * int(self.complexity[rows].sum())
+        for name in ('volume', 'difficulty', 'effort', 'maintainability'):
+            totals[name] += sign * float(getattr(self, name)[rows].sum())
+        totals['weighted_maintainability'] += sign * float(weighted.sum())
+
+        language = self.language[rows]
+        size = len(LANGUAGES)
+        totals['language_files'] += sign * np.bincount(language, minlength=size)
+        totals['language_lines'] += sign * np.bincount(language, weights=source_lines, minlength=size)
+        totals['language_weighted'] += sign * np.bincount(language, weights=weighted, minlength=size)
+
+        ratings = np.digitize(maintainability, RATING_THRESHOLDS)
+        totals['rating_files'] += sign * np.bincount(ratings, minlength=len(RATINGS))
+        totals['rating_lines'] += sign * np.bincount(ratings, weights=source_lines, minlength=len(RATINGS))
+
+        complexity = np.bincount(self.complexity[rows])
+        histogram = totals['complexity_histogram']
+        if len(complexity) > len(histogram):
+            histogram = totals['complexity_histogram'] = np.concatenate(
+                (histogram, np.zeros(len(complexity) - len(histogram), dtype=np.int64))
+            )
+        histogram[:len(complexity)] += sign * complexity
+        totals['maintainability_histogram'] += sign * np.bincount(
+            np.rint(maintainability * 100).astype(np.int64), minlength=MAINTAINABILITY_BINS
+        )
+
+    def _rank_key(self, row: int) -> Tuple[float, int, str]:
+        """Least maintainable first, then most complex, then by path"""
+        return self.maintainability[row], -self.complexity[row], self.paths[row]
+
+    def _rank(self, row: int):
+        """Insert a new row into the worst-files list if it ranks before its last entry"""
+        worst = self._worst
+        key = self._rank_key(row)
+        if key > self._rank_key(worst[-1]):
+            return
+        keys = [self._rank_key(other) for other in worst]
+        worst.insert(bisect.bisect(keys, key), row)
+        del worst[WORST_KEPT:]
+
+
+def _histogram_percentiles(histogram: np.ndarray, percentiles: Iterable[float]) -> np.ndarray:
+    """Percentiles of the values a histogram counts, interpolated as np.percentile does"""
+    cumulative = np.cumsum(histogram)
+    positions = np.asarray(percentiles, dtype=np.float64) / 100 * (cumulative[-1] - 1)
+    lower = np.floor(positions)
+    # Value of the k-th smallest element: the first bin whose running count exceeds k
+    below = np.searchsorted(cumulative, lower, side='right')
+    above = np.searchsorted(cumulative, np.minimum(lower + 1, cumulative[-1] - 1), side='right')
+    return below + (above - below) * (positions - lower)
+
 
 class MetricsCalculator:
     def __init__(self):
-        pass  # Initialize metric calculation components
+        # Sizes come from the parser's lexer pass, so measuring a file never scans it twice
+        self.parser = CodeParser()
 
-    def calculate_metrics(self, file_path: str, content: str):
+    def calculate_metrics(self, file_path: str, content: str) -> Dict[str, Any]:
         """
         Calculate various metrics for a given file.
 
         :param file_path: Path to the file being analyzed
         :param content: File content as string
-        :return: Dictionary containing calculated metrics
+        :return: Dictionary containing calculated metrics; files the parser cannot
+                 measure have a language outside LANGUAGES and zero metrics
         """
-        # Placeholder for metric calculation logic
-        # Compute lines of code, cyclomatic complexity, Halstead complexity, etc.
+        result = self.parser.parse_source(file_path, content)
+        metrics = result.get('metrics')
+        if metrics is None:
+            return {
+                'path': file_path,
+                'language': result.get('language', 'unknown'),
+                'lines_of_code': len(content.splitlines()),
+                'source_lines': 0,
+                'cyclomatic_complexity': 0,
+                'halstead': None,
+                'maintainability_index': 0.0
+            }
 
+        measures = halstead_measures(metrics['halstead'])
         return {
-            "lines_of_code": 0,
-            "cyclomatic_complexity": 0,
-            "maintainability_index": 0.0
+            'path': file_path,
+            'language': result['language'],
+            'lines_of_code': result['lines_of_code'],
+            'source_lines': metrics['source_lines'],
+            'cyclomatic_complexity': result['complexity'],
+            'halstead': {
+                **dict(zip(HALSTEAD_COUNTS, metrics['halstead'])),
+                **{name: round(float(value), 2) for name, value in measures.items()}
+            },
+            'maintainability_index': round(
+                float(maintainability_index(measures['volume'], result['complexity'], metrics['source_lines'])), 2
+            )
         }
 
-    def aggregate_metrics(self, file_metrics_list):
+    async def calculate_repository(self, repo_path: str, rev: str = 'HEAD') -> MetricsTable:
         """
-        Aggregate individual file metrics into repository-level metrics.
+        Measure every supported file of a revision.
+
+        Files are parsed on the shared process pool straight from the object
+        database, and blobs measured before come from the parse cache.
+
+        :param repo_path: Path to repository, bare mirrors work
+        :param rev: Revision to measure
+        :return: MetricsTable of the measured files
+        """
+        # Pinned first, so a later update diffs from exactly the tree that was measured
+        commit = await asyncio.to_thread(TreeReader.resolve_commit, repo_path, rev)
+        results = [result async for result in self.parser.parse_repository(repo_path, commit)]
+        table = MetricsTable.from_results(results, commit=commit)
+        logger.info(f"Measured {len(table)} of {len(results)} files in {repo_path} at {commit[:12]}")
+        return table
+
+    async def update_repository(self, repo_path: str, base: MetricsTable, rev: str = 'HEAD') -> Dict[str, Any]:
+        """
+        Bring a table from calculate_repository to another revision in place.
+
+        Only files the diff between the two commits touches are parsed, and the
+        aggregates are patched rather than recomputed, so refreshing after a small
+        push costs about the same whatever the size of the repository.
+
+        :param repo_path: Path to repository, bare mirrors work
+        :param base: Table to update; its commit is the diff base
+        :param rev: Revision to bring it to
+        :return: Commit measured, number of files, and how many were parsed, removed or renamed
+        """
+        if base.commit is None:
+            raise ValueError("Table has no commit to diff from; build it with calculate_repository")
+        commit = await asyncio.to_thread(TreeReader.resolve_commit, repo_path, rev)
+        if commit == base.commit:
+            return {'commit': commit, 'files': len(base), 'parsed': 0, 'removed': 0, 'renamed': 0}
+        diff = await asyncio.to_thread(DiffReader(repo_path).file_stats, base.commit, commit)
+        return await self.apply_diff(repo_path, base, diff, commit)
 
-        :param file_metrics_list: List of individual file metrics
-        :return: Dictionary containing aggregated metrics
+    async def apply_diff(
+        self,
+        repo_path: str,
+        base: MetricsTable,
+        diff: Iterable[Dict[str, Any]],
+        commit: str
+    ) -> Dict[str, Any]:
         """
-        # Placeholder for aggregation logic
+        Patch a table with the files changed, added, deleted and renamed in a diff.
 
+        :param repo_path: Path to repository holding the new blobs
+        :param base: Table to patch in place
+        :param diff: DiffReader.file_stats entries from base.commit to commit
+        :param commit: Commit the diff leads to
+        :return: Commit measured, number of files, and how many were parsed, removed or renamed
+        """
+        removed, renamed, blobs = self._plan_diff(base, diff)
+        results = [result async for result in self.parser.parse_blobs(repo_path, blobs)] if blobs else []
+        changes = base.patch(removed, results, renamed, commit=commit)
+        logger.info(
+            f"Updated metrics of {repo_path} to {commit[:12]}: {len(blobs)} files parsed, "
+            f"{changes['removed']} removed, {changes['renamed']} renamed"
+        )
         return {
-            "total_lines": 0,
-            "average_complexity": 0.0,
-            "overall_maintainability": 0.0
+            'commit': commit,
+            'files': len(base),
+            'parsed': len(blobs),
+            'removed': changes['removed'],
+            'renamed': changes['renamed']
         }
+
+    async def calculate_history(self, repo_path: str, samples: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Repository-level metrics at each of a series of commits, e.g. from CommitSampler.
+
+        One table is carried from sample to sample and patched with the diff between
+        them, and each distinct blob is measured once: identical blobs at later samples,
+        under any path, reuse the earlier result. A year of weekly samples costs about
+        as much as measuring the distinct blobs once.
+
+        :param repo_path: Path to repository, bare mirrors work
+        :param samples: Dicts with commit, timestamp and label, oldest first
+        :return: One point per sample: its commit, timestamp and label with the
+                 MetricsTable.summary fields other than worst_files
+        """
+        # (blob SHA, extension) -> slim parse result, or None if it has no metrics
+        measured: Dict[Tuple[str, str], Optional[Dict[str, Any]]] = {}
+        table: Optional[MetricsTable] = None
+        points = []
+        parsed = 0
+        for sample in samples:
+            commit = sample['commit']
+            if table is None:
+                listing = await asyncio.to_thread(TreeReader(repo_path, commit).list_files)
+                removed, renamed = [], []
+                blobs = [
+                    (entry['path'], entry['sha']) for entry in listing
+                    if Path(entry['path']).suffix.lower() in self.parser.language_parsers
+                ]
+            elif commit == table.commit:
+                points.append({**points[-1], **sample})
+                continue
+            else:
+                # Renames are not worth detecting: a moved blob is already measured
+                diff = await asyncio.to_thread(
+                    DiffReader(repo_path).file_stats, table.commit, commit, find_renames=False
+                )
+                removed, renamed, blobs = self._plan_diff(table, diff)
+
+            unseen = [(path, sha) for path, sha in blobs if (sha, Path(path).suffix.lower()) not in measured]
+            if unseen:
+                parsed += len(unseen)
+                shas = dict(unseen)
+                async for result in self.parser.parse_blobs(repo_path, unseen):
+                    if result.get('timed_out'):
+                        # Depends on load, so the next sample that has the blob tries again
+                        continue
+                    path = result['path']
+                    # Only what MetricsTable reads is kept, not the symbols
+                    measured[shas[path], Path(path).suffix.lower()] = None if result.get('metrics') is None else {
+                        key: result[key] for key in ('language', 'lines_of_code', 'complexity', 'metrics')
+                    }
+            results = []
+            for path, sha in blobs:
+                result = measured.get((sha, Path(path).suffix.lower()))
+                results.append({**result, 'path': path} if result is not None else {'path': path})
+
+            if table is None:
+                table = MetricsTable.from_results(results, commit=commit)
+            else:
+                table.patch(removed, results, renamed, commit=commit)
+            summary = table.summary(0)
+            del summary['worst_files']
+            points.append({**sample, **summary})
+
+        logger.info(f"Measured {len(points)} commits of {repo_path}, parsing {parsed} blobs")
+        return points
+
+    def debt_trend(self, points: List[Dict[str, Any]], repository_id: str, time_period: str) -> 'TechnicalDebtTrend':
+        """
+        Technical debt over a calculate_history series.
+
+        :param points: calculate_history output, oldest first
+        :param repository_id: Repository the points describe
+        :param time_period: Period the points span, e.g. '1y'
+        :return: TechnicalDebtTrend with the latest debt, the total of all decreases
+                 between points, and a direction that ignores changes under DEBT_TREND_TOLERANCE
+        """
+        # The models package sets up the database, which metrics alone do not need
+        from app.models.quality_models import TechnicalDebtTrend
+
+        graph = [point['technical_debt_hours'] for point in points]
+        reduction = sum(max(before - after, 0.0) for before, after in zip(graph, graph[1:]))
+        direction = 'stable'
+        if len(graph) > 1:
+            change = graph[-1] - graph[0]
+            if abs(change) > DEBT_TREND_TOLERANCE * max(graph[0], graph[-1]):
+                direction = 'increasing' if change > 0 else 'decreasing'
+        return TechnicalDebtTrend(
+            repository_id=repository_id,
+            time_period=time_period,
+            accumulated_debt_hours=graph[-1] if graph else 0.0,
+            debt_reduction_hours=round(reduction, 1),
+            trend_direction=direction,
+            debt_trend_graph=graph
+        )
+
+    def _plan_diff(
+        self,
+        base: MetricsTable,
+        diff: Iterable[Dict[str, Any]]
+    ) -> Tuple[List[str], List[Tuple[str, str]], List[Tuple[str, str]]]:
+        """Sort diff entries into paths to drop, pure renames, and (path, blob SHA) pairs to measure"""
+        measurable = self.parser.language_parsers
+        removed, renamed, blobs = [], [], []
+        for entry in diff:
+            status, path, old_path = entry['status'], entry['path'], entry['old_path']
+            if status == 'R':
+                # The old path is gone whatever happens to the new one
+                if (entry['old_sha'] == entry['new_sha'] and old_path in base.path_index
+                        and Path(path).suffix.lower() in measurable):
+                    renamed.append((old_path, path))
+                    continue
+                removed.append(old_path)
+            if status == 'D' or entry['new_mode'] not in FILE_MODES:
+                # Deleted, or now a symlink or submodule, which calculate_repository never measures
+                removed.append(path)
+            elif Path(path).suffix.lower() in measurable:
+                blobs.append((path, entry['new_sha']))
+            else:
+                removed.append(path)
+        return removed, renamed, blobs
+
+    def aggregate_metrics(self, file_metrics_list: Union[MetricsTable, Iterable[Dict[str, Any]]], top: int = 10):
+        """
+        Aggregate individual file metrics into repository-level metrics.
+
+        :param file_metrics_list: MetricsTable, or calculate_metrics results
+        :param top: Number of least maintainable files to list
+        :return: Dictionary containing aggregated metrics, see MetricsTable.summary
+        """
+        table = file_metrics_list if isinstance(file_metrics_list, MetricsTable) \
+            else MetricsTable.from_metrics(file_metrics_list)
+        return table.summary(top)
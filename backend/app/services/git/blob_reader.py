@@ -0,0 +1,313 @@
+"""
+Blob Reader
+Reads file contents straight from the object database through long-lived `git cat-file` processes.
+"""
+import atexit
+import os
+import queue
+import subprocess
+import threading
+import time
+from collections import OrderedDict
+from typing import Iterable, Iterator, List, Optional, Tuple
+from app.core.config import settings
+from app.services.git.workspace_manager import reader_lease
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Object names written per round trip; bounds how much unread output can queue up in the pipe
+BATCH_SIZE = 256
+
+
+class _CatFileProcess:
+    """A `git cat-file --batch-check` / `--batch` process pair for one repository"""
+
+    def __init__(self, repo_path: str):
+        self.repo_path = repo_path
+        self.directory = self._identity(repo_path)
+        self.check = self._spawn(repo_path, '--batch-check')
+        self.batch = self._spawn(repo_path, '--batch')
+
+    @staticmethod
+    def _identity(repo_path: str) -> Optional[Tuple[int, int]]:
+        try:
+            stat = os.stat(repo_path)
+        except OSError:
+            return None
+        return stat.st_dev, stat.st_ino
+
+    @staticmethod
+    def _spawn(repo_path: str, mode: str) -> subprocess.Popen:
+        return subprocess.Popen(
+            ['git', 'cat-file', mode],
+            cwd=repo_path,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL
+        )
+
+    def alive(self) -> bool:
+        return self.check.poll() is None and self.batch.poll() is None
+
+    def current(self) -> bool:
+        """Whether the repository is still the directory the processes started in, not a re-clone"""
+        return self.directory is not None and self._identity(self.repo_path) == self.directory
+
+    def info(self, names: List[str]) -> List[Tuple[Optional[str], int]]:
+        """(sha, size) per object name, (None, 0) for missing objects or non-blobs"""
+        self.check.stdin.write(''.join(f"{name}\n" for name in names).encode('utf-8'))
+        self.check.stdin.flush()
+
+        results = []
+        for _ in names:
+            header = self.check.stdout.readline().split()
+            if len(header) == 3 and header[1] == b'blob':
+                results.append((header[0].decode('ascii'), int(header[2])))
+            else:
+                results.append((None, 0))
+        return results
+
+    def contents(self, shas: List[str]) -> Iterator[bytes]:
+        """Contents of blobs already known to exist"""
+        self.batch.stdin.write(''.join(f"{sha}\n" for sha in shas).encode('ascii'))
+        self.batch.stdin.flush()
+
+        for _ in shas:
+            size = int(self.batch.stdout.readline().split()[2])
+            data = self.batch.stdout.read(size)
+            self.batch.stdout.read(1)  # Trailing newline
+            yield data
+
+    def close(self):
+        for process in (self.check, self.batch):
+            try:
+                process.stdin.close()
+                process.wait(timeout=5)
+            except Exception:
+                process.kill()
+
+
+class BlobReader:
+    """
+    Pool of persistent cat-file processes per repository, shared across requests
+
+    At most BLOB_READER_REPOS repositories keep processes; the least recently used
+    reader is closed to make room, and readers unused for BLOB_READER_IDLE_SECONDS
+    are closed by a background reaper.
+    """
+
+    _readers: 'OrderedDict[str, BlobReader]' = OrderedDict()
+    _readers_guard = threading.Lock()
+    _reaper: Optional[threading.Thread] = None
+
+    def __init__(self, repo_path: str, pool_size: int = 2):
+        self.repo_path = repo_path
+        self.pool_size = pool_size
+        self.last_used = time.monotonic()
+        self._idle: 'queue.LifoQueue[_CatFileProcess]' = queue.LifoQueue()
+        self._created = 0
+        self._closed = False
+        self._guard = threading.Lock()
+
+    @classmethod
+    def for_repo(cls, repo_path: str) -> 'BlobReader':
+        """Shared reader for a repository"""
+        evicted = []
+        with cls._readers_guard:
+            reader = cls._readers.get(repo_path)
+            if reader is None:
+                reader = cls._readers[repo_path] = cls(repo_path)
+                while len(cls._readers) > max(1, settings.BLOB_READER_REPOS):
+                    evicted.append(cls._readers.popitem(last=False)[1])
+            else:
+                cls._readers.move_to_end(repo_path)
+            reader.last_used = time.monotonic()
+            if cls._reaper is None:
+                cls._reaper = threading.Thread(target=cls._reap, name='blob-reader-reaper', daemon=True)
+                cls._reaper.start()
+        for stale in evicted:
+            stale.close()
+        return reader
+
+    @classmethod
+    def close_idle(cls, idle_seconds: Optional[float] = None) -> int:
+        """
+        Close the readers not used for idle_seconds
+
+        Args:
+            idle_seconds: Defaults to BLOB_READER_IDLE_SECONDS
+
+        Returns:
+            Number of readers closed
+        """
+        if idle_seconds is None:
+            idle_seconds = settings.BLOB_READER_IDLE_SECONDS
+        cutoff = time.monotonic() - idle_seconds
+        with cls._readers_guard:
+            # Least recently used first, so the scan stops at the first recent reader
+            stale = []
+            for repo_path, reader in cls._readers.items():
+                if reader.last_used > cutoff:
+                    break
+                stale.append(repo_path)
+            readers = [cls._readers.pop(repo_path) for repo_path in stale]
+        for reader in readers:
+            reader.close()
+        return len(readers)
+
+    @classmethod
+    def _reap(cls):
+        while True:
+            time.sleep(max(1.0, settings.BLOB_READER_IDLE_SECONDS / 4))
+            try:
+                closed = cls.close_idle()
+                if closed:
+                    logger.debug(f"Closed {closed} idle blob readers")
+            except Exception as e:
+                logger.warning(f"Closing idle blob readers failed: {e}")
+
+    @classmethod
+    def close_repo(cls, repo_path: str):
+        """Stop the processes for a repository, e.g. before its directory is deleted"""
+        with cls._readers_guard:
+            reader = cls._readers.pop(repo_path, None)
+        if reader:
+            reader.close()
+
+    @classmethod
+    def close_all(cls):
+        with cls._readers_guard:
+            readers = list(cls._readers.values())
+            cls._readers.clear()
+        for reader in readers:
+            reader.close()
+
+    def read_blobs(
+        self,
+        names: Iterable[str],
+        max_size: Optional[int] = -1
+    ) -> Iterator[Tuple[str, Optional[bytes]]]:
+        """
+        Stream blob contents in batches
+
+        Args:
+            names: Blob SHAs, or any object names such as 'HEAD:path/to/file'
+            max_size: Skip blobs larger than this many bytes; defaults to
+                MAX_FILE_SIZE_MB, None disables the limit
+
+        Yields:
+            (name, contents) in input order; contents is None for missing,
+            non-blob or oversized objects
+        """
+        if max_size == -1:
+            max_size = settings.MAX_FILE_SIZE_MB * 1024 * 1024
+
+        # An idle process may outlive an eviction; a read in progress may not
+        with reader_lease(self.repo_path):
+            process = self._acquire()
+            healthy = False
+            try:
+                batch = []
+                for name in names:
+                    batch.append(name)
+                    if len(batch) == BATCH_SIZE:
+                        yield from self._read_batch(process, batch, max_size)
+                        batch = []
+                if batch:
+                    yield from self._read_batch(process, batch, max_size)
+                healthy = True
+            finally:
+                # A consumer that stops mid-batch leaves unread output behind, so discard the process
+                self._release(process, healthy)
+
+    def read_sizes(self, names: Iterable[str]) -> Iterator[Tuple[str, Optional[int]]]:
+        """
+        Stream blob sizes without reading contents
+
+        Yields:
+            (name, size) in input order; size is None for missing or non-blob objects
+        """
+        with reader_lease(self.repo_path):
+            process = self._acquire()
+            healthy = False
+            try:
+                names = list(names)
+                for start in range(0, len(names), BATCH_SIZE):
+                    batch = names[start:start + BATCH_SIZE]
+                    for name, (sha, size) in zip(batch, process.info(batch)):
+                        yield name, size if sha else None
+                healthy = True
+            finally:
+                self._release(process, healthy)
+
+    def read_blob(self, name: str, max_size: Optional[int] = -1) -> Optional[bytes]:
+        """Contents of a single blob, or None"""
+        # Run the generator to the end; leaving it early would discard the process
+        [(_, data)] = self.read_blobs([name], max_size)
+        return data
+
+    @staticmethod
+    def _read_batch(
+        process: _CatFileProcess,
+        names: List[str],
+        max_size: Optional[int]
+    ) -> Iterator[Tuple[str, Optional[bytes]]]:
+        infos = process.info(names)
+        wanted = [sha for sha, size in infos if sha and (max_size is None or size <= max_size)]
+        contents = process.contents(wanted) if wanted else iter(())
+
+        for name, (sha, size) in zip(names, infos):
+            if sha and (max_size is None or size <= max_size):
+                yield name, next(contents)
+            else:
+                yield name, None
+
+    def _acquire(self) -> _CatFileProcess:
+        self.last_used = time.monotonic()
+        while True:
+            try:
+                process = self._idle.get_nowait()
+            except queue.Empty:
+                with self._guard:
+                    if self._created < self.pool_size:
+                        self._created += 1
+                        return _CatFileProcess(self.repo_path)
+                # Released processes that were stopped free a slot without waking anyone, so poll
+                try:
+                    process = self._idle.get(timeout=0.5)
+                except queue.Empty:
+                    continue
+            if process.alive() and process.current():
+                return process
+            # Dead, or its repository was evicted (possibly by another process) since it started
+            process.close()
+            with self._guard:
+                self._created -= 1
+
+    def _release(self, process: _CatFileProcess, healthy: bool):
+        self.last_used = time.monotonic()
+        # Processes handed out before the reader was closed are stopped on return
+        with self._guard:
+            if healthy and not self._closed and process.alive():
+                self._idle.put(process)
+                return
+        process.close()
+        with self._guard:
+            self._created -= 1
+
+    def close(self):
+        """Stop all idle processes; those in use are stopped when released"""
+        with self._guard:
+            self._closed = True
+        while True:
+            try:
+                process = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            process.close()
+            with self._guard:
+                self._created -= 1
+
+
+atexit.register(BlobReader.close_all)
@@ -0,0 +1,271 @@
+"""
+Churn Matrix
+Builds file-by-time-bucket addition and deletion matrices from a single `git log --numstat` stream.
+"""
+from array import array
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+import numpy as np
+from app.services.git.log_reader import CommitLogReader
+import logging
+
+logger = logging.getLogger(__name__)
+
+DAY = 24 * 60 * 60
+# Lookback and bucket width for the analytics period parameter
+PERIODS = {
+    '7d': (7 * DAY, DAY),
+    '30d': (30 * DAY, DAY),
+    '90d': (90 * DAY, 7 * DAY),
+    '1y': (365 * DAY, 7 * DAY),
+    'all': (None, 30 * DAY),
+}
+# Most columns a matrix gets; wider spans get proportionally wider buckets
+MAX_BUCKETS = 1024
+
+
+class ChurnMatrix:
+    """
+    Additions and deletions per file and time bucket
+
+    Rows follow `files` (see `file_index`), columns follow `bucket_starts`
+    (Unix timestamps). `touches` counts the commits that changed a file in a
+    bucket; `commits` and `authors` are per bucket. The three per-file arrays take
+    8 bytes per file and bucket each, and there are at most MAX_BUCKETS buckets.
+    """
+
+    def __init__(
+        self,
+        files: List[str],
+        bucket_starts: np.ndarray,
+        bucket_seconds: int,
+        additions: np.ndarray,
+        deletions: np.ndarray,
+        touches: np.ndarray,
+        commits: np.ndarray,
+        authors: np.ndarray
+    ):
+        self.files = files
+        self.file_index = {path: index for index, path in enumerate(files)}
+        self.bucket_starts = bucket_starts
+        self.bucket_seconds = bucket_seconds
+        self.additions = additions
+        self.deletions = deletions
+        self.touches = touches
+        self.commits = commits
+        self.authors = authors
+
+    @classmethod
+    def from_repository(
+        cls,
+        repo_path: str,
+        bucket_seconds: int = 7 * DAY,
+        since: Optional[int] = None,
+        until: Optional[int] = None,
+        rev: str = 'HEAD'
+    ) -> 'ChurnMatrix':
+        """
+        Build the matrix from one `git log --numstat` process
+
+        Args:
+            repo_path: Path to repository, bare mirrors work
+            bucket_seconds: Width of each time bucket, multiplied by the smallest whole factor
+                that keeps the span within MAX_BUCKETS buckets
+            since: Only count commits at or after this Unix time; buckets start here
+            until: Only count commits before this Unix time; buckets end here
+            rev: Revision whose history is walked
+
+        Returns:
+            ChurnMatrix covering since..until, or the span of the history
+        """
+        file_index: Dict[str, int] = {}
+        # Per (commit, file) entries, kept as compact typed arrays until the final reduction
+        entry_files, entry_times = array('q'), array('q')
+        entry_additions, entry_deletions = array('q'), array('q')
+        commit_times = array('q')
+        author_index: Dict[str, int] = {}
+        commit_authors = array('q')
+
+        # The commit history's own reader, so churn totals agree with it
+        log = CommitLogReader(repo_path).iter_commits(rev, since=since, until=until, file_stats=True)
+        for commit in log:
+            timestamp = commit['timestamp']
+            author = commit['author_email'].lower()
+            commit_times.append(timestamp)
+            commit_authors.append(author_index.setdefault(author, len(author_index)))
+            for path, added, deleted in commit['file_stats']:
+                entry_files.append(file_index.setdefault(path, len(file_index)))
+                entry_times.append(timestamp)
+                entry_additions.append(added)
+                entry_deletions.append(deleted)
+
+        times = np.frombuffer(commit_times, dtype=np.int64)
+        if since is None:
+            since = int(times.min()) if len(times) else int(datetime.now(timezone.utc).timestamp())
+        if until is None:
+            until = int(times.max()) + 1 if len(times) else since + 1
+        n_buckets = max(1, -(-(until - since) // bucket_seconds))
+        if n_buckets > MAX_BUCKETS:
+            # A long history, or a commit with a bogus date, would otherwise grow the arrays without bound
+            bucket_seconds *= -(-n_buckets // MAX_BUCKETS)
+            n_buckets = max(1, -(-(until - since) // bucket_seconds))
+            logger.info(f"Widened churn buckets of {repo_path} to {bucket_seconds}s to stay within {MAX_BUCKETS}")
+        n_files = len(file_index)
+
+        def bucket_of(values: np.ndarray) -> np.ndarray:
+            return np.clip((values - since) // bucket_seconds, 0, n_buckets - 1)
+
+        rows = np.frombuffer(entry_files, dtype=np.int64)
+        cells = rows * n_buckets + bucket_of(np.frombuffer(entry_times, dtype=np.int64))
+        size = n_files * n_buckets
+
+        def accumulate(weights: Optional[array]) -> np.ndarray:
+            values = None if weights is None else np.frombuffer(weights, dtype=np.int64)
+            counts = np.bincount(cells, weights=values, minlength=size)
+            return counts.astype(np.int64).reshape(n_files, n_buckets)
+
+        commit_buckets = bucket_of(times)
+        commits = np.bincount(commit_buckets, minlength=n_buckets).astype(np.int64)
+        # Distinct authors per bucket: count unique (bucket, author) pairs
+        author_cells = np.unique(commit_buckets * max(1, len(author_index)) + np.frombuffer(commit_authors, dtype=np.int64))
+        authors = np.bincount(author_cells // max(1, len(author_index)), minlength=n_buckets).astype(np.int64)
+
+        files = [''] * n_files
+        for path, index in file_index.items():
+            files[index] = path
+
+        return cls(
+            files=files,
+            bucket_starts=since + np.arange(n_buckets, dtype=np.int64) * bucket_seconds,
+            bucket_seconds=bucket_seconds,
+            additions=accumulate(entry_additions),
+            deletions=accumulate(entry_deletions),
+            touches=accumulate(None),
+            commits=commits,
+            authors=authors
+        )
+
+    @classmethod
+    def for_period(cls, repo_path: str, period: str, rev: str = 'HEAD', now: Optional[int] = None) -> 'ChurnMatrix':
+        """Matrix for one of PERIODS ('7d', '30d', '90d', '1y' or 'all') ending now"""
+        lookback, bucket_seconds = PERIODS[period]
+        until = now if now is not None else int(datetime.now(timezone.utc).timestamp()) + 1
+        since = until - lookback if lookback else None
+        return cls.from_repository(repo_path, bucket_seconds, since=since, until=until, rev=rev)
+
+    @property
+    def churn(self) -> np.ndarray:
+        """Additions plus deletions per file and bucket"""
+        return self.additions + self.deletions
+
+    def bucket_range(self, start: Optional[int] = None, end: Optional[int] = None) -> slice:
+        """Column slice of the buckets overlapping the Unix time range start..end"""
+        first = 0 if start is None else int(np.searchsorted(self.bucket_starts + self.bucket_seconds, start, side='right'))
+        last = len(self.bucket_starts) if end is None else int(np.searchsorted(self.bucket_starts, end, side='left'))
+        return slice(first, max(first, last))
+
+    def slice(self, start: Optional[int] = None, end: Optional[int] = None) -> 'ChurnMatrix':
+        """Matrix restricted to the buckets overlapping start..end; arrays are views, not copies"""
+        columns = self.bucket_range(start, end)
+        return ChurnMatrix(
+            files=self.files,
+            bucket_starts=self.bucket_starts[columns],
+            bucket_seconds=self.bucket_seconds,
+            additions=self.additions[:, columns],
+            deletions=self.deletions[:, columns],
+            touches=self.touches[:, columns],
+            commits=self.commits[columns],
+            authors=self.authors[columns]
+        )
+
+    def top_files(self, n: int = 10, metric: str = 'churn') -> List[Dict]:
+        """
+        Files with the highest total over all buckets
+
+        Args:
+            n: Number of files
+            metric: 'churn', 'additions', 'deletions' or 'touches'
+
+        Returns:
+            Dicts with path and the additions, deletions, churn and touches totals, highest first
+        """
+        totals = self._file_totals()
+        values = totals[metric]
+        n = min(n, len(values))
+        if n <= 0:
+            return []
+        # Partial selection, then sort only the winners
+        top = np.argpartition(-values, n - 1)[:n]
+        top = top[np.argsort(-values[top], kind='stable')]
+        return [
+            {
+                'path': self.files[index],
+                **{name: int(column[index]) for name, column in totals.items()}
+            }
+            for index in top
+            if values[index] > 0
+        ]
+
+    def rolling(self, window: int, metric: str = 'churn') -> np.ndarray:
+        """
+        Sum of the last `window` buckets per file, for every bucket
+
+        Returns:
+            Array shaped like the matrix; column j covers buckets j-window+1..j
+
+        Raises:
+            ValueError: If window is not at least one bucket
+        """
+        if window < 1:
+            raise ValueError(f"Rolling window must be at least one bucket, got {window}")
+        values = self.churn if metric == 'churn' else getattr(self, metric)
+        totals = np.cumsum(values, axis=1)
+        if window < totals.shape[1]:
+            totals[:, window:] = totals[:, window:] - totals[:, :-window]
+        return totals
+
+    def bucket_totals(self) -> List[Dict]:
+        """Per-bucket activity: commits, distinct authors, files changed, additions and deletions"""
+        additions = self.additions.sum(axis=0)
+        deletions = self.deletions.sum(axis=0)
+        files_changed = np.count_nonzero(self.touches, axis=0)
+        return [
+            {
+                'date': datetime.fromtimestamp(int(start), timezone.utc).isoformat(),
+                'commits': int(self.commits[column]),
+                'authors': int(self.authors[column]),
+                'files_changed': int(files_changed[column]),
+                'additions': int(additions[column]),
+                'deletions': int(deletions[column])
+            }
+            for column, start in enumerate(self.bucket_starts)
+        ]
+
+    def totals_by_extension(self) -> List[Dict]:
+        """Additions and deletions grouped by file extension, highest churn first"""
+        totals = self._file_totals()
+        extensions = [self._extension(path) for path in self.files]
+        names, groups = np.unique(np.array(extensions, dtype=object), return_inverse=True)
+        result = []
+        for group, name in enumerate(names):
+            additions = int(totals['additions'][groups == group].sum())
+            deletions = int(totals['deletions'][groups == group].sum())
+            if additions or deletions:
+                result.append({'extension': name, 'additions': additions, 'deletions': deletions})
+        result.sort(key=lambda entry: entry['additions'] + entry['deletions'], reverse=True)
+        return result
+
+    def _file_totals(self) -> Dict[str, np.ndarray]:
+        additions = self.additions.sum(axis=1)
+        deletions = self.deletions.sum(axis=1)
+        return {
+            'additions': additions,
+            'deletions': deletions,
+            'churn': additions + deletions,
+            'touches': self.touches.sum(axis=1)
+        }
+
+    @staticmethod
+    def _extension(path: str) -> str:
+        name = path.rsplit('/', 1)[-1]
+        return name.rsplit('.', 1)[-1].lower() if '.' in name.lstrip('.') else ''
@@ -0,0 +1,491 @@
+"""
+Code Lexer
+Linear-time tokenization and structure scanning of C-family sources (JavaScript,
+TypeScript, Java, C, C++), and tokenization of Python for size metrics. Comments
+and string literals are consumed whole, so nothing inside them is ever mistaken
+for code.
+"""
+import keyword
+import re
+from collections import Counter
+from typing import Any, Dict, List, Tuple
+
+# Literals and comments are matched as unrolled, possessive loops, and every other
+# alternative is a short fixed shape, so scanning never backtracks. Unterminated
+# strings stop at the end of their line. Only the group is reported, so whitespace
+# and comments come back as '' and are filtered out.
+_BLOCK_COMMENT = r'/\*[^*]*+(?:\*(?!/)[^*]*+)*+(?:\*/)?'
+# A newline is reported as '\n' unless the line it starts holds no code (blank, or
+# only comments), so every '\n' token starts a source line; the lookahead only
+# reads that one line, or the comment it continues into
+_SKIP = r'''
+    \n(?=(?:[^\S\n]++|//[^\n]*+|''' + _BLOCK_COMMENT + r''')*+(?:\n|\Z))
+  | [^\S\n]+
+  | //[^\n]*
+  | ''' + _BLOCK_COMMENT + r'''
+'''
+_CAPTURE_NEWLINE = r'''
+  | \n
+'''
+_STRINGS = r'''
+  | "[^"\\\n]*+(?:\\.[^"\\\n]*+)*+"?
+  | '[^'\\\n]*+(?:\\.[^'\\\n]*+)*+'?
+'''
+_CODE = r'''
+  | [A-Za-z_$][\w$]*
+  | \d[\w$]*(?:\.\d[\w$]*)?
+  | =>|->|::|\?\.|\?\?|\?(?![.:?>,)])|&&|\|\||\+\+|--|<<=?|>>>?=?
+  | [-+*/%&|^!=<>]=?=?
+  | [{}()\[\];,.:~@]
+'''
+# JavaScript also has template literals and regex literals; a slash starts a regex
+# only where a value may begin, e.g. after '(' or '=', never after an operand
+_SCRIPT = r'''
+  | `[^`\\]*+(?:\\.[^`\\]*+)*+`?
+  | (?:(?<=[(,=:\[!&|?{;])|(?<=[(,=:\[!&|?{;]\s)|(?<=return\s)|\A)
+    /(?![*/])(?:[^/\\\n\[]|\\.|\[(?:[^\]\\\n]|\\.){0,64}+\])++/[a-z]*
+'''
+# Java text blocks span lines
+_TEXT_BLOCK = r'''
+  | """[^"\\]*+(?:(?:\\.|"(?!""))[^"\\]*+)*+"""
+'''
+# C and C++ preprocessor lines, with their backslash continuations, are single tokens;
+# outside strings and comments '#' only ever starts a directive
+_DIRECTIVE = r'''
+  | \#[^\n\\]*+(?:\\.[^\n\\]*+)*+
+'''
+# Python has '#' comments and explicit line joins instead, prefixed and triple-quoted
+# strings, and its own operators
+_PYTHON_SKIP = r'''
+    \n(?=(?:[^\S\n]++|\#[^\n]*+)*+(?:\n|\Z))
+  | [^\S\n]+
+  | \#[^\n]*
+  | \\\n
+'''
+_PYTHON = r'''
+  | [rRbBuUfF]{0,2}(?:
+        """[^"\\]*+(?:(?:\\.|"(?!""))[^"\\]*+)*+(?:""")?
+      | '{3}[^'\\]*+(?:(?:\\.|'(?!''))[^'\\]*+)*+(?:'{3})?
+      | "[^"\\\n]*+(?:\\.[^"\\\n]*+)*+"?
+      | '[^'\\\n]*+(?:\\.[^'\\\n]*+)*+'?
+    )
+  | [^\W\d]\w*
+  | \d[\w]*(?:\.\d\w*)?
+  | \*\*=?|//=?|<<=?|>>=?|->|:=|\.\.\.
+  | [-+*/%&|^@<>=!]=?
+  | [{}()\[\];,.:~]
+'''
+
+
+def _compile(*parts: str, skip: str = _SKIP) -> re.Pattern:
+    alternatives = ''.join(parts).strip().lstrip('|')
+    # Spaces after a token go with it, which saves a match per token and per indented line
+    return re.compile(skip + '|(' + alternatives + r')[^\S\n]*+', re.S | re.X)
+
+
+# Each pattern reports tokens and the '\n' of every line holding code
+TOKEN_PATTERNS = {
+    'javascript': _compile(_CAPTURE_NEWLINE, _SCRIPT, _STRINGS, _CODE),
+    'typescript': _compile(_CAPTURE_NEWLINE, _SCRIPT, _STRINGS, _CODE),
+    'java': _compile(_CAPTURE_NEWLINE, _TEXT_BLOCK, _STRINGS, _CODE),
+    'c': _compile(_CAPTURE_NEWLINE, _DIRECTIVE, _STRINGS, _CODE),
+    'cpp': _compile(_CAPTURE_NEWLINE, _DIRECTIVE, _STRINGS, _CODE),
+    'python': _compile(_CAPTURE_NEWLINE, _PYTHON, skip=_PYTHON_SKIP),
+}
+
+# Branches of the control flow graph: conditionals, loops, cases, handlers and
+# short-circuit operators; `else` and `default` add no new path
+DECISION_TOKENS = ('if', 'for', 'while', 'case', 'catch', '&&', '||', '??', '?')
+
+# Words that can precede '(' without naming a function
+NOT_FUNCTIONS = frozenset({
+    'if', 'for', 'while', 'switch', 'catch', 'return', 'sizeof', 'typeof', 'new', 'delete',
+    'do', 'else', 'case', 'throw', 'synchronized', 'await', 'yield', 'in', 'of', 'instanceof',
+    'void', 'super', 'this', 'alignof', 'decltype', 'static_assert', 'with', 'assert', 'defined'
+})
+CLASS_KEYWORDS = {
+    'javascript': frozenset({'class'}),
+    'typescript': frozenset({'class'}),
+    'java': frozenset({'class', 'interface', 'enum', 'record'}),
+    'c': frozenset(),
+    'cpp': frozenset({'class', 'struct'}),
+}
+# Words that start a declaration the walk handles specially
+_SCRIPT_WORDS = frozenset({'class', 'import', 'export', 'require', 'function', 'const', 'let', 'var'})
+SPECIAL_WORDS = {
+    'javascript': _SCRIPT_WORDS,
+    'typescript': _SCRIPT_WORDS,
+    'java': CLASS_KEYWORDS['java'] | {'import'},
+    'c': frozenset({'namespace', 'extern'}),
+    'cpp': CLASS_KEYWORDS['cpp'] | {'namespace', 'extern'},
+}
+NAME_START = frozenset('abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ_$')
+BRACKETS = frozenset('()[]{}')
+# Tokens allowed between a parameter list and the body: return types, qualifiers,
+# `throws` clauses and constructor initializer lists
+HEADER_PUNCTUATION = frozenset({'.', ',', ':', '::', '<', '>', '>>', '->', '*', '&', '&&', '|', '?'})
+# How far past a parameter list the body may start, in tokens
+HEADER_LOOKAHEAD = 256
+
+# Halstead operators are keywords and punctuation; names, numbers and literals are
+# operands. A bracket pair counts once, as its opener.
+_C_KEYWORDS = frozenset({
+    'auto', 'break', 'case', 'char', 'const', 'continue', 'default', 'do', 'double', 'else', 'enum',
+    'extern', 'float', 'for', 'goto', 'if', 'inline', 'int', 'long', 'register', 'restrict', 'return',
+    'short', 'signed', 'sizeof', 'static', 'struct', 'switch', 'typedef', 'union', 'unsigned', 'void',
+    'volatile', 'while', '_Bool', '_Alignas', '_Alignof', '_Atomic', '_Generic', '_Noreturn',
+    '_Static_assert', '_Thread_local'
+})
+_SCRIPT_KEYWORDS = frozenset({
+    'async', 'await', 'break', 'case', 'catch', 'class', 'const', 'continue', 'debugger', 'default',
+    'delete', 'do', 'else', 'export', 'extends', 'finally', 'for', 'from', 'function', 'if', 'import',
+    'in', 'instanceof', 'let', 'new', 'of', 'return', 'static', 'super', 'switch', 'throw', 'try',
+    'typeof', 'var', 'void', 'while', 'with', 'yield'
+})
+KEYWORDS = {
+    'javascript': _SCRIPT_KEYWORDS,
+    'typescript': _SCRIPT_KEYWORDS | {
+        'abstract', 'as', 'declare', 'enum', 'implements', 'interface', 'is', 'keyof', 'namespace',
+        'private', 'protected', 'public', 'readonly', 'satisfies', 'type'
+    },
+    'java': frozenset({
+        'abstract', 'assert', 'boolean', 'break', 'byte', 'case', 'catch', 'char', 'class', 'const',
+        'continue', 'default', 'do', 'double', 'else', 'enum', 'extends', 'final', 'finally', 'float',
+        'for', 'goto', 'if', 'implements', 'import', 'instanceof', 'int', 'interface', 'long', 'native',
+        'new', 'package', 'private', 'protected', 'public', 'record', 'return', 'short', 'static',
+        'strictfp', 'super', 'switch', 'synchronized', 'throw', 'throws', 'transient', 'try', 'var',
+        'void', 'volatile', 'while', 'yield'
+    }),
+    'c': _C_KEYWORDS,
+    'cpp': _C_KEYWORDS | {
+        'alignas', 'alignof', 'bool', 'catch', 'class', 'concept', 'consteval', 'constexpr', 'constinit',
+        'const_cast', 'co_await', 'co_return', 'co_yield', 'decltype', 'delete', 'dynamic_cast',
+        'explicit', 'export', 'friend', 'mutable', 'namespace', 'new', 'noexcept', 'operator', 'override',
+        'private', 'protected', 'public', 'reinterpret_cast', 'requires', 'static_assert', 'static_cast',
+        'template', 'throw', 'try', 'typeid', 'typename', 'using', 'virtual'
+    },
+    # True, False and None are values, so operands
+    'python': frozenset(keyword.kwlist) - {'True', 'False', 'None'},
+}
+# First characters of operator tokens; quotes start literals, so they are not here
+OPERATOR_START = frozenset('+-*/%=&|^!~<>?:;,.([{@#\\')
+CLOSERS = frozenset(')]}')
+
+INCLUDE = re.compile(r'#\s*include\s*[<"]([^>"]+)[>"]')
+
+
+def lex(content: str, language: str) -> Tuple[List[str], int]:
+    """
+    Split a source file into tokens and count its source lines, in one linear pass
+
+    Args:
+        content: Source text
+        language: 'javascript', 'typescript', 'java', 'c', 'cpp' or 'python'
+
+    Returns:
+        Identifiers, keywords, numbers, literals (with their quotes), operators and
+        punctuation in source order, and how many lines hold code; C and C++
+        directives are single tokens, and a literal spanning lines counts once
+    """
+    found = TOKEN_PATTERNS[language].findall(content)
+    source_lines = found.count('\n')
+    # Every token starts with a printable character, so this drops '' and '\n' alone, at C speed
+    tokens = list(filter('\n'.__lt__, found))
+    # The first line has no '\n' token of its own
+    if tokens and next(filter(None, found)) != '\n':
+        source_lines += 1
+    return tokens, source_lines
+
+
+def tokenize(content: str, language: str) -> List[str]:
+    """Tokens of a source file, see lex"""
+    return lex(content, language)[0]
+
+
+def match_brackets(tokens: List[str]) -> List[int]:
+    """Index of the matching bracket for every (, [, {, ), ] and }, or -1 if it is unbalanced"""
+    pairs = [-1] * len(tokens)
+    # One stack per bracket kind, so a stray bracket of one kind cannot unbalance the others
+    stacks = {'(': [], '[': [], '{': []}
+    stacks.update({')': stacks['('], ']': stacks['['], '}': stacks['{']})
+    for index, token in enumerate(tokens):
+        if token not in BRACKETS:
+            continue
+        stack = stacks[token]
+        if token in '([{':
+            stack.append(index)
+        elif stack:
+            opener = stack.pop()
+            pairs[opener] = index
+            pairs[index] = opener
+    return pairs
+
+
+def count_decisions(counts: Counter) -> int:
+    """Cyclomatic complexity: one plus the decision points, from Counter(tokens)"""
+    return 1 + sum(counts[token] for token in DECISION_TOKENS)
+
+
+def measure(counts: Counter, source_lines: int, language: str) -> Dict[str, Any]:
+    """
+    Size metrics of a file from Counter(tokens) and its source line count
+
+    Only the distinct tokens are classified, so this costs nothing per token on
+    top of the Counter the caller already built.
+
+    Returns:
+        Dict with source_lines, and halstead: [distinct operators, distinct
+        operands, total operators, total operands]
+    """
+    keywords = KEYWORDS[language]
+    distinct_operators = distinct_operands = total_operators = total_operands = 0
+    directives = 0
+    for token, count in counts.items():
+        if token in CLOSERS:
+            continue
+        if token[0] == '#':
+            # Whole preprocessor lines are single tokens; count them as one operator
+            directives += count
+        elif token[0] in OPERATOR_START or token in keywords:
+            distinct_operators += 1
+            total_operators += count
+        else:
+            distinct_operands += 1
+            total_operands += count
+    if directives:
+        distinct_operators += 1
+        total_operators += directives
+    return {
+        'source_lines': source_lines,
+        'halstead': [distinct_operators, distinct_operands, total_operators, total_operands]
+    }
+
+
+def scan_structure(tokens: List[str], language: str) -> Dict[str, List]:
+    """
+    Find classes, functions and imports in one walk over the tokens
+
+    Brace depth is tracked with what each brace opened, so methods are only taken
+    from class bodies and C/C++ functions only outside other functions. Where each
+    function header ends is remembered, and every other lookahead is bounded, so
+    the walk stays linear.
+
+    Args:
+        tokens: Output of tokenize
+        language: Language the tokens were produced for
+
+    Returns:
+        Dict with 'classes' ({'name', 'methods'}), 'functions' and 'imports' (names);
+        C and C++ includes are reported as imports
+    """
+    pairs = match_brackets(tokens)
+    header_ends: Dict[int, int] = {}
+    script = language in ('javascript', 'typescript')
+    native = language in ('c', 'cpp')
+    class_keywords = CLASS_KEYWORDS[language]
+    special_words = SPECIAL_WORDS[language]
+
+    classes: List[Dict[str, Any]] = []
+    functions: List[str] = []
+    imports: List[str] = []
+    # One entry per open brace: 'function', 'namespace', 'block', or the class dict
+    scopes: List[Any] = []
+    pending: Any = None  # what the next '{' opens
+    count = len(tokens)
+    index = 0
+
+    while index < count:
+        token = tokens[index]
+        head = token[0]
+
+        if head in NAME_START:
+            if token in special_words:
+                after = tokens[index + 1] if index + 1 < count else ''
+                before = tokens[index - 1] if index else ''
+                if token in class_keywords and before not in ('.', 'enum', '<', ',') and _is_name(after) \
+                        and after not in ('extends', 'implements'):
+                    if token == 'record' and tokens[index + 2:index + 3] not in (['('], ['<']):
+                        index += 1
+                        continue
+                    # Recorded once its body opens, so forward declarations are not classes
+                    pending = {'name': after, 'methods': []}
+                    index += 2
+                    continue
+
+                if token == 'class':
+                    pending = {'name': None, 'methods': []}
+                elif token == 'namespace' or token == 'extern':
+                    if not isinstance(pending, dict):
+                        pending = 'namespace'
+                elif token == 'import' and before != '.' or token == 'export' and after in ('*', '{'):
+                    end = _scan_import(tokens, pairs, index, language, imports)
+                    if end > index:
+                        index = end
+                        continue
+                elif token == 'require':
+                    if after == '(' and index + 3 < count and tokens[index + 3] == ')' and _is_string(tokens[index + 2]):
+                        imports.append(tokens[index + 2][1:-1])
+                elif token == 'function':
+                    start = index + 1
+                    if start < count and tokens[start] == '*':
+                        start += 1
+                    if start + 1 < count and _is_name(tokens[start]) and tokens[start + 1] == '(':
+                        functions.append(tokens[start])
+                        start += 1
+                    if start < count and tokens[start] == '(':
+                        body = _find_body(tokens, pairs, header_ends, start)
+                        if body > 0:
+                            pending = 'function'
+                            index = body
+                            continue
+                elif token in ('const', 'let', 'var'):
+                    if index + 2 < count and tokens[index + 2] == '=' and _is_name(after) \
+                            and _is_function_value(tokens, pairs, index + 3):
+                        functions.append(after)
+            elif index + 1 < count and tokens[index + 1] == '(' and token not in NOT_FUNCTIONS \
+                    and (tokens[index - 1] if index else '') not in ('.', '->', 'new', '@', 'function') \
+                    and not (script and isinstance(pending, dict)):
+                body = _find_body(tokens, pairs, header_ends, index + 1)
+                if body > 0:
+                    scope = scopes[-1] if scopes else None
+                    if isinstance(scope, dict):
+                        scope['methods'].append(token)
+                    if native and (scope is None or scope == 'namespace' or isinstance(scope, dict)):
+                        functions.append(token)
+                    pending = 'function'
+                    index = body
+                    continue
+        elif token == '{':
+            scope = pending or 'block'
+            if isinstance(scope, dict) and scope['name']:
+                classes.append(scope)
+            scopes.append(scope)
+            pending = None
+        elif token == '}':
+            if scopes:
+                scopes.pop()
+            pending = None
+        elif token == ';':
+            pending = None
+        elif token == '=>':
+            if script and index + 1 < count and tokens[index + 1] == '{':
+                pending = 'function'
+        elif head == '#':
+            if native:
+                match = INCLUDE.match(token)
+                if match:
+                    imports.append(match.group(1))
+
+        index += 1
+
+    return {'classes': classes, 'functions': functions, 'imports': imports}
+
+
+def _is_name(token: str) -> bool:
+    return bool(token) and token[0] in NAME_START
+
+
+def _is_string(token: str) -> bool:
+    return len(token) >= 2 and token[0] in '"\'`' and token[-1] == token[0]
+
+
+def _find_body(tokens: List[str], pairs: List[int], header_ends: Dict[int, int], open_paren: int) -> int:
+    """
+    Index of the '{' opening the body of the parameter list at open_paren, or -1
+
+    The header runs until the first token that cannot be part of one, stepping over
+    balanced (...) and [...] such as noexcept(...), __attribute__((...)) or an
+    initializer a(1). Where a header continuing from a position ends does not depend
+    on where it started, so header_ends remembers it for every position walked and
+    no token is walked twice, however many call sites share the same tail.
+    """
+    close = pairs[open_paren]
+    if close < 0:
+        return -1
+    count = len(tokens)
+    position = close + 1
+    walked = []
+    end = count
+    while position < count:
+        known = header_ends.get(position)
+        if known is not None:
+            end = known
+            break
+        walked.append(position)
+        token = tokens[position]
+        if token == '(' or token == '[':
+            if pairs[position] < position:
+                end = position
+                break
+            position = pairs[position] + 1
+        elif token in HEADER_PUNCTUATION or token[0] in NAME_START:
+            position += 1
+        else:
+            end = position
+            break
+    for position in walked:
+        header_ends[position] = end
+
+    if end < count and tokens[end] == '{' and end - close <= HEADER_LOOKAHEAD:
+        return end
+    return -1
+
+
+def _is_function_value(tokens: List[str], pairs: List[int], index: int) -> bool:
+    """Whether the expression at index is a function: `function`, `(...) =>` or `x =>`"""
+    count = len(tokens)
+    if index < count and tokens[index] == 'async':
+        index += 1
+    if index >= count:
+        return False
+    if tokens[index] == 'function':
+        return True
+    if tokens[index] == '(' and pairs[index] > 0:
+        index = pairs[index] + 1
+        # TypeScript return type annotation before the arrow
+        if index < count and tokens[index] == ':':
+            limit = min(count, index + HEADER_LOOKAHEAD)
+            while index < limit and tokens[index] != '=>' and (tokens[index] in HEADER_PUNCTUATION or _is_name(tokens[index])):
+                index += 1
+        return index < count and tokens[index] == '=>'
+    return _is_name(tokens[index]) and index + 1 < count and tokens[index + 1] == '=>'
+
+
+def _scan_import(tokens: List[str], pairs: List[int], index: int, language: str, imports: List[str]) -> int:
+    """Record the module of the import or re-export at index; returns where to resume, or index"""
+    count = len(tokens)
+    if language == 'java':
+        # import [static] a.b.C; the name is every token up to the semicolon
+        parts = []
+        position = index + 1
+        while position < count and tokens[position] != ';' and len(parts) < HEADER_LOOKAHEAD:
+            if tokens[position] != 'static':
+                parts.append(tokens[position])
+            position += 1
+        if parts:
+            imports.append(''.join(parts))
+        return position
+
+    if tokens[index] == 'import' and index + 2 < count and tokens[index + 1] == '(':
+        # Dynamic import('module')
+        if _is_string(tokens[index + 2]):
+            imports.append(tokens[index + 2][1:-1])
+        return index
+
+    # import ... from 'module', import 'module', export ... from 'module'
+    position = index + 1
+    reexport = tokens[index] == 'export'
+    limit = min(count, position + HEADER_LOOKAHEAD)
+    while position < limit:
+        token = tokens[position]
+        if token == '{' and pairs[position] > 0:
+            position = pairs[position] + 1
+            continue
+        if _is_string(token):
+            if not reexport or tokens[position - 1] == 'from':
+                imports.append(token[1:-1])
+            return position + 1
+        if token in (';', 'import', 'export', '}') or token == '{':
+            return position
+        position += 1
+    return index
@@ -0,0 +1,71 @@
+"""
+Code Lint
+Style checks that need only the text of a file, run in the same worker pass as
+parsing: long lines, trailing whitespace, mixed indentation and open TODO
+markers, plus detection of generated and minified files.
+"""
+import re
+from typing import Dict, List
+
+LINE_LIMIT = 120
+
+# Rules run over the lines, or only on files a substring search shows they can match,
+# so they add little to a parse
+_MIXED_INDENTATION = re.compile(r' ++\t|\t++ ')
+_TODO_MARKERS = ('TODO', 'FIXME', 'XXX', 'HACK')
+_TODO = re.compile(r'(?:TODO|FIXME|XXX|HACK)\b')
+
+# Headers code generators write: a comment line opening with a generated-file notice
+_GENERATED = re.compile(
+    r'^[^\w\n]*(?:@generated|code generated by|generated by the protocol buffer compiler'
+    r'|(?:this (?:file|code) (?:is|was) )?(?:auto(?:matically)?[- ]?)?generated (?:by|from|for)\b)',
+    re.IGNORECASE | re.MULTILINE
+)
+GENERATED_HEADER_LINES = 5
+# Minified code is a few very long lines
+MINIFIED_MIN_CHARS = 2048
+MINIFIED_LINE_CHARS = 500
+
+RULES = {
+    'long_line': f"lines longer than {LINE_LIMIT} characters",
+    'trailing_whitespace': "lines with trailing whitespace",
+    'mixed_indentation': "lines indented with both tabs and spaces",
+    'todo': "TODO, FIXME, XXX or HACK markers",
+}
+
+
+def lint(content: str) -> Dict[str, List[int]]:
+    """
+    Run every rule over a file.
+
+    :param content: File content
+    :return: Rule name -> [number of matches, line of the first match], for rules that matched
+    """
+    lines = content.splitlines()
+    found: Dict[str, List[int]] = {}
+    checks = [
+        ('long_line', [number for number, line in enumerate(lines, 1) if len(line) > LINE_LIMIT]),
+        ('trailing_whitespace', [number for number, line in enumerate(lines, 1) if line.endswith((' ', '\t'))]),
+    ]
+    # Most files hold no tabs and no markers, which plain substring searches rule out
+    if '\t' in content:
+        checks.append(('mixed_indentation', [
+            number for number, line in enumerate(lines, 1) if _MIXED_INDENTATION.match(line)
+        ]))
+    for rule, numbers in checks:
+        if numbers:
+            found[rule] = [len(numbers), numbers[0]]
+    if any(marker in content for marker in _TODO_MARKERS):
+        offsets = [match.start() for match in _TODO.finditer(content)]
+        if offsets:
+            # Only the first marker's line number is worked out
+            found['todo'] = [len(offsets), content.count('\n', 0, offsets[0]) + 1]
+    return found
+
+
+def is_generated(content: str) -> bool:
+    """Whether a file says it was generated, or looks minified"""
+    header = content[:1024].split('\n', GENERATED_HEADER_LINES)[:GENERATED_HEADER_LINES]
+    if _GENERATED.search('\n'.join(header)):
+        return True
+    return len(content) >= MINIFIED_MIN_CHARS and content.count('\n') + 1 < len(content) // MINIFIED_LINE_CHARS
@@ -4,9 +4,129 @@ Analyzes and parses code structure from git repositories.
 """
 
 import ast
+import asyncio
+import atexit
+import hashlib
+import multiprocessing
+import os
 import re
-from typing import Dict, List, Any, Optional
+import signal
+import threading
+import time
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import contextmanager
+from itertools import islice
+from typing import Dict, List, Any, Optional, AsyncIterator, Iterable, Iterator, Tuple
 from pathlib import Path
+from app.core.config import settings
+from app.services.git.blob_reader import BlobReader
+from app.services.git.code_lexer import count_decisions, lex, measure, scan_structure
+from app.services.git.code_lint import is_generated, lint
+from app.services.git.parse_cache import get_parse_cache
+from app.services.git.tree_reader import TreeReader
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Files per pool task, and a byte cap so one task never carries huge payloads
+CHUNK_FILES = 64
+CHUNK_BYTES = 4 * 1024 * 1024
+# Files hashed and looked up in the parse cache per step, so input is consumed a batch at a time
+BATCH_FILES = 256
+# Timeouts depend on load, size skips on the limit, missing blobs on what was fetched and deadline
+# skips on when the run started, so none is cached
+_UNCACHED_SKIPS = ('too_large', 'missing', 'deadline')
+
+# Bump whenever parse results change shape or content; cached results of older versions are ignored
+PARSER_VERSION = 6
+
+# Nodes that each add one path through the code
+_DECISION_NODES = frozenset({ast.If, ast.IfExp, ast.For, ast.AsyncFor, ast.While, ast.ExceptHandler, ast.match_case})
+
+
+class _PythonStructureVisitor(ast.NodeVisitor):
+    """Collect classes, functions, imports and complexity in one pass, tracking the enclosing scope."""
+    
+    def __init__(self):
+        self.classes: List[Dict[str, Any]] = []
+        self.functions: List[Dict[str, Any]] = []
+        self.nested_functions: List[Dict[str, Any]] = []
+        self.imports: List[str] = []
+        # Cyclomatic complexity of the whole module
+        self.complexity = 1
+        # (kind, qualified name) of every enclosing class and function
+        self._scopes: List[tuple] = []
+    
+    def generic_visit(self, node: ast.AST):
+        # Docstrings, comments and string contents are never nodes, so they cannot count
+        kind = type(node)
+        if kind in _DECISION_NODES:
+            self.complexity += 1
+        elif kind is ast.BoolOp:
+            self.complexity += len(node.values) - 1
+        elif kind is ast.comprehension:
+            self.complexity += 1 + len(node.ifs)
+        
+        # ast.NodeVisitor.generic_visit without the iter_fields generator; this runs for every node
+        for field in node._fields:
+            value = getattr(node, field, None)
+            if isinstance(value, list):
+                for item in value:
+                    if isinstance(item, ast.AST):
+                        self.visit(item)
+            elif isinstance(value, ast.AST):
+                self.visit(value)
+    
+    def _qualname(self, name: str) -> str:
+        return '.'.join([scope_name for _, scope_name in self._scopes] + [name])
+    
+    def visit_ClassDef(self, node: ast.ClassDef):
+        self.classes.append({
+            'name': node.name,
+            'qualname': self._qualname(node.name),
+            'line': node.lineno,
+            'methods': [
+                n.name for n in node.body
+                if isinstance(n, (ast.FunctionDef, ast.AsyncFunctionDef))
+            ],
+            'docstring': ast.get_docstring(node)
+        })
+        self._scopes.append(('class', node.name))
+        self.generic_visit(node)
+        self._scopes.pop()
+    
+    def visit_FunctionDef(self, node):
+        if not self._scopes:
+            self.functions.append({
+                'name': node.name,
+                'line': node.lineno,
+                'args': [arg.arg for arg in node.args.posonlyargs + node.args.args],
+                'docstring': ast.get_docstring(node),
+                'async': isinstance(node, ast.AsyncFunctionDef)
+            })
+        elif self._scopes[-1][0] == 'function':
+            # Methods are listed with their class; functions inside functions are listed here
+            self.nested_functions.append({
+                'name': node.name,
+                'qualname': self._qualname(node.name),
+                'line': node.lineno,
+                'async': isinstance(node, ast.AsyncFunctionDef)
+            })
+        self._scopes.append(('function', node.name))
+        self.generic_visit(node)
+        self._scopes.pop()
+    
+    visit_AsyncFunctionDef = visit_FunctionDef
+    
+    def visit_Import(self, node: ast.Import):
+        self.imports.extend(alias.name for alias in node.names)
+    
+    def visit_ImportFrom(self, node: ast.ImportFrom):
+        # Relative imports keep their leading dots, e.g. '..models' or '.'
+        self.imports.append('.' * node.level + (node.module or ''))
+
 
 class CodeParser:
     """Parse and analyze code structure."""
@@ -23,138 +143,236 @@ class CodeParser:
     
     async def parse_file(self, file_path: str, content: str) -> Dict[str, Any]:
         """Parse a single file and extract structure."""
+        # Parsing is CPU-bound; keep it off the event loop
+        return await asyncio.to_thread(self.parse_source, file_path, content)
+    
+    def parse_source(self, file_path: str, content: str) -> Dict[str, Any]:
+        """Parse a single file synchronously."""
         extension = Path(file_path).suffix.lower()
         
         if extension in self.language_parsers:
-            return await self.language_parsers[extension](content, file_path)
+            result = self.language_parsers[extension](content, file_path)
+            # Text-only checks ride along, so quality analysis never reads a file twice
+            result['lint'] = lint(content)
+            if is_generated(content):
+                result['generated'] = True
+            return result
         
         # Default parsing for unknown file types
-        return await self._parse_generic(content, file_path)
+        return self._parse_generic(content, file_path)
     
-    async def _parse_python(self, content: str, file_path: str) -> Dict[str, Any]:
+    async def parse_files(
+        self,
+        files: Iterable[Tuple[str, str]],
+        timeout: Optional[float] = None,
+        max_size: Optional[int] = -1,
+        use_cache: bool = True,
+        deadline: Optional[float] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Parse many files on the shared process pool.
+        
+        :param files: (file_path, content) pairs, consumed lazily
+        :param timeout: Per-file limit in seconds, defaults to PARSE_TIMEOUT_SECONDS
+        :param max_size: Skip larger files (bytes), defaults to MAX_FILE_SIZE_MB, None for no limit
+        :param use_cache: Reuse and store results in the parse cache, keyed by blob SHA
+        :param deadline: Unix time after which workers skip files they have not started
+        :return: Async iterator of parse results with a 'path' key, in completion order
+        """
+        files = iter(files)
+        
+        async def batches() -> AsyncIterator[List[Tuple[str, str, Any]]]:
+            while True:
+                # Encoding and hashing are CPU work, done off the event loop a batch at a time
+                batch = await asyncio.to_thread(_hash_batch, files)
+                if not batch:
+                    return
+                yield batch
+        
+        async for result in _parse_cached(batches(), None, timeout, max_size, use_cache, deadline):
+            yield result
+    
+    async def parse_repository(
+        self,
+        repo_path: str,
+        rev: str = 'HEAD',
+        extensions: Optional[Iterable[str]] = None,
+        timeout: Optional[float] = None,
+        max_size: Optional[int] = -1,
+        use_cache: bool = True,
+        paths: Optional[Iterable[str]] = None,
+        deadline: Optional[float] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Parse every supported file of a revision on the shared process pool.
+        
+        Workers read the blobs straight from the object database themselves, so
+        file contents never pass through this process and no checkout is needed.
+        With the cache, re-analyzing a revision only parses blobs never seen before.
+        
+        :param repo_path: Path to repository, bare mirrors work
+        :param rev: Revision to parse
+        :param extensions: Extensions to parse, defaults to those with a language parser
+        :param timeout: Per-file limit in seconds, defaults to PARSE_TIMEOUT_SECONDS
+        :param max_size: Skip larger files (bytes), defaults to MAX_FILE_SIZE_MB, None for no limit
+        :param use_cache: Reuse and store results in the parse cache, keyed by blob SHA
+        :param paths: Only parse these paths, e.g. the files a commit changed
+        :param deadline: Unix time after which workers skip files they have not started
+        :return: Async iterator of parse results with a 'path' key, in completion order
+        """
+        if max_size == -1:
+            max_size = settings.MAX_FILE_SIZE_MB * 1024 * 1024
+        wanted = set(extensions or self.language_parsers)
+        only = set(paths) if paths is not None else None
+        
+        files = await asyncio.to_thread(TreeReader(repo_path, rev).list_files)
+        
+        results = []
+        entries = []
+        for entry in files:
+            if Path(entry['path']).suffix.lower() not in wanted:
+                continue
+            if only is not None and entry['path'] not in only:
+                continue
+            if max_size is not None and entry['size'] > max_size:
+                # Known from the tree listing, no need to ship these to a worker
+                results.append({'path': entry['path'], 'skipped': 'too_large', 'file_size': entry['size']})
+            else:
+                entries.append((entry['path'], entry['sha']))
+        
+        for result in results:
+            yield result
+        async for result in self.parse_blobs(repo_path, entries, timeout, max_size, use_cache, deadline):
+            yield result
+    
+    async def parse_blobs(
+        self,
+        repo_path: str,
+        blobs: Iterable[Tuple[str, str]],
+        timeout: Optional[float] = None,
+        max_size: Optional[int] = -1,
+        use_cache: bool = True,
+        deadline: Optional[float] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Parse known blobs, e.g. the new side of a diff, without listing the tree.
+        
+        :param repo_path: Path to repository, bare mirrors work
+        :param blobs: (file_path, blob SHA) pairs, consumed lazily; the path picks the parser
+        :param timeout: Per-file limit in seconds, defaults to PARSE_TIMEOUT_SECONDS
+        :param max_size: Skip larger files (bytes), defaults to MAX_FILE_SIZE_MB, None for no limit
+        :param use_cache: Reuse and store results in the parse cache, keyed by blob SHA
+        :param deadline: Unix time after which workers skip files they have not started
+        :return: Async iterator of parse results with a 'path' key, in completion order
+        """
+        blobs = iter(blobs)
+        
+        async def batches() -> AsyncIterator[List[Tuple[str, str, Any]]]:
+            # Workers read the blob themselves, so the SHA doubles as the payload
+            while True:
+                batch = [(path, sha, sha) for path, sha in islice(blobs, BATCH_FILES)]
+                if not batch:
+                    return
+                yield batch
+        
+        async for result in _parse_cached(batches(), repo_path, timeout, max_size, use_cache, deadline):
+            yield result
+    
+    def _parse_python(self, content: str, file_path: str) -> Dict[str, Any]:
         """Parse Python code structure."""
         try:
             tree = ast.parse(content)
             
-            classes = []
-            functions = []
-            imports = []
-            
-            for node in ast.walk(tree):
-                if isinstance(node, ast.ClassDef):
-                    methods = [n.name for n in node.body if isinstance(n, ast.FunctionDef)]
-                    classes.append({
-                        'name': node.name,
-                        'line': node.lineno,
-                        'methods': methods,
-                        'docstring': ast.get_docstring(node)
-                    })
-                elif isinstance(node, ast.FunctionDef):
-                    # Only top-level functions
-                    if not any(isinstance(parent, ast.ClassDef) for parent in ast.walk(tree)):
-                        functions.append({
-                            'name': node.name,
-                            'line': node.lineno,
-                            'args': [arg.arg for arg in node.args.args],
-                            'docstring': ast.get_docstring(node)
-                        })
-                elif isinstance(node, (ast.Import, ast.ImportFrom)):
-                    if isinstance(node, ast.Import):
-                        imports.extend([alias.name for alias in node.names])
-                    else:
-                        imports.append(node.module)
+            # Single pass over the tree; the visitor knows each node's enclosing scope
+            visitor = _PythonStructureVisitor()
+            visitor.visit(tree)
+            # Complexity comes from the tree; sizes from one pass of the lexer
+            tokens, source_lines = lex(content, 'python')
             
             return {
                 'language': 'python',
-                'classes': classes,
-                'functions': functions,
-                'imports': imports,
+                'classes': visitor.classes,
+                'functions': visitor.functions,
+                'nested_functions': visitor.nested_functions,
+                'imports': visitor.imports,
                 'lines_of_code': len(content.splitlines()),
-                'complexity': self._calculate_complexity(content)
+                'complexity': visitor.complexity,
+                'metrics': measure(Counter(tokens), source_lines, 'python')
             }
         except Exception as e:
             return {'error': str(e), 'language': 'python'}
     
-    async def _parse_javascript(self, content: str, file_path: str) -> Dict[str, Any]:
+    def _parse_javascript(self, content: str, file_path: str, language: str = 'javascript') -> Dict[str, Any]:
         """Parse JavaScript code structure."""
-        # Simplified JS parsing using regex
-        function_pattern = r'(?:function\s+(\w+)|const\s+(\w+)\s*=\s*(?:async\s*)?\([^)]*\)\s*=>)'
-        class_pattern = r'class\s+(\w+)'
-        import_pattern = r'import\s+.*?from\s+[\'"]([^\'\"]+)[\'"]'
-        
-        functions = re.findall(function_pattern, content)
-        classes = re.findall(class_pattern, content)
-        imports = re.findall(import_pattern, content)
+        tokens, source_lines = lex(content, language)
+        structure = scan_structure(tokens, language)
+        counts = Counter(tokens)
         
         return {
-            'language': 'javascript',
-            'classes': [{'name': c} for c in classes],
-            'functions': [{'name': f[0] or f[1]} for f in functions],
-            'imports': imports,
+            'language': language,
+            'classes': structure['classes'],
+            'functions': [{'name': f} for f in structure['functions']],
+            'imports': structure['imports'],
             'lines_of_code': len(content.splitlines()),
-            'complexity': self._calculate_complexity(content)
+            'complexity': count_decisions(counts),
+            'metrics': measure(counts, source_lines, language)
         }
     
-    async def _parse_typescript(self, content: str, file_path: str) -> Dict[str, Any]:
+    def _parse_typescript(self, content: str, file_path: str) -> Dict[str, Any]:
         """Parse TypeScript code structure."""
-        # Similar to JavaScript but with type annotations
-        return await self._parse_javascript(content, file_path)
+        # Same structure as JavaScript; the lexer skips over type annotations
+        return self._parse_javascript(content, file_path, language='typescript')
     
-    async def _parse_java(self, content: str, file_path: str) -> Dict[str, Any]:
+    def _parse_java(self, content: str, file_path: str) -> Dict[str, Any]:
         """Parse Java code structure."""
-        class_pattern = r'(?:public\s+)?(?:abstract\s+)?class\s+(\w+)'
-        method_pattern = r'(?:public|private|protected)?\s*(?:static\s+)?(?:\w+\s+)?(\w+)\s*\([^)]*\)\s*{'
-        import_pattern = r'import\s+([\w\.]+);'
-        
-        classes = re.findall(class_pattern, content)
-        methods = re.findall(method_pattern, content)
-        imports = re.findall(import_pattern, content)
+        tokens, source_lines = lex(content, 'java')
+        structure = scan_structure(tokens, 'java')
+        counts = Counter(tokens)
+        classes = structure['classes']
         
         return {
             'language': 'java',
-            'classes': [{'name': c} for c in classes],
-            'methods': [{'name': m} for m in methods if m not in classes],
-            'imports': imports,
+            'classes': classes,
+            # Constructors are listed with their class only
+            'methods': [{'name': m} for c in classes for m in c['methods'] if m != c['name']],
+            'imports': structure['imports'],
             'lines_of_code': len(content.splitlines()),
-            'complexity': self._calculate_complexity(content)
+            'complexity': count_decisions(counts),
+            'metrics': measure(counts, source_lines, 'java')
         }
     
-    async def _parse_cpp(self, content: str, file_path: str) -> Dict[str, Any]:
+    def _parse_cpp(self, content: str, file_path: str) -> Dict[str, Any]:
         """Parse C++ code structure."""
-        class_pattern = r'class\s+(\w+)'
-        function_pattern = r'(?:\w+\s+)*(\w+)\s*\([^)]*\)\s*{'
-        include_pattern = r'#include\s*[<"]([^>"]+)[>"]'
-        
-        classes = re.findall(class_pattern, content)
-        functions = re.findall(function_pattern, content)
-        includes = re.findall(include_pattern, content)
+        tokens, source_lines = lex(content, 'cpp')
+        structure = scan_structure(tokens, 'cpp')
+        counts = Counter(tokens)
         
         return {
             'language': 'cpp',
-            'classes': [{'name': c} for c in classes],
-            'functions': [{'name': f} for f in functions],
-            'includes': includes,
+            'classes': structure['classes'],
+            'functions': [{'name': f} for f in structure['functions']],
+            'includes': structure['imports'],
             'lines_of_code': len(content.splitlines()),
-            'complexity': self._calculate_complexity(content)
+            'complexity': count_decisions(counts),
+            'metrics': measure(counts, source_lines, 'cpp')
         }
     
-    async def _parse_c(self, content: str, file_path: str) -> Dict[str, Any]:
+    def _parse_c(self, content: str, file_path: str) -> Dict[str, Any]:
         """Parse C code structure."""
-        function_pattern = r'(?:\w+\s+)*(\w+)\s*\([^)]*\)\s*{'
-        include_pattern = r'#include\s*[<"]([^>"]+)[>"]'
-        
-        functions = re.findall(function_pattern, content)
-        includes = re.findall(include_pattern, content)
+        tokens, source_lines = lex(content, 'c')
+        structure = scan_structure(tokens, 'c')
+        counts = Counter(tokens)
         
         return {
             'language': 'c',
-            'functions': [{'name': f} for f in functions],
-            'includes': includes,
+            'functions': [{'name': f} for f in structure['functions']],
+            'includes': structure['imports'],
             'lines_of_code': len(content.splitlines()),
-            'complexity': self._calculate_complexity(content)
+            'complexity': count_decisions(counts),
+            'metrics': measure(counts, source_lines, 'c')
         }
     
-    async def _parse_generic(self, content: str, file_path: str) -> Dict[str, Any]:
+    def _parse_generic(self, content: str, file_path: str) -> Dict[str, Any]:
         """Generic parsing for unknown file types."""
         return {
             'language': 'unknown',
@@ -162,17 +380,6 @@ class CodeParser:
             'file_size': len(content)
         }
     
-    def _calculate_complexity(self, content: str) -> int:
-        """Calculate cyclomatic complexity (simplified)."""
-        # Count decision points
-        complexity = 1
-        decision_keywords = ['if', 'elif', 'else', 'for', 'while', 'case', 'catch', 'except']
-        
-        for keyword in decision_keywords:
-            complexity += len(re.findall(rf'\b{keyword}\b', content))
-        
-        return complexity
-    
     async def extract_documentation(self, content: str, language: str) -> List[Dict[str, str]]:
         """Extract documentation from code."""
         docs = []
@@ -194,3 +401,261 @@ class CodeParser:
         docs.extend([{'type': 'comment', 'content': c.strip()} for c in multi_comments])
         
         return docs
+
+
+class ParseTimeout(BaseException):
+    """A single file took longer than the per-file parse timeout."""
+    # BaseException, so the parsers' own `except Exception` handlers can't swallow it
+
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_workers = 0
+_pool_lock = threading.Lock()
+_worker_parser: Optional[CodeParser] = None
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    """Shared parse pool, created on first use."""
+    global _pool, _pool_workers
+    with _pool_lock:
+        if _pool is None:
+            _pool_workers = settings.PARSE_WORKERS or os.cpu_count() or 1
+            # spawn: forking a server process with live threads and pipes is unsafe
+            _pool = ProcessPoolExecutor(
+                max_workers=_pool_workers,
+                mp_context=multiprocessing.get_context('spawn')
+            )
+        return _pool
+
+
+def shutdown_pool():
+    """Stop the parse worker processes."""
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+atexit.register(shutdown_pool)
+
+
+def _chunk(items: Iterable[Tuple[Any, ...]]) -> Iterator[List[Tuple[Any, ...]]]:
+    """Group items whose last element is the payload by count, and by size for byte payloads."""
+    chunk, size = [], 0
+    for item in items:
+        chunk.append(item)
+        if isinstance(item[-1], bytes):
+            size += len(item[-1])
+        if len(chunk) >= CHUNK_FILES or size >= CHUNK_BYTES:
+            yield chunk
+            chunk, size = [], 0
+    if chunk:
+        yield chunk
+
+
+def _blob_sha(data: bytes) -> str:
+    """SHA git would give this content as a blob"""
+    return hashlib.sha1(b'blob %d\0' % len(data) + data).hexdigest()
+
+
+def _hash_batch(files: Iterator[Tuple[str, str]]) -> List[Tuple[str, str, bytes]]:
+    """Encode and hash the next (path, content) pairs, up to BATCH_FILES or CHUNK_BYTES of content"""
+    batch, size = [], 0
+    for path, content in files:
+        data = content.encode('utf-8')
+        batch.append((path, _blob_sha(data), data))
+        size += len(data)
+        if len(batch) >= BATCH_FILES or size >= CHUNK_BYTES:
+            break
+    return batch
+
+
+def _parser_key(path: str) -> str:
+    """Cache key part naming the parser a path is routed to, and its version"""
+    return f"{Path(path).suffix.lower()}@{PARSER_VERSION}"
+
+
+async def _parse_cached(
+    batches: AsyncIterator[List[Tuple[str, str, Any]]],
+    repo_path: Optional[str],
+    timeout: Optional[float],
+    max_size: Optional[int],
+    use_cache: bool,
+    deadline: Optional[float] = None
+) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Serve batches of (path, blob SHA, payload) items from the parse cache and parse the rest.
+    
+    Batches are pulled only while the pool has room for more chunks, at most two per
+    worker in flight, and results are yielded as chunks finish. Identical blobs routed
+    to the same parser are parsed once, whatever their paths, while one is in flight.
+    Closing the iterator cancels the chunks not yet started; chunks already running
+    stop at the deadline, skipping their remaining files as 'deadline'.
+    """
+    if timeout is None:
+        timeout = settings.PARSE_TIMEOUT_SECONDS
+    if max_size == -1:
+        max_size = settings.MAX_FILE_SIZE_MB * 1024 * 1024
+    
+    cache = get_parse_cache() if use_cache else None
+    loop = asyncio.get_running_loop()
+    pool = _get_pool()
+    limit = 2 * _pool_workers
+    # Paths waiting on each (blob SHA, parser) key, and chunks of keys not yet submitted
+    waiting: Dict[Tuple[str, str], List[str]] = {}
+    backlog = deque()
+    pending = {}
+    exhausted = False
+    fresh = []
+    
+    try:
+        while True:
+            while len(pending) < limit:
+                if backlog:
+                    chunk = backlog.popleft()
+                    work = [(path, payload) for _, path, payload in chunk]
+                    future = loop.run_in_executor(pool, _parse_chunk, work, repo_path, timeout, max_size, deadline)
+                    pending[future] = [key for key, _, _ in chunk]
+                    continue
+                if exhausted:
+                    break
+                batch = await anext(batches, None)
+                if batch is None:
+                    exhausted = True
+                    break
+                
+                new: Dict[Tuple[str, str], List[str]] = {}
+                payloads = {}
+                for path, sha, payload in batch:
+                    key = (sha, _parser_key(path))
+                    if key in waiting:
+                        waiting[key].append(path)
+                    else:
+                        new.setdefault(key, []).append(path)
+                        payloads.setdefault(key, payload)
+                if cache is not None and new:
+                    cached = await asyncio.to_thread(cache.get_many, list(new))
+                    for key, result in cached.items():
+                        for path in new.pop(key):
+                            yield {**result, 'path': path}
+                waiting.update(new)
+                backlog.extend(_chunk((key, paths[0], payloads[key]) for key, paths in new.items()))
+            
+            if not pending:
+                break
+            done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for future in done:
+                keys = pending.pop(future)
+                try:
+                    results = future.result()
+                except BrokenProcessPool:
+                    # A worker died (e.g. killed for memory); start a fresh pool next time
+                    logger.error("Parse worker pool broke, restarting it")
+                    shutdown_pool()
+                    raise
+                # Results come back in chunk order, so position gives each one's key
+                for key, result in zip(keys, results):
+                    for path in waiting.pop(key):
+                        yield {**result, 'path': path}
+                    if cache is None or result.get('timed_out') or result.get('skipped') in _UNCACHED_SKIPS:
+                        continue
+                    fresh.append((key, {k: v for k, v in result.items() if k != 'path'}))
+                if len(fresh) >= 256:
+                    await asyncio.to_thread(cache.put_many, fresh)
+                    fresh = []
+        if fresh:
+            await asyncio.to_thread(cache.put_many, fresh)
+    finally:
+        # A consumer that stops early (e.g. out of time) frees the pool of chunks not yet started
+        for future in pending:
+            future.cancel()
+        await batches.aclose()
+
+
+@contextmanager
+def _time_limit(seconds: float):
+    """Raise ParseTimeout in the worker's main thread after the given time (Unix only)."""
+    if not seconds or not hasattr(signal, 'SIGALRM'):
+        yield
+        return
+    
+    def on_alarm(signum, frame):
+        raise ParseTimeout(f"Parsing took longer than {seconds}s")
+    
+    previous = signal.signal(signal.SIGALRM, on_alarm)
+    signal.setitimer(signal.ITIMER_REAL, seconds)
+    try:
+        yield
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, previous)
+
+
+def _parse_chunk(
+    chunk: List[Tuple[str, Any]],
+    repo_path: Optional[str],
+    timeout: float,
+    max_size: Optional[int],
+    deadline: Optional[float] = None
+) -> List[Dict[str, Any]]:
+    """
+    Pool task: parse a chunk of files inside a worker process.
+    
+    :param chunk: (path, content bytes) pairs, or (path, blob SHA) pairs when repo_path is set
+    :param repo_path: Repository to read blob SHAs from
+    :param timeout: Per-file limit in seconds
+    :param max_size: Skip larger files (bytes), None for no limit
+    :param deadline: Unix time after which remaining files are skipped; a file in progress
+                     is given at most until then
+    :return: One result per file, with a 'path' key
+    """
+    global _worker_parser
+    if _worker_parser is None:
+        _worker_parser = CodeParser()
+    if deadline is not None and time.time() >= deadline:
+        # Started after the run ran out of time, e.g. already queued when it was cancelled
+        return [{'path': path, 'skipped': 'deadline'} for path, _ in chunk]
+    
+    missing = set()
+    if repo_path is not None:
+        reader = BlobReader.for_repo(repo_path)
+        contents = reader.read_blobs((sha for _, sha in chunk), max_size)
+        items = [(path, data) for (path, _), (_, data) in zip(chunk, contents)]
+        unread = {sha for (_, sha), (_, data) in zip(chunk, items) if data is None}
+        if unread:
+            # The reader passes over oversized and absent blobs alike; only their sizes tell them apart
+            absent = {sha for sha, size in reader.read_sizes(list(unread)) if size is None}
+            missing = {path for path, sha in chunk if sha in absent}
+    else:
+        items = [
+            (path, None if max_size is not None and len(data) > max_size else data)
+            for path, data in chunk
+        ]
+    
+    results = []
+    for path, data in items:
+        if data is None:
+            results.append({'path': path, 'skipped': 'missing' if path in missing else 'too_large'})
+            continue
+        if b'\0' in data[:8192]:
+            results.append({'path': path, 'skipped': 'binary', 'file_size': len(data)})
+            continue
+        limit = timeout
+        if deadline is not None:
+            left = deadline - time.time()
+            if left <= 0:
+                results.append({'path': path, 'skipped': 'deadline'})
+                continue
+            limit = min(timeout, left) if timeout else left
+        try:
+            with _time_limit(limit):
+                result = _worker_parser.parse_source(path, data.decode('utf-8', errors='replace'))
+        except ParseTimeout as e:
+            result = {'error': str(e), 'timed_out': True}
+        except Exception as e:
+            result = {'error': str(e)}
+        result['path'] = path
+        results.append(result)
+    return results
+
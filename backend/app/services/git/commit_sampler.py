@@ -0,0 +1,129 @@
+"""
+Commit Sampler
+Picks the commits a metric history is computed at: every Nth commit, the last
+commit of each time period, or tagged releases.
+"""
+import subprocess
+from typing import Dict, List, Optional, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class CommitSampler:
+    """Select sample points along the first-parent history of a repository"""
+
+    def __init__(self, repo_path: str):
+        self.repo_path = repo_path
+
+    def every(self, n: int, rev: str = 'HEAD', limit: int = 52) -> List[Dict]:
+        """
+        Every Nth commit, counting back from rev
+
+        Args:
+            n: Distance between samples, in first-parent commits
+            rev: Revision to count back from; it is always the newest sample
+            limit: Maximum number of samples
+
+        Returns:
+            Dicts with commit, timestamp and label (None), oldest first
+        """
+        if n < 1:
+            raise ValueError("Sample interval must be at least 1")
+        commits = self._first_parent(rev, max_count=n * (limit - 1) + 1)
+        return [
+            {'commit': commit, 'timestamp': timestamp, 'label': None}
+            for timestamp, commit in reversed(commits[::n])
+        ]
+
+    def per_period(
+        self,
+        seconds: int,
+        rev: str = 'HEAD',
+        limit: int = 52,
+        since: Optional[int] = None
+    ) -> List[Dict]:
+        """
+        The last commit of each period, e.g. one per week
+
+        Periods are aligned to the Unix epoch, so samples stay put as history grows.
+        Periods without commits have no sample.
+
+        Args:
+            seconds: Period length
+            rev: Revision to walk back from
+            limit: Maximum number of samples, the most recent periods first
+            since: Ignore commits before this Unix time
+
+        Returns:
+            Dicts with commit, timestamp and label (None), oldest first
+        """
+        samples = []
+        last_period = None
+        for timestamp, commit in self._first_parent(rev, since=since):
+            period = timestamp // seconds
+            # Commit times are not strictly ordered, so only ever step back in time
+            if last_period is not None and period >= last_period:
+                continue
+            last_period = period
+            samples.append({'commit': commit, 'timestamp': timestamp, 'label': None})
+            if len(samples) == limit:
+                break
+        samples.reverse()
+        return samples
+
+    def tags(self, limit: int = 52) -> List[Dict]:
+        """
+        Tagged commits, one per tag, the most recent first up to limit
+
+        Returns:
+            Dicts with commit, timestamp (the tag's creation date) and label (the
+            tag name), oldest first; tags of trees or blobs are left out
+        """
+        result = subprocess.run(
+            ['git', 'for-each-ref', '--sort=-creatordate',
+             '--format=%(refname:short)%00%(objecttype)%00%(objectname)%00%(*objecttype)%00%(*objectname)'
+             '%00%(creatordate:unix)',
+             'refs/tags'],
+            cwd=self.repo_path,
+            capture_output=True,
+            text=True
+        )
+        if result.returncode != 0:
+            raise RuntimeError(f"git for-each-ref failed: {result.stderr.strip()}")
+
+        samples = []
+        for line in result.stdout.splitlines():
+            name, kind, sha, target_kind, target, created = line.split('\0')
+            # Annotated tags point at a tag object; the peeled target is what was tagged
+            if target_kind:
+                kind, sha = target_kind, target
+            if kind != 'commit':
+                continue
+            samples.append({'commit': sha, 'timestamp': int(created or 0), 'label': name})
+            if len(samples) == limit:
+                break
+        samples.reverse()
+        return samples
+
+    def _first_parent(
+        self,
+        rev: str,
+        max_count: Optional[int] = None,
+        since: Optional[int] = None
+    ) -> List[Tuple[int, str]]:
+        """(commit time, SHA) pairs along the first-parent chain, newest first"""
+        args = ['git', 'rev-list', '--first-parent', '--timestamp']
+        if max_count is not None:
+            args.append(f'--max-count={max_count}')
+        if since is not None:
+            args.append(f'--max-age={since}')
+        args += ['--end-of-options', rev, '--']
+        result = subprocess.run(args, cwd=self.repo_path, capture_output=True, text=True)
+        if result.returncode != 0:
+            raise ValueError(f"Unknown revision: {rev}")
+        commits = []
+        for line in result.stdout.splitlines():
+            timestamp, commit = line.split(' ', 1)
+            commits.append((int(timestamp), commit))
+        return commits
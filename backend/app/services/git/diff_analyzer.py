@@ -3,60 +3,294 @@ Diff Analyzer Service
 Analyzes code differences using git diff outputs and structures the changes.
 """
 
+import copy
+import itertools
 import subprocess
-from typing import List, Dict, Any
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+from app.core.config import settings
+from app.services.git.diff_reader import DiffEvent, DiffFile, DiffHunk, DiffLine, DiffReader, parse_diff
 import logging
 
 logger = logging.getLogger(__name__)
 
+
+class DiffSummaryCache:
+    """LRU cache of diff summaries keyed by the pair of tree SHAs they compare"""
+    
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: 'OrderedDict[Tuple, Dict[str, Any]]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+    
+    def get(self, key: Tuple) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            summary = self._entries.get(key)
+            if summary is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        # Callers may modify what they get back
+        return copy.deepcopy(summary)
+    
+    def put(self, key: Tuple, summary: Dict[str, Any]):
+        summary = copy.deepcopy(summary)
+        with self._lock:
+            self._entries[key] = summary
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+# Trees are immutable and content-addressed, so entries never go stale and are
+# valid across repositories and clones
+_summary_cache = DiffSummaryCache(settings.DIFF_CACHE_ENTRIES)
+
+
 class DiffAnalyzer:
     """Analyze differences between git commits."""
     
     @staticmethod
-    def get_diff(commit_a: str, commit_b: str) -> List[str]:
-        """Get raw diff between two git commits."""
+    def iter_diff(repo_path: str, commit_a: str, commit_b: str, **kwargs) -> Iterator[DiffEvent]:
+        """
+        Stream the diff between two commits as file, hunk and line events
+
+        Output is parsed straight off the `git diff` pipe, so memory stays bounded
+        by the longest line rather than the size of the diff.
+
+        Args:
+            repo_path: Path to repository
+            commit_a: Old revision
+            commit_b: New revision
+            **kwargs: paths, find_renames, find_copies and context, see DiffReader.iter_lines
+        """
+        return DiffReader(repo_path).iter_events(commit_a, commit_b, **kwargs)
+    
+    @staticmethod
+    def get_file_stats(repo_path: str, commit_a: str, commit_b: str, **kwargs) -> List[Dict[str, Any]]:
+        """
+        Per-file insertions and deletions from `git diff --numstat`, without patch text
+
+        Args:
+            repo_path: Path to repository
+            commit_a: Old revision
+            commit_b: New revision
+            **kwargs: paths, find_renames and find_copies, see DiffReader.file_stats
+        """
+        return DiffReader(repo_path).file_stats(commit_a, commit_b, **kwargs)
+    
+    @staticmethod
+    def get_diff(repo_path: str, commit_a: str, commit_b: str) -> List[str]:
+        """Get raw diff between two git commits of the repository at repo_path."""
         try:
-            result = subprocess.run(
-                ["git", "diff", commit_a, commit_b],
-                text=True,
-                capture_output=True,
-                check=True
-            )
+            lines = list(DiffReader(repo_path).iter_lines(commit_a, commit_b))
             logger.info(f"Successfully got diff between {commit_a} and {commit_b}")
-            return result.stdout.splitlines()
-        except subprocess.CalledProcessError as e:
+            return lines
+        except RuntimeError as e:
             logger.error(f"Error getting diff: {e}")
             return []
     
     @staticmethod
-    def analyze_diff(diff_lines: List[str]) -> Dict[str, Any]:
-        """Analyze git diff output and structure changes."""
+    def analyze_commits(
+        repo_path: str,
+        commit_a: str,
+        commit_b: str,
+        include_hunks: bool = False,
+        find_copies: bool = False
+    ) -> Dict[str, Any]:
+        """
+        Summarize the changes between two commits in the analyze_diff format
+
+        Counts come from numstat unless hunks are requested; only then is the
+        full patch generated and streamed through analyze_diff.
+
+        Args:
+            repo_path: Path to repository
+            commit_a: Old revision
+            commit_b: New revision
+            include_hunks: Add the old and new line ranges of every hunk per file
+            find_copies: Report copied files as copies rather than additions
+        """
+        if include_hunks:
+            return DiffAnalyzer.analyze_diff(
+                DiffAnalyzer.iter_diff(repo_path, commit_a, commit_b, find_copies=find_copies),
+                include_hunks=True
+            )
+        
         changes = {
             'files': {},
             'insertions': 0,
             'deletions': 0
         }
+        for entry in DiffAnalyzer.get_file_stats(repo_path, commit_a, commit_b, find_copies=find_copies):
+            changes['files'][entry['path']] = {
+                'insertions': entry['insertions'],
+                'deletions': entry['deletions'],
+                'status': entry['status'],
+                'old_path': entry['old_path'],
+                'binary': entry['binary'],
+                'similarity': entry['similarity']
+            }
+            changes['insertions'] += entry['insertions']
+            changes['deletions'] += entry['deletions']
         
-        current_file = None
-        insertions, deletions = 0, 0
+        return changes
+    
+    @staticmethod
+    def analyze_pairs(
+        repo_path: str,
+        pairs: Sequence[Tuple[str, str]],
+        include_hunks: bool = False,
+        find_copies: bool = False,
+        max_workers: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Summarize many commit pairs at once, e.g. release to release
+        
+        Pairs are resolved to their trees in one git call. Summaries are cached
+        by tree pair, so repeated comparisons cost nothing, and pairs comparing the
+        same trees are diffed once. The remaining diffs run concurrently on a
+        bounded pool of git processes.
+        
+        Args:
+            repo_path: Path to repository
+            pairs: (commit_a, commit_b) revisions to compare
+            include_hunks: Add per-hunk line ranges, see analyze_commits
+            find_copies: Report copied files as copies rather than additions
+            max_workers: Concurrent git processes, defaults to DIFF_BATCH_WORKERS
+            
+        Returns:
+            One result per pair, in input order: commit_a, commit_b and the
+            analyze_commits summary, or an error for revisions that do not resolve
+            and for diffs that fail
+        """
+        trees = DiffAnalyzer._resolve_trees(repo_path, [rev for pair in pairs for rev in pair])
         
-        for line in diff_lines:
-            if line.startswith('diff --git'):
-                tokens = line.split(' ')
-                current_file = tokens[2][2:]  # Remove a/ prefix
-                changes['files'][current_file] = {'insertions': 0, 'deletions': 0}
-            elif line.startswith('+++ '):
-                if line[4:] != '/dev/null':
-                    current_file = line[6:]
-            elif line.startswith('--- '):
+        summaries: Dict[Tuple, Dict[str, Any]] = {}
+        pending = []
+        for commit_a, commit_b in pairs:
+            key = (trees.get(commit_a), trees.get(commit_b), include_hunks, find_copies)
+            if None in key[:2] or key in summaries or key in pending:
                 continue
-            elif line.startswith('+') and not line.startswith('+++'):
-                insertions += 1
-                changes['files'][current_file]['insertions'] += 1
-            elif line.startswith('-') and not line.startswith('---'):
-                deletions += 1
-                changes['files'][current_file]['deletions'] += 1
+            cached = _summary_cache.get(key)
+            if cached is not None:
+                summaries[key] = cached
+            else:
+                pending.append(key)
+        
+        def analyze(key: Tuple) -> Dict[str, Any]:
+            # Diffing the trees directly gives the same result as diffing the commits
+            try:
+                summary = DiffAnalyzer.analyze_commits(repo_path, key[0], key[1], include_hunks, find_copies)
+            except Exception as e:
+                # One failed pair must not take the rest of the batch down; failures are not cached
+                logger.error(f"Diff of trees {key[0]} and {key[1]} failed: {e}")
+                return {'error': f"Diff failed: {e}"}
+            _summary_cache.put(key, summary)
+            return summary
+        
+        if pending:
+            workers = min(max_workers or settings.DIFF_BATCH_WORKERS, len(pending))
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                for key, summary in zip(pending, pool.map(analyze, pending)):
+                    summaries[key] = summary
+        
+        results = []
+        used = set()
+        for commit_a, commit_b in pairs:
+            result = {'commit_a': commit_a, 'commit_b': commit_b}
+            key = (trees.get(commit_a), trees.get(commit_b), include_hunks, find_copies)
+            if key in summaries:
+                # Repeated pairs get their own copy rather than sharing one
+                result.update(copy.deepcopy(summaries[key]) if key in used else summaries[key])
+                used.add(key)
+            else:
+                missing = commit_a if key[0] is None else commit_b
+                result['error'] = f"Unknown revision: {missing}"
+            results.append(result)
+        
+        return results
+    
+    @staticmethod
+    def cache_metrics() -> Dict[str, int]:
+        """Hit and miss counts of the tree-pair summary cache"""
+        return {'hits': _summary_cache.hits, 'misses': _summary_cache.misses}
+    
+    @staticmethod
+    def _resolve_trees(repo_path: str, revisions: List[str]) -> Dict[str, str]:
+        """Tree SHA per revision from a single cat-file call; unresolvable revisions are left out"""
+        # One name per line, so names with line breaks can never resolve
+        unique = [rev for rev in dict.fromkeys(revisions) if '\n' not in rev]
+        result = subprocess.run(
+            ['git', 'cat-file', '--batch-check=%(objectname)'],
+            cwd=repo_path,
+            input=''.join(f"{rev}^{{tree}}\n" for rev in unique),
+            capture_output=True,
+            text=True,
+            check=True
+        )
+        trees = {}
+        for rev, line in zip(unique, result.stdout.splitlines()):
+            # Unresolvable names come back as "<name> missing" or "<name> ambiguous"
+            if ' ' not in line:
+                trees[rev] = line
+        return trees
+    
+    @staticmethod
+    def analyze_diff(diff: Iterable, include_hunks: bool = False) -> Dict[str, Any]:
+        """
+        Analyze git diff output and structure changes.
 
+        Args:
+            diff: Raw patch lines (e.g. from get_diff) or events from iter_diff
+            include_hunks: Add the old and new line ranges of every hunk per file
+        """
+        changes = {
+            'files': {},
+            'insertions': 0,
+            'deletions': 0
+        }
+        
+        events = iter(diff)
+        first = next(events, None)
+        if first is None:
+            return changes
+        events = itertools.chain([first], events)
+        if isinstance(first, str):
+            events = parse_diff(events)
+        
+        current_file = None
+        insertions, deletions = 0, 0
+        
+        for event in events:
+            if isinstance(event, DiffLine):
+                if event.kind == '+':
+                    insertions += 1
+                    current_file['insertions'] += 1
+                elif event.kind == '-':
+                    deletions += 1
+                    current_file['deletions'] += 1
+            elif isinstance(event, DiffHunk):
+                if include_hunks:
+                    current_file['hunks'].append(event.to_dict())
+            elif isinstance(event, DiffFile):
+                current_file = {
+                    'insertions': 0,
+                    'deletions': 0,
+                    'status': event.status,
+                    'old_path': event.old_path,
+                    'binary': event.binary,
+                    'similarity': event.similarity
+                }
+                if include_hunks:
+                    current_file['hunks'] = []
+                changes['files'][event.path] = current_file
+        
         changes['insertions'] = insertions
         changes['deletions'] = deletions
         
@@ -0,0 +1,373 @@
+"""
+Diff Reader
+Streams `git diff` output from a pipe and parses it into file, hunk and line events,
+or reads per-file change counts from `git diff --numstat` when no patch text is needed.
+"""
+import io
+import re
+import subprocess
+from typing import Dict, Iterable, Iterator, List, Optional, Union
+from app.services.git.workspace_manager import reader_lease
+import logging
+
+logger = logging.getLogger(__name__)
+
+HUNK_HEADER = re.compile(r'^@@ -(\d+)(?:,(\d+))? \+(\d+)(?:,(\d+))? @@ ?(.*)$')
+C_ESCAPES = {'a': 7, 'b': 8, 't': 9, 'n': 10, 'v': 11, 'f': 12, 'r': 13, '"': 34, '\\': 92}
+
+
+class DiffFile:
+    """Start of the changes to one file; its hunks and lines follow"""
+
+    __slots__ = ('old_path', 'new_path', 'status', 'binary', 'similarity')
+
+    def __init__(self, old_path: Optional[str], new_path: Optional[str]):
+        self.old_path = old_path
+        self.new_path = new_path
+        self.status = 'M'  # A, D, M, R or C
+        self.binary = False
+        self.similarity: Optional[int] = None
+
+    @property
+    def path(self) -> str:
+        """Path after the change, or before it for deletions"""
+        return self.new_path if self.new_path is not None else self.old_path
+
+
+class DiffHunk:
+    """One `@@` hunk header with its old and new line ranges"""
+
+    __slots__ = ('path', 'old_start', 'old_lines', 'new_start', 'new_lines', 'section')
+
+    def __init__(self, path: str, old_start: int, old_lines: int, new_start: int, new_lines: int, section: str):
+        self.path = path
+        self.old_start = old_start
+        self.old_lines = old_lines
+        self.new_start = new_start
+        self.new_lines = new_lines
+        self.section = section
+
+    def to_dict(self) -> dict:
+        return {
+            'old_start': self.old_start,
+            'old_lines': self.old_lines,
+            'new_start': self.new_start,
+            'new_lines': self.new_lines,
+            'section': self.section
+        }
+
+
+class DiffLine:
+    """One line of a hunk: '+' added, '-' removed or ' ' context"""
+
+    __slots__ = ('kind', 'text', 'old_lineno', 'new_lineno')
+
+    def __init__(self, kind: str, text: str, old_lineno: Optional[int], new_lineno: Optional[int]):
+        self.kind = kind
+        self.text = text
+        self.old_lineno = old_lineno
+        self.new_lineno = new_lineno
+
+
+DiffEvent = Union[DiffFile, DiffHunk, DiffLine]
+
+
+class DiffReader:
+    """Run `git diff` in a repository and stream its output with bounded memory"""
+
+    def __init__(self, repo_path: str):
+        self.repo_path = repo_path
+
+    def iter_lines(
+        self,
+        commit_a: str,
+        commit_b: str,
+        paths: Optional[List[str]] = None,
+        find_renames: bool = True,
+        find_copies: bool = False,
+        context: int = 3
+    ) -> Iterator[str]:
+        """
+        Stream raw patch lines, without line endings, as git writes them
+
+        Args:
+            commit_a: Old revision
+            commit_b: New revision
+            paths: Limit the diff to these paths
+            find_renames: Detect renames instead of reporting a delete and an add
+            find_copies: Also detect files copied from files modified in the same diff
+            context: Lines of context around each change
+
+        Raises:
+            RuntimeError: If git exits with an error
+        """
+        # Pin everything user config could change about the output format
+        args = [
+            'git', 'diff', '--no-color', '--no-ext-diff', '--no-textconv',
+            '--src-prefix=a/', '--dst-prefix=b/', f'--unified={context}',
+            '--find-renames' if find_renames or find_copies else '--no-renames'
+        ]
+        if find_copies:
+            args.append('--find-copies')
+        args += [commit_a, commit_b, '--']
+        args += paths or []
+
+        # Leased for as long as git runs, including while the consumer is paused between lines
+        with reader_lease(self.repo_path):
+            process = subprocess.Popen(
+                args,
+                cwd=self.repo_path,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE
+            )
+            # Only '\n' ends a diff line; a '\r' of a CRLF file, or one inside a line, stays part of it
+            stdout = io.TextIOWrapper(process.stdout, encoding='utf-8', errors='replace', newline='\n')
+            try:
+                for line in stdout:
+                    yield line[:-1] if line.endswith('\n') else line
+
+                if process.wait() != 0:
+                    error = process.stderr.read().decode('utf-8', errors='replace').strip()
+                    logger.error(f"git diff failed in {self.repo_path}: {error}")
+                    raise RuntimeError(f"git diff failed: {error}")
+            finally:
+                # Stop git early if the consumer abandoned the generator
+                if process.poll() is None:
+                    process.kill()
+                    process.wait()
+                process.stdout.close()
+                process.stderr.close()
+
+    def iter_events(self, commit_a: str, commit_b: str, **kwargs) -> Iterator[DiffEvent]:
+        """Stream parsed events; takes the same arguments as iter_lines"""
+        return parse_diff(self.iter_lines(commit_a, commit_b, **kwargs))
+
+    def file_stats(
+        self,
+        commit_a: str,
+        commit_b: str,
+        paths: Optional[List[str]] = None,
+        find_renames: bool = True,
+        find_copies: bool = False
+    ) -> List[Dict]:
+        """
+        Per-file change counts without generating patch text
+
+        One `git diff --raw --numstat -z` call; NUL-separated output keeps unusual
+        path names unquoted and rename sources and targets unambiguous.
+
+        Args:
+            commit_a: Old revision
+            commit_b: New revision
+            paths: Limit the diff to these paths
+            find_renames: Detect renames instead of reporting a delete and an add
+            find_copies: Also detect files copied from files modified in the same diff
+
+        Returns:
+            Dicts with path, old_path, status (A, D, M, T, R or C), similarity,
+            binary, insertions, deletions, old_sha, new_sha, old_mode and new_mode,
+            in diff order
+
+        Raises:
+            RuntimeError: If git exits with an error
+        """
+        args = [
+            'git', 'diff', '--raw', '--numstat', '-z', '--no-abbrev', '--no-ext-diff', '--no-textconv',
+            '--find-renames' if find_renames or find_copies else '--no-renames'
+        ]
+        if find_copies:
+            args.append('--find-copies')
+        args += [commit_a, commit_b, '--']
+        args += paths or []
+
+        with reader_lease(self.repo_path):
+            result = subprocess.run(args, cwd=self.repo_path, capture_output=True)
+        if result.returncode != 0:
+            error = result.stderr.decode('utf-8', errors='replace').strip()
+            logger.error(f"git diff failed in {self.repo_path}: {error}")
+            raise RuntimeError(f"git diff failed: {error}")
+        return parse_raw_numstat(result.stdout)
+
+
+def parse_raw_numstat(output: bytes) -> List[Dict]:
+    """Parse `git diff --raw --numstat -z` output: all raw records, then all numstat records"""
+    tokens = [token.decode('utf-8', errors='replace') for token in output.split(b'\0')]
+    files = []
+    index = 0
+    while index < len(tokens) and tokens[index].startswith(':'):
+        old_mode, new_mode, old_sha, new_sha, status = tokens[index][1:].split(' ')
+        kind = status[0]
+        if kind in 'RC':
+            old_path, new_path = tokens[index + 1], tokens[index + 2]
+            index += 3
+        else:
+            old_path = new_path = tokens[index + 1]
+            index += 2
+        files.append({
+            'path': old_path if kind == 'D' else new_path,
+            'old_path': None if kind == 'A' else old_path,
+            'status': kind,
+            'similarity': int(status[1:]) if kind in 'RC' else None,
+            'binary': False,
+            'insertions': 0,
+            'deletions': 0,
+            'old_sha': None if kind == 'A' else old_sha,
+            'new_sha': None if kind == 'D' else new_sha,
+            'old_mode': None if kind == 'A' else old_mode,
+            'new_mode': None if kind == 'D' else new_mode
+        })
+
+    # Numstat records follow in the same order; renames and copies carry an empty path
+    # followed by their source and target
+    for entry in files:
+        if index >= len(tokens):
+            break
+        insertions, deletions, path = tokens[index].split('\t', 2)
+        index += 3 if path == '' else 1
+        if insertions == '-':
+            entry['binary'] = True
+        else:
+            entry['insertions'] = int(insertions)
+            entry['deletions'] = int(deletions)
+    return files
+
+
+def parse_diff(lines: Iterable[str]) -> Iterator[DiffEvent]:
+    """
+    Parse unified `git diff` output into events, one line at a time
+
+    Each DiffFile is emitted once its extended header is complete, before its
+    hunks. Hunk bodies are consumed by their line counts, so removed lines
+    starting with '--- ' are never mistaken for file headers.
+
+    Args:
+        lines: Patch lines without line endings
+
+    Yields:
+        DiffFile, DiffHunk and DiffLine events in patch order
+    """
+    current: Optional[DiffFile] = None
+    pending = False  # current has not been yielded yet
+    old_remaining = new_remaining = 0
+    old_lineno = new_lineno = 0
+
+    for line in lines:
+        if old_remaining > 0 or new_remaining > 0:
+            kind = line[:1]
+            if kind == '+':
+                yield DiffLine('+', line[1:], None, new_lineno)
+                new_lineno += 1
+                new_remaining -= 1
+                continue
+            if kind == '-':
+                yield DiffLine('-', line[1:], old_lineno, None)
+                old_lineno += 1
+                old_remaining -= 1
+                continue
+            if kind == ' ' or line == '':
+                yield DiffLine(' ', line[1:], old_lineno, new_lineno)
+                old_lineno += 1
+                new_lineno += 1
+                old_remaining -= 1
+                new_remaining -= 1
+                continue
+            if kind == '\\':
+                # "\ No newline at end of file"
+                continue
+            # Truncated hunk; resynchronize on headers
+            old_remaining = new_remaining = 0
+
+        if line.startswith('diff --git '):
+            if pending:
+                yield current
+            old_path, new_path = _split_diff_git_paths(line[len('diff --git '):])
+            current = DiffFile(old_path, new_path)
+            pending = True
+        elif line.startswith('@@'):
+            match = HUNK_HEADER.match(line)
+            if match is None or current is None:
+                continue
+            if pending:
+                yield current
+                pending = False
+            old_start, old_count, new_start, new_count, section = match.groups()
+            old_remaining = int(old_count) if old_count is not None else 1
+            new_remaining = int(new_count) if new_count is not None else 1
+            old_lineno, new_lineno = int(old_start), int(new_start)
+            yield DiffHunk(current.path, old_lineno, old_remaining, new_lineno, new_remaining, section)
+        elif pending:
+            _apply_header(current, line)
+
+    if pending:
+        yield current
+
+
+def _apply_header(diff_file: DiffFile, line: str):
+    """Fold one extended header line into the pending DiffFile"""
+    if line.startswith('new file mode'):
+        diff_file.status = 'A'
+        diff_file.old_path = None
+    elif line.startswith('deleted file mode'):
+        diff_file.status = 'D'
+        diff_file.new_path = None
+    elif line.startswith('rename from '):
+        diff_file.status = 'R'
+        diff_file.old_path = _unquote(line[len('rename from '):])
+    elif line.startswith('rename to '):
+        diff_file.new_path = _unquote(line[len('rename to '):])
+    elif line.startswith('copy from '):
+        diff_file.status = 'C'
+        diff_file.old_path = _unquote(line[len('copy from '):])
+    elif line.startswith('copy to '):
+        diff_file.new_path = _unquote(line[len('copy to '):])
+    elif line.startswith('similarity index '):
+        diff_file.similarity = int(line[len('similarity index '):].rstrip('%'))
+    elif line.startswith('Binary files ') or line == 'GIT binary patch':
+        diff_file.binary = True
+
+
+def _split_diff_git_paths(rest: str):
+    """Old and new path from the `diff --git a/<old> b/<new>` line"""
+    if rest.startswith('"'):
+        old, rest = _take_quoted(rest)
+        new = _unquote(rest.lstrip(' '))
+    elif rest.endswith('"'):
+        index = rest.rindex(' "')
+        old, new = rest[:index], _unquote(rest[index + 1:])
+    else:
+        # Unquoted paths may contain spaces; without a rename both halves are equal
+        half = (len(rest) - 1) // 2
+        old, new = rest[:half], rest[half + 1:]
+        if old[2:] != new[2:] and ' b/' in rest:
+            old, new = rest.split(' b/', 1)
+            new = 'b/' + new
+    return old[2:], new[2:]
+
+
+def _take_quoted(text: str):
+    """Split a leading C-quoted string off text"""
+    index = 1
+    while text[index] != '"':
+        index += 2 if text[index] == '\\' else 1
+    return _unquote(text[:index + 1]), text[index + 1:]
+
+
+def _unquote(path: str) -> str:
+    """Undo git's C-style quoting of unusual path names"""
+    if not (len(path) >= 2 and path.startswith('"') and path.endswith('"')):
+        return path
+    body = path[1:-1]
+    data = bytearray()
+    index = 0
+    while index < len(body):
+        char = body[index]
+        if char != '\\':
+            data += char.encode('utf-8')
+            index += 1
+        elif body[index + 1] in C_ESCAPES:
+            data.append(C_ESCAPES[body[index + 1]])
+            index += 2
+        else:
+            data.append(int(body[index + 1:index + 4], 8))
+            index += 4
+    return data.decode('utf-8', errors='replace')
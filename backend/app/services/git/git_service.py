@@ -2,202 +2,580 @@
 Git Service - Handles all Git repository operations
 Responsibilities:
 - Clone repositories
+- Maintain cached mirrors of repositories
 - Fetch commit history
 - Extract file changes
 - Get contributor information
 """
+import asyncio
+import base64
+import json
 import os
+import re
+import subprocess
 import tempfile
-from typing import List, Dict, Optional
+from typing import Iterator, List, Dict, Optional, Tuple
 from datetime import datetime
 import git
 from git import Repo
+from app.services.git.blob_reader import BlobReader
+from app.services.git.log_reader import CommitLogReader
+from app.services.git.mirror_cache import MirrorCache
+from app.services.git.stats_collector import RepositoryStatsCollector
+from app.services.git.tree_reader import TreeReader
+from app.services.git.workspace_manager import get_workspace_manager
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Options passed to Repo.clone_from for each clone strategy
+CLONE_STRATEGIES = {
+    'full': {},
+    'shallow': {'depth': 500},  # Limit depth for performance
+    'blobless': {'filter': 'blob:none'},  # History and trees only, blobs fetched on demand
+    'treeless': {'filter': 'tree:0'},  # Commits only, trees and blobs fetched on demand
+}
+
 
 class GitService:
     """Service for interacting with Git repositories"""
     
-    def __init__(self):
+    def __init__(self, clone_strategy: str = 'shallow'):
+        if clone_strategy not in CLONE_STRATEGIES:
+            raise ValueError(f"Unknown clone strategy: {clone_strategy}")
         self.temp_dir = tempfile.gettempdir()
+        self.clone_strategy = clone_strategy
+        self.mirror_cache = MirrorCache()
+        self.workspaces = get_workspace_manager()
     
-    def clone_repository(self, repo_url: str, access_token: Optional[str] = None) -> str:
+    def clone_repository(
+        self,
+        repo_url: str,
+        access_token: Optional[str] = None,
+        strategy: Optional[str] = None
+    ) -> str:
         """
         Clone a repository to a temporary directory
         
         Args:
             repo_url: GitHub repository URL
             access_token: GitHub access token for private repos
+            strategy: One of CLONE_STRATEGIES, defaults to the service's clone_strategy.
+                Use 'blobless' or 'treeless' for history-only analyses.
             
         Returns:
             Path to cloned repository
         """
-        # Create unique directory for this repo
         repo_name = repo_url.split('/')[-1].replace('.git', '')
-        clone_path = os.path.join(self.temp_dir, f"reposcope_{repo_name}_{datetime.now().timestamp()}")
         
         # Add token to URL if provided (for private repos)
-        if access_token and 'github.com' in repo_url:
-            # Convert https://github.com/user/repo to https://token@github.com/user/repo
-            repo_url = repo_url.replace('https://', f'https://{access_token}@')
+        auth_url = MirrorCache.auth_url(repo_url, access_token)
+        strategy = strategy or self.clone_strategy
         
         try:
-            logger.info(f"Cloning repository: {repo_name}")
-            repo = Repo.clone_from(repo_url, clone_path, depth=500)  # Limit depth for performance
-            return clone_path
+            logger.info(f"Cloning repository: {repo_name} ({strategy})")
+            # Leased from the workspace manager so it counts against the disk budget;
+            # cleanup() releases it, and clones are never reused
+            return self.workspaces.acquire(
+                key=f"clone:{repo_url}:{datetime.now().timestamp()}",
+                create=lambda path: Repo.clone_from(auth_url, path, **CLONE_STRATEGIES[strategy]),
+                name=repo_name,
+                reusable=False
+            )
         except Exception as e:
             logger.error(f"Failed to clone repository: {str(e)}")
             raise
     
-    def get_commit_history(self, repo_path: str, limit: int = 100) -> List[Dict]:
+    def update_mirror(
+        self,
+        repo_name: str,
+        access_token: Optional[str] = None,
+        strategy: Optional[str] = None
+    ) -> str:
+        """
+        Clone a repository into the mirror cache, or fetch new objects if it is cached
+        
+        Args:
+            repo_name: Repository full name (owner/repo) or GitHub URL
+            access_token: GitHub access token for private repos
+            strategy: Clone strategy for a new mirror; 'blobless' and 'treeless' create
+                partial mirrors, anything else a complete one (mirrors are never shallow)
+            
+        Returns:
+            Path to the bare mirror, usable directly for history and tree access
+        """
+        repo_full_name, repo_url = self._resolve_repo(repo_name)
+        
+        try:
+            clone_filter = CLONE_STRATEGIES[strategy or self.clone_strategy].get('filter')
+            return self.mirror_cache.get_or_update(repo_full_name, repo_url, access_token, clone_filter)
+        except Exception as e:
+            logger.error(f"Failed to update mirror for {repo_full_name}: {str(e)}")
+            raise
+    
+    def cached_mirror(self, repo_name: str) -> Optional[str]:
+        """Path to the cached mirror of a repository without fetching, or None if not cached"""
+        path = self.mirror_cache.mirror_path(self._resolve_repo(repo_name)[0])
+        if not os.path.isdir(path):
+            return None
+        self.mirror_cache.touch(path)
+        return path
+    
+    @staticmethod
+    def _resolve_repo(repo_name: str) -> Tuple[str, str]:
+        """Split a full name (owner/repo) or GitHub URL into (full name, URL)"""
+        if repo_name.startswith(('https://', 'http://')):
+            repo_url = repo_name
+            repo_full_name = '/'.join(repo_url.rstrip('/').split('/')[-2:]).replace('.git', '')
+        else:
+            repo_full_name = repo_name.strip('/')
+            repo_url = f"https://github.com/{repo_full_name}"
+        return repo_full_name, repo_url
+    
+    async def clone_or_update_repo(
+        self,
+        repo_name: str,
+        access_token: Optional[str] = None,
+        strategy: Optional[str] = None
+    ) -> str:
+        """
+        Async wrapper around update_mirror that keeps git off the event loop
+        
+        Args:
+            repo_name: Repository full name (owner/repo) or GitHub URL
+            access_token: GitHub access token for private repos
+            strategy: Clone strategy for a new mirror
+            
+        Returns:
+            Path to the bare mirror
+        """
+        return await asyncio.to_thread(self.update_mirror, repo_name, access_token, strategy)
+    
+    @staticmethod
+    def resolve_revision(repo_path: str, rev: str) -> Optional[str]:
+        """Commit SHA for a branch, tag or commit, or None if it does not exist"""
+        try:
+            return Repo(repo_path).commit(rev).hexsha
+        except Exception:
+            return None
+    
+    @staticmethod
+    def count_commits(repo_path: str, rev: str = 'HEAD') -> int:
+        """
+        Number of commits reachable from a revision, or in a range such as 'A..B'
+        
+        Answered from the reachability bitmaps and commit-graph of cached mirrors
+        without parsing commits; falls back to a plain walk elsewhere.
+        """
+        command = ['git', 'rev-list', '--count', rev]
+        if '..' not in rev:
+            # Bitmaps pay off for whole histories; ranges are faster on the commit-graph alone
+            command.insert(3, '--use-bitmap-index')
+        result = subprocess.run(command, cwd=repo_path, capture_output=True, text=True, check=True)
+        return int(result.stdout)
+    
+    @staticmethod
+    def is_ancestor(repo_path: str, ancestor: str, descendant: str) -> bool:
+        """Whether ancestor is reachable from descendant, using commit-graph generation numbers"""
+        result = subprocess.run(
+            ['git', 'merge-base', '--is-ancestor', ancestor, descendant],
+            cwd=repo_path,
+            capture_output=True,
+            text=True
+        )
+        if result.returncode > 1:
+            raise RuntimeError(f"git merge-base failed: {result.stderr.strip()}")
+        return result.returncode == 0
+    
+    @staticmethod
+    def is_partial_clone(repo_path: str) -> bool:
+        """Whether the repository was cloned with a filter and may be missing objects"""
+        reader = Repo(repo_path).config_reader()
+        return bool(reader.get_value('remote "origin"', 'promisor', False))
+    
+    def prefetch_objects(
+        self,
+        repo_path: str,
+        rev: str = 'HEAD',
+        access_token: Optional[str] = None,
+        history: bool = False
+    ) -> int:
+        """
+        Fetch the trees and blobs missing from a partial clone at one revision
+        
+        Git would otherwise fetch each missing object lazily with its own round trip
+        when it is first read. This asks the promisor remote for all of them in one
+        request per tree level.
+        
+        Args:
+            repo_path: Path to a partial clone
+            rev: Revision whose tree should be complete afterwards
+            access_token: GitHub access token for private repos
+            history: Also fetch objects of every ancestor of rev, as diffs need them
+            
+        Returns:
+            Number of objects fetched
+        """
+        repo = Repo(repo_path)
+        remote_url = MirrorCache.auth_url(repo.remote('origin').url, access_token)
+        walk = [] if history else ['--no-walk']
+        fetched = 0
+        
+        # Treeless clones reveal one more tree level per round; stop once a round makes no progress
+        previous = None
+        while True:
+            listing = repo.git.rev_list('--objects', '--missing=print', *walk, rev)
+            missing = [line[1:] for line in listing.splitlines() if line.startswith('?')]
+            if not missing or len(missing) == previous:
+                break
+            previous = len(missing)
+            result = subprocess.run(
+                ['git', '-c', 'fetch.negotiationAlgorithm=noop', 'fetch', remote_url,
+                 '--no-tags', '--no-write-fetch-head', '--recurse-submodules=no',
+                 '--filter=blob:none', '--stdin'],
+                cwd=repo_path,
+                input='\n'.join(missing) + '\n',
+                text=True,
+                capture_output=True
+            )
+            if result.returncode != 0:
+                logger.warning(f"Prefetch round failed in {repo_path}: {result.stderr.strip()}")
+            else:
+                fetched += len(missing)
+        
+        logger.info(f"Prefetched {fetched} objects at {rev} in {repo_path}")
+        return fetched
+    
+    def create_worktree(self, repo_path: str, rev: str = 'HEAD') -> str:
+        """
+        Check out a revision of a cached mirror for analyzers that need files on disk
+        
+        Worktrees are leased from the workspace manager and keyed by commit, so an
+        idle checkout of the same commit is reused instead of checked out again.
+        
+        Args:
+            repo_path: Path to the bare mirror
+            rev: Revision to check out
+            
+        Returns:
+            Path to the worktree; release it with remove_worktree
+        """
+        sha = Repo(repo_path).commit(rev).hexsha
+        return self.workspaces.acquire(
+            key=f"worktree:{os.path.abspath(repo_path)}@{sha}",
+            create=lambda path: self.mirror_cache.create_worktree(repo_path, sha, path),
+            remove=lambda path: self.mirror_cache.remove_worktree(repo_path, path),
+            name=os.path.basename(repo_path).replace('.git', '')
+        )
+    
+    def remove_worktree(self, repo_path: str, worktree_path: str):
+        """Release a worktree created by create_worktree; idle worktrees are evicted LRU"""
+        if not self.workspaces.release(worktree_path):
+            self.mirror_cache.remove_worktree(repo_path, worktree_path)
+    
+    def get_commit_history(self, repo_path: str, limit: int = 100, include_line_stats: bool = True) -> List[Dict]:
         """
         Extract commit history from repository
         
         Args:
             repo_path: Path to repository
             limit: Maximum number of commits to fetch
+            include_line_stats: Include additions, deletions and files. These need
+                blob contents, so pass False for history-only work on partial clones.
             
         Returns:
             List of commit data
         """
-        repo = Repo(repo_path)
-        commits = []
-        
-        for commit in list(repo.iter_commits())[:limit]:
-            commits.append({
-                'sha': commit.hexsha,
-                'author': commit.author.name,
-                'author_email': commit.author.email,
-                'date': commit.authored_datetime.isoformat(),
-                'message': commit.message.strip(),
-                'files_changed': len(commit.stats.files),
-                'additions': commit.stats.total['insertions'],
-                'deletions': commit.stats.total['deletions'],
-                'files': list(commit.stats.files.keys())
-            })
+        return list(self.iter_commits(repo_path, max_count=limit, include_line_stats=include_line_stats))
+    
+    def iter_commits(
+        self,
+        repo_path: str,
+        rev: str = 'HEAD',
+        skip: int = 0,
+        max_count: Optional[int] = None,
+        include_line_stats: bool = True
+    ) -> Iterator[Dict]:
+        """
+        Stream commits newest first without materializing the history
+        
+        Skipping and limiting happen inside git, so memory use is constant
+        regardless of how deep into the history the window starts.
+        
+        Args:
+            repo_path: Path to repository
+            rev: Revision to walk from
+            skip: Number of commits to skip
+            max_count: Maximum number of commits to yield
+            include_line_stats: Include additions, deletions and files
+            
+        Yields:
+            Commit data in the get_commit_history format; ranges ('A..B') walk only
+            the commits in between, pruned by the commit-graph on cached mirrors
+        """
+        reader = CommitLogReader(repo_path)
+        yield from reader.iter_commits(rev=rev, max_count=max_count, skip=skip, numstat=include_line_stats)
+    
+    def get_commit_page(
+        self,
+        repo_path: str,
+        cursor: Optional[str] = None,
+        limit: int = 50,
+        skip: int = 0
+    ) -> Dict:
+        """
+        Get one page of commit history using an opaque cursor
+        
+        The cursor pins the HEAD the first page was read from, so pages stay
+        consistent while new commits are pushed, and records the last SHA and its
+        position. The next page re-reads that SHA to detect rewritten history.
+        The pinned history never changes size, so its commit count is taken once,
+        on the first page, and carried in the cursor.
         
-        return commits
+        Args:
+            repo_path: Path to repository
+            cursor: Cursor from the previous page, None for the first page
+            limit: Page size
+            skip: Initial offset, only used for the first page
+            
+        Returns:
+            Dict with commits, next_cursor (None on the last page), has_more and
+            total_commits reachable from the pinned HEAD
+            
+        Raises:
+            ValueError: If the cursor is malformed or no longer matches the history
+        """
+        if cursor:
+            head, last_sha, position, total = self._decode_cursor(cursor)
+            # Start one commit early to check that the cursor's SHA is still in place
+            try:
+                window = list(self.iter_commits(repo_path, rev=head, skip=position - 1, max_count=limit + 2))
+            except RuntimeError:
+                raise ValueError("Cursor refers to a revision that no longer exists")
+            if not window or window[0]['sha'] != last_sha:
+                raise ValueError("Cursor no longer matches the repository history")
+            window = window[1:]
+        else:
+            head = Repo(repo_path).head.commit.hexsha
+            position = skip
+            window = list(self.iter_commits(repo_path, rev=head, skip=position, max_count=limit + 1))
+            total = None
+        
+        commits = window[:limit]
+        has_more = len(window) > limit
+        if total is None:
+            # A first page that reaches the end of the history already knows the count
+            if has_more or not commits:
+                total = self.count_commits(repo_path, head)
+            else:
+                total = position + len(commits)
+        next_cursor = None
+        if has_more:
+            next_cursor = self._encode_cursor(head, commits[-1]['sha'], position + len(commits), total)
+        
+        return {
+            'commits': commits,
+            'next_cursor': next_cursor,
+            'has_more': has_more,
+            'total_commits': total
+        }
+    
+    @staticmethod
+    def _encode_cursor(head: str, last_sha: str, position: int, total: int) -> str:
+        """Encode a pagination cursor"""
+        payload = json.dumps({'head': head, 'sha': last_sha, 'pos': position, 'total': total}, separators=(',', ':'))
+        return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii')
+    
+    @staticmethod
+    def _decode_cursor(cursor: str) -> Tuple[str, str, int, Optional[int]]:
+        """Decode a pagination cursor into (head, last SHA, position, total commits or None)"""
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+            head, last_sha, position = payload['head'], payload['sha'], int(payload['pos'])
+            # Cursors issued before the total was carried are counted once more
+            total = int(payload['total']) if payload.get('total') is not None else None
+        except Exception:
+            raise ValueError("Invalid cursor")
+        if position < 1 or not all(re.fullmatch(r'[0-9a-f]{40}', sha) for sha in (head, last_sha)):
+            raise ValueError("Invalid cursor")
+        return head, last_sha, position, total
     
-    def get_repository_stats(self, repo_path: str) -> Dict:
+    def get_repository_stats(
+        self,
+        repo_path: str,
+        include_line_stats: bool = True,
+        include_files: bool = True,
+        incremental: bool = False,
+        rev: str = 'HEAD'
+    ) -> Dict:
         """
         Get overall repository statistics
         
         Args:
             repo_path: Path to repository
+            include_line_stats: Aggregate contributor additions and deletions
+            include_files: Walk the HEAD tree for file types, lines and size
+            incremental: Reuse the aggregates saved by the previous incremental run and
+                only process commits and files changed since its HEAD. Falls back to a
+                full rebuild when that HEAD is no longer an ancestor (force-push).
+            rev: Branch, tag or commit to analyze; works on bare mirrors without a checkout
             
         Returns:
             Repository statistics
         """
         repo = Repo(repo_path)
+        head = repo.commit(rev).hexsha
         
-        # Get contributors - merge by name to avoid duplicates
-        contributors_by_name = {}
-        email_to_name = {}  # Track email to name mapping
+        state = self._load_stats_state(repo) if incremental else None
+        base = self._incremental_base(repo, state, head, include_line_stats, include_files)
+        if base:
+            collector = RepositoryStatsCollector.from_state(state, include_files)
+            history_rev = f"{base}..{head}"
+        else:
+            collector = RepositoryStatsCollector()
+            history_rev = head
         
-        for commit in repo.iter_commits():
-            author_email = commit.author.email
-            author_name = commit.author.name
-            
-            # Use name as the key to merge same person with different emails
-            if author_name not in contributors_by_name:
-                # Try to get GitHub username from email
-                github_username = None
-                avatar_url = None
-                
-                # Common GitHub email patterns
-                if 'users.noreply.github.com' in author_email:
-                    # Extract username from noreply email
-                    parts = author_email.split('@')[0].split('+')
-                    if len(parts) > 1:
-                        github_username = parts[1]
-                    else:
-                        github_username = parts[0]
-                
-                # If we have a GitHub username, construct avatar URL
-                if github_username:
-                    avatar_url = f"https://avatars.githubusercontent.com/{github_username}"
-                else:
-                    # Use Gravatar as fallback
-                    import hashlib
-                    email_hash = hashlib.md5(author_email.lower().encode('utf-8')).hexdigest()
-                    avatar_url = f"https://www.gravatar.com/avatar/{email_hash}?d=identicon&s=100"
-                
-                contributors_by_name[author_name] = {
-                    'name': author_name,
-                    'email': author_email,  # Primary email
-                    'emails': [author_email],  # All emails used
-                    'github_username': github_username,
-                    'avatar_url': avatar_url,
-                    'commits': 0,
-                    'additions': 0,
-                    'deletions': 0
-                }
+        if self.is_partial_clone(repo_path) and (include_line_stats or include_files):
+            # Batch-fetch what the walks below read, instead of one lazy fetch per object
+            try:
+                self.prefetch_objects(
+                    repo_path,
+                    rev=history_rev if include_line_stats else head,
+                    history=include_line_stats
+                )
+            except Exception as e:
+                logger.warning(f"Failed to prefetch objects for {repo_path}: {str(e)}")
+        
+        # One history walk (a single git log process) for commit count and contributor aggregates
+        for commit in CommitLogReader(repo_path).iter_commits(rev=history_rev, numstat=include_line_stats):
+            collector.add_commit(
+                commit['author'],
+                commit['author_email'],
+                commit['additions'],
+                commit['deletions']
+            )
+        
+        if include_files:
+            if base:
+                self._apply_tree_diff(repo_path, collector, base, head)
             else:
-                # Add email to the list if not already there
-                if author_email not in contributors_by_name[author_name]['emails']:
-                    contributors_by_name[author_name]['emails'].append(author_email)
-            
-            # Track email to name mapping
-            email_to_name[author_email] = author_name
-            
-            # Update stats
-            contributors_by_name[author_name]['commits'] += 1
-            contributors_by_name[author_name]['additions'] += commit.stats.total['insertions']
-            contributors_by_name[author_name]['deletions'] += commit.stats.total['deletions']
-        
-        # Convert back to email-keyed dict for compatibility, but use the primary email
-        contributors = {}
-        for name, data in contributors_by_name.items():
-            primary_email = data['email']
-            contributors[primary_email] = data
-        
-        # Get file types and count lines
-        file_types = {}
-        total_lines = 0
-        total_files = 0
-        
-        for item in repo.tree().traverse():
-            if item.type == 'blob':
-                ext = os.path.splitext(item.path)[1]
-                if ext:
-                    file_types[ext] = file_types.get(ext, 0) + 1
-                
-                # Count lines in text files
-                try:
-                    # Only count lines in common text file extensions
-                    text_extensions = ['.py', '.js', '.ts', '.jsx', '.tsx', '.java', '.cpp', '.c', 
-                                     '.h', '.hpp', '.cs', '.rb', '.go', '.rs', '.php', '.swift', 
-                                     '.kt', '.scala', '.r', '.m', '.mm', '.vue', '.dart']
-                    if ext in text_extensions:
-                        content = item.data_stream.read()
-                        if content:
-                            lines = content.decode('utf-8', errors='ignore').count('\n')
-                            total_lines += lines
-                except:
-                    pass  # Skip files that can't be read
-                
-                total_files += 1
-        
-        # Get repository size info
-        repo_size = sum(item.size for item in repo.tree().traverse() if item.type == 'blob')
+                self._collect_tree(repo_path, collector, head)
         
-        return {
-            'total_commits': len(list(repo.iter_commits())),
-            'total_lines': total_lines,
-            'total_files': total_files,
-            'repository_size': repo_size,  # in bytes
-            'contributors': contributors,
-            'file_types': file_types,
+        if incremental:
+            self._save_stats_state(repo, {
+                **collector.to_state(),
+                'head': head,
+                'line_stats': include_line_stats,
+                'include_files': include_files
+            })
+        
+        stats = collector.to_dict()
+        stats.update({
+            'head_commit': head,
             'default_branch': repo.active_branch.name,
             'branches': [b.name for b in repo.branches],
             'tags': [t.name for t in repo.tags]
-        }
+        })
+        return stats
+    
+    def _collect_tree(self, repo_path: str, collector: RepositoryStatsCollector, rev: str):
+        """One tree walk (a single ls-tree process) for file types, line counts and repository size"""
+        tree = TreeReader(repo_path, rev)
+        files = tree.list_files(include_symlinks=True)
+        for entry in files:
+            if not collector.counts_lines(entry['path']):
+                collector.add_blob(entry['path'], entry['size'])
+        
+        # Read the text files in bulk through the shared cat-file processes
+        for entry, content in tree.iter_contents(files, lambda entry: collector.counts_lines(entry['path'])):
+            collector.add_blob(entry['path'], entry['size'], content)
+    
+    def _apply_tree_diff(self, repo_path: str, collector: RepositoryStatsCollector, base: str, head: str):
+        """Update file statistics with only the paths that changed between two commits"""
+        if base == head:
+            return
+        
+        output = Repo(repo_path).git.diff_tree('-r', '-z', '--no-renames', base, head)
+        tokens = output.split('\0')
+        added = []
+        for meta, path in zip(tokens[0::2], tokens[1::2]):
+            _, new_mode, _, new_sha, status = meta.lstrip(':').split(' ')
+            collector.remove_blob(path)
+            # Submodules (gitlinks) are not blobs
+            if status != 'D' and new_mode != '160000':
+                added.append((path, new_sha))
+        
+        reader = BlobReader.for_repo(repo_path)
+        sizes = dict(reader.read_sizes(sha for _, sha in added))
+        text_blobs = [(path, sha) for path, sha in added if collector.counts_lines(path)]
+        for path, sha in added:
+            if not collector.counts_lines(path):
+                collector.add_blob(path, sizes[sha] or 0)
+        
+        contents = reader.read_blobs(sha for _, sha in text_blobs)
+        for (path, sha), (_, content) in zip(text_blobs, contents):
+            collector.add_blob(path, sizes[sha] or 0, content)
+    
+    def _incremental_base(
+        self,
+        repo: Repo,
+        state: Optional[Dict],
+        head: str,
+        include_line_stats: bool,
+        include_files: bool
+    ) -> Optional[str]:
+        """HEAD covered by saved state, if it can be extended to the current HEAD"""
+        if not state:
+            return None
+        if state.get('line_stats') != include_line_stats or state.get('include_files') != include_files:
+            return None
+        
+        base = state.get('head')
+        if base == head:
+            return base
+        try:
+            if self.is_ancestor(repo.git_dir, base, head):
+                return base
+        except RuntimeError as e:
+            logger.warning(f"Ancestry check failed for {repo.git_dir}: {str(e)}")
+            return None
+        logger.info(f"Saved stats for {repo.git_dir} are not an ancestor of {head}, rebuilding")
+        return None
+    
+    @staticmethod
+    def _stats_state_path(repo: Repo) -> str:
+        return os.path.join(repo.git_dir, 'reposcope', 'stats_state.json')
+    
+    def _load_stats_state(self, repo: Repo) -> Optional[Dict]:
+        try:
+            with open(self._stats_state_path(repo), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable stats state: {str(e)}")
+            return None
+    
+    def _save_stats_state(self, repo: Repo, state: Dict):
+        path = self._stats_state_path(repo)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write a private file then rename, so neither a crash nor a concurrent run
+        # on the same mirror ever leaves a torn state file behind
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.stats-', suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(state, f, separators=(',', ':'))
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
     
     def cleanup(self, repo_path: str):
         """Clean up cloned repository"""
         import shutil
+        BlobReader.close_repo(repo_path)
+        if self.workspaces.release(repo_path):
+            return
         try:
             shutil.rmtree(repo_path)
             logger.info(f"Cleaned up repository at {repo_path}")
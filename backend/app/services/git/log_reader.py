@@ -0,0 +1,154 @@
+"""
+Commit Log Reader
+Streams commit metadata and numstat totals from a single `git log` process.
+"""
+import subprocess
+from typing import BinaryIO, Dict, Iterator, List, Optional, Tuple
+from app.services.git.workspace_manager import reader_lease
+import logging
+
+logger = logging.getLogger(__name__)
+
+RECORD_SEP = b'\x1e'
+FIELD_SEP = b'\x1f'
+LOG_FORMAT = '%x1e%H%x1f%an%x1f%ae%x1f%aI%x1f%ct%x1f%B%x1f'
+CHUNK_SIZE = 64 * 1024
+
+
+class CommitLogReader:
+    """Read commits with per-commit additions, deletions and files from one subprocess"""
+
+    def __init__(self, repo_path: str):
+        self.repo_path = repo_path
+
+    def iter_commits(
+        self,
+        rev: Optional[str] = None,
+        max_count: Optional[int] = None,
+        skip: int = 0,
+        numstat: bool = True,
+        since: Optional[int] = None,
+        until: Optional[int] = None,
+        file_stats: bool = False
+    ) -> Iterator[Dict]:
+        """
+        Stream commits newest first, parsing `git log` output incrementally
+
+        Args:
+            rev: Revision or range to walk (defaults to HEAD)
+            max_count: Maximum number of commits to yield
+            skip: Number of commits to skip before yielding
+            numstat: Include additions, deletions and files for each commit
+            since: Only commits committed at or after this Unix time
+            until: Only commits committed before this Unix time
+            file_stats: Also include (path, additions, deletions) per file, binary
+                files counting 0 lines; implies numstat
+
+        Yields:
+            Commit data in the shape returned by GitService.get_commit_history, plus
+            the commit time as a Unix timestamp
+        """
+        args = ['git', 'log', f'--format={LOG_FORMAT}', '-z']
+        if numstat or file_stats:
+            # Match commit.stats: diff merges against their first parent, no rename detection
+            args += ['--numstat', '--no-renames', '--diff-merges=first-parent']
+        if max_count is not None:
+            args.append(f'--max-count={max_count}')
+        if skip:
+            args.append(f'--skip={skip}')
+        if since is not None:
+            args.append(f'--since=@{since}')
+        if until is not None:
+            args.append(f'--until=@{until}')
+        args += [rev or 'HEAD', '--']
+
+        # Held until the walk ends, so the mirror is never evicted under git
+        with reader_lease(self.repo_path):
+            process = subprocess.Popen(
+                args,
+                cwd=self.repo_path,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE
+            )
+            try:
+                for record in iter_records(process.stdout):
+                    yield self._parse_record(record, file_stats)
+
+                if process.wait() != 0:
+                    error = process.stderr.read().decode('utf-8', errors='replace').strip()
+                    logger.error(f"git log failed in {self.repo_path}: {error}")
+                    raise RuntimeError(f"git log failed: {error}")
+            finally:
+                # Stop git early if the consumer abandoned the generator
+                if process.poll() is None:
+                    process.kill()
+                    process.wait()
+                process.stdout.close()
+                process.stderr.close()
+
+    @staticmethod
+    def _parse_record(record: bytes, file_stats: bool = False) -> Dict:
+        """Parse one commit record: header fields followed by NUL-terminated numstat entries"""
+        sha, author, email, date, timestamp, message, rest = record.split(FIELD_SEP, 6)
+
+        files: List[str] = []
+        stats: List[Tuple[str, int, int]] = []
+        additions = deletions = 0
+        for entry in rest.split(b'\0'):
+            entry = entry.strip(b'\n')
+            if not entry:
+                continue
+            added, deleted, path = entry.split(b'\t', 2)
+            # Binary files report '-' for both counts
+            added = int(added) if added != b'-' else 0
+            deleted = int(deleted) if deleted != b'-' else 0
+            additions += added
+            deletions += deleted
+            files.append(path.decode('utf-8', errors='replace'))
+            if file_stats:
+                stats.append((files[-1], added, deleted))
+
+        commit = {
+            'sha': sha.decode('ascii'),
+            'author': author.decode('utf-8', errors='replace'),
+            'author_email': email.decode('utf-8', errors='replace'),
+            'date': date.decode('ascii'),
+            'timestamp': int(timestamp),
+            'message': message.decode('utf-8', errors='replace').strip(),
+            'files_changed': len(files),
+            'additions': additions,
+            'deletions': deletions,
+            'files': files
+        }
+        if file_stats:
+            commit['file_stats'] = stats
+        return commit
+
+
+def iter_records(stream: BinaryIO, separator: bytes = RECORD_SEP) -> Iterator[bytes]:
+    """
+    Split a byte stream into the non-empty records between separators, reading it in chunks
+
+    Each chunk is searched only from where the previous search stopped, so a record
+    spanning many chunks (e.g. a commit touching thousands of files) costs linear time.
+    """
+    buffer = bytearray()
+    searched = 0
+    while True:
+        chunk = stream.read(CHUNK_SIZE)
+        if not chunk:
+            break
+        buffer += chunk
+        start = 0
+        while True:
+            end = buffer.find(separator, searched)
+            if end < 0:
+                break
+            if end > start:
+                yield bytes(buffer[start:end])
+            start = searched = end + len(separator)
+        # Keep the incomplete last record; a separator may straddle the chunk boundary
+        del buffer[:start]
+        searched = max(len(buffer) - len(separator) + 1, 0)
+    if buffer:
+        yield bytes(buffer)
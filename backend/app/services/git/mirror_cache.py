@@ -0,0 +1,304 @@
+"""
+Mirror Cache
+Keeps persistent bare mirrors of remote repositories and updates them with incremental fetches.
+Mirrors carry a commit-graph and reachability bitmaps, refreshed after every fetch that changes refs.
+The cache directory is kept under a disk budget by evicting the least recently used mirrors.
+"""
+import os
+import re
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional
+from git import Repo
+from app.core.config import settings
+from app.services.git.blob_reader import BlobReader
+from app.services.git.workspace_manager import READERS_SUFFIX, disk_usage, lock_file, unlock_file
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Branches and tags only; a plain --mirror would also pull refs/pull/* from GitHub
+FETCH_REFSPECS = ['+refs/heads/*:refs/heads/*', '+refs/tags/*:refs/tags/*']
+
+# Commit-graph with changed-path Bloom filters; --split appends a small layer per fetch
+COMMIT_GRAPH_COMMAND = ['commit-graph', 'write', '--reachable', '--changed-paths', '--split', '--no-progress']
+
+
+class MirrorCache:
+    """Bare-mirror cache keyed by repository full name"""
+
+    _locks: Dict[str, threading.Lock] = {}
+    _locks_guard = threading.Lock()
+
+    def __init__(self, cache_dir: Optional[str] = None, budget_bytes: Optional[int] = None):
+        self.cache_dir = cache_dir or settings.REPO_CACHE_DIR or os.path.join(
+            tempfile.gettempdir(), 'reposcope-cache'
+        )
+        self.budget_bytes = budget_bytes if budget_bytes is not None else settings.REPO_CACHE_DISK_BUDGET_MB * 1024 * 1024
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def mirror_path(self, repo_full_name: str) -> str:
+        """Path of the bare mirror for owner/name"""
+        safe_name = re.sub(r'[^A-Za-z0-9._-]', '_', repo_full_name.strip('/').replace('/', '__'))
+        return os.path.join(self.cache_dir, f"{safe_name}.git")
+
+    def get_or_update(
+        self,
+        repo_full_name: str,
+        repo_url: str,
+        access_token: Optional[str] = None,
+        clone_filter: Optional[str] = None
+    ) -> str:
+        """
+        Return an up-to-date bare mirror, cloning on first use and fetching afterwards
+
+        Args:
+            repo_full_name: Repository full name (owner/name), used as the cache key
+            repo_url: Repository URL without credentials
+            access_token: GitHub access token for private repos
+            clone_filter: Partial clone filter for a new mirror (e.g. blob:none)
+
+        Returns:
+            Path to the bare mirror
+        """
+        path = self.mirror_path(repo_full_name)
+        auth_url = self.auth_url(repo_url, access_token)
+
+        with self._exclusive(path):
+            grew = self._update(path, repo_full_name, repo_url, auth_url, clone_filter)
+            # Readers lease the mirror through this file (see reader_lease); without it they take none
+            open(path + READERS_SUFFIX, 'a').close()
+            self.touch(path)
+        if grew:
+            self.enforce_budget(keep=path)
+        return path
+
+    def _update(self, path: str, repo_full_name: str, repo_url: str, auth_url: str, clone_filter: Optional[str]) -> bool:
+        """Fetch into the mirror, or clone it if it is missing or broken; returns whether it grew"""
+        if os.path.isdir(path):
+            try:
+                repo = Repo(path)
+                refs_before = self._ref_snapshot(repo)
+                self._fetch(repo, auth_url)
+                if self._ref_snapshot(repo) == refs_before:
+                    return False
+                self.write_traversal_indexes(path)
+                return True
+            except Exception as e:
+                # A corrupt or half-written mirror is rebuilt from scratch
+                logger.warning(f"Fetch into mirror {path} failed, recloning: {str(e)}")
+                BlobReader.close_repo(path)
+                shutil.rmtree(path, ignore_errors=True)
+
+        logger.info(f"Creating mirror for {repo_full_name}")
+        clone_options = {'filter': clone_filter} if clone_filter else {}
+        repo = Repo.clone_from(auth_url, path, bare=True, **clone_options)
+        # Never persist the token in the mirror's config
+        repo.remote('origin').set_url(repo_url)
+        with repo.config_writer() as config:
+            config.set_value('remote "origin"', 'fetch', FETCH_REFSPECS[0])
+        self.write_traversal_indexes(path)
+        return True
+
+    def create_worktree(self, mirror_path: str, rev: str = 'HEAD', worktree_path: Optional[str] = None) -> str:
+        """
+        Check out a revision of a mirror into a worktree
+
+        Worktrees share the mirror's object database, so no objects are copied.
+
+        Args:
+            mirror_path: Path to the bare mirror
+            rev: Revision to check out
+            worktree_path: Where to create the worktree, defaults to a new temporary directory
+
+        Returns:
+            Path to the worktree
+        """
+        if worktree_path is None:
+            name = os.path.basename(mirror_path)[:-len('.git')]
+            worktree_path = os.path.join(
+                tempfile.gettempdir(), f"reposcope_{name}_{datetime.now().timestamp()}"
+            )
+        with self._exclusive(mirror_path):
+            Repo(mirror_path).git.worktree('add', '--detach', worktree_path, rev)
+        return worktree_path
+
+    def remove_worktree(self, mirror_path: str, worktree_path: str):
+        """Remove a worktree created by create_worktree"""
+        with self._exclusive(mirror_path):
+            repo = Repo(mirror_path)
+            try:
+                repo.git.worktree('remove', '--force', worktree_path)
+            except Exception as e:
+                logger.error(f"Failed to remove worktree {worktree_path}: {str(e)}")
+                shutil.rmtree(worktree_path, ignore_errors=True)
+            repo.git.worktree('prune')
+
+    def prune_worktrees(self):
+        """Drop worktree records whose directories no longer exist, e.g. after an orphan sweep"""
+        for entry in os.scandir(self.cache_dir):
+            if not entry.name.endswith('.git'):
+                continue
+            with self._lock_for(entry.path):
+                try:
+                    Repo(entry.path).git.worktree('prune')
+                except Exception as e:
+                    logger.warning(f"Failed to prune worktrees of {entry.path}: {str(e)}")
+
+    def touch(self, mirror_path: str):
+        """Record a use of a mirror; eviction goes by the mirror directory's modification time"""
+        try:
+            os.utime(mirror_path)
+        except OSError:
+            pass
+
+    def enforce_budget(self, keep: Optional[str] = None) -> List[str]:
+        """
+        Evict the least recently used mirrors until the cache directory fits its budget
+
+        Everything in the cache directory counts, including the parse cache and the
+        symbol index, but only mirrors are evicted; those files are bounded by their
+        own limits. Mirrors are kept while a clone or fetch holds them, while any
+        process reads them under a reader lease, while worktrees are checked out of
+        them, and for REPO_CACHE_EVICT_GRACE_SECONDS after their last use, which
+        covers a caller between getting the path and starting to read.
+
+        Args:
+            keep: Mirror never to evict, e.g. the one just fetched
+
+        Returns:
+            Paths of the evicted mirrors
+        """
+        mirrors = []
+        used = 0
+        for entry in os.scandir(self.cache_dir):
+            try:
+                if entry.name.endswith('.git') and entry.is_dir(follow_symlinks=False):
+                    size = disk_usage(entry.path)
+                    mirrors.append((entry.stat().st_mtime, entry.path, size))
+                elif entry.is_file(follow_symlinks=False):
+                    size = entry.stat().st_size
+                else:
+                    continue
+            except OSError:
+                continue
+            used += size
+        if used <= self.budget_bytes:
+            return []
+
+        evicted = []
+        recent = time.time() - settings.REPO_CACHE_EVICT_GRACE_SECONDS
+        for used_at, path, size in sorted(mirrors):
+            if used <= self.budget_bytes:
+                break
+            if path == keep or used_at > recent or self._has_worktrees(path):
+                continue
+            with self._exclusive(path, blocking=False) as locked:
+                if not locked:
+                    continue
+                readers_fd = lock_file(path + READERS_SUFFIX, blocking=False)
+                if readers_fd is None:
+                    continue
+                try:
+                    BlobReader.close_repo(path)
+                    shutil.rmtree(path, ignore_errors=True)
+                finally:
+                    unlock_file(readers_fd)
+            logger.info(f"Evicted mirror {path} ({size} bytes)")
+            evicted.append(path)
+            used -= size
+
+        if used > self.budget_bytes:
+            logger.warning(f"Repository cache exceeds its disk budget: {used} > {self.budget_bytes} bytes")
+        return evicted
+
+    def write_traversal_indexes(self, mirror_path: str):
+        """
+        Refresh the commit-graph and reachability bitmaps of a mirror
+
+        The commit-graph speeds up every history walk, ancestry check and path-limited
+        log; the bitmaps make commit counting nearly free. Both are optional to git,
+        so failures are logged and the mirror stays usable.
+
+        Args:
+            mirror_path: Path to the bare mirror
+        """
+        if self._is_partial(mirror_path):
+            # Geometric repacks refuse promisor packs, so index the existing packs as they are
+            pack_command = ['multi-pack-index', 'write', '--bitmap', '--no-progress']
+        else:
+            # Roll small fetch packs into larger ones so the pack count stays logarithmic
+            pack_command = ['repack', '-d', '-q', '--geometric=2', '--write-midx', '--write-bitmap-index']
+
+        for command in (pack_command, COMMIT_GRAPH_COMMAND):
+            result = subprocess.run(['git', *command], cwd=mirror_path, capture_output=True, text=True)
+            if result.returncode != 0:
+                logger.warning(f"git {command[0]} failed for mirror {mirror_path}: {result.stderr.strip()}")
+
+    @staticmethod
+    def _has_worktrees(mirror_path: str) -> bool:
+        try:
+            return bool(os.listdir(os.path.join(mirror_path, 'worktrees')))
+        except OSError:
+            return False
+
+    @staticmethod
+    def _is_partial(mirror_path: str) -> bool:
+        return Repo(mirror_path).config_reader().get_value('remote "origin"', 'partialclonefilter', '') != ''
+
+    @staticmethod
+    def _ref_snapshot(repo: Repo) -> str:
+        return repo.git.for_each_ref('--format=%(objectname) %(refname)')
+
+    @staticmethod
+    def _fetch(repo: Repo, auth_url: str):
+        """Fetch only new objects for branches and tags"""
+        options = ['--prune', '--no-write-fetch-head']
+        # Fetching by URL bypasses the remote's config, so keep partial mirrors partial explicitly
+        clone_filter = repo.config_reader().get_value('remote "origin"', 'partialclonefilter', '')
+        if clone_filter:
+            options.append(f'--filter={clone_filter}')
+        # Keep fetched objects packed, never loose, so the bitmaps can cover them
+        repo.git(c='fetch.unpackLimit=1').fetch(*options, auth_url, *FETCH_REFSPECS)
+
+    @staticmethod
+    def auth_url(repo_url: str, access_token: Optional[str]) -> str:
+        """Add token to URL if provided (for private repos)"""
+        if access_token and 'github.com' in repo_url:
+            return repo_url.replace('https://', f'https://{access_token}@')
+        return repo_url
+
+    @contextmanager
+    def _exclusive(self, path: str, blocking: bool = True) -> Iterator[bool]:
+        """
+        Hold a mirror against this and every other worker process
+
+        Yields whether the mirror is held; only False when not blocking and it is busy.
+        """
+        lock = self._lock_for(path)
+        if not lock.acquire(blocking):
+            yield False
+            return
+        try:
+            # The lock file sits beside the mirror and outlives it, so it is never swapped under a holder
+            fd = lock_file(path + '.lock', blocking)
+            if fd is None:
+                yield False
+                return
+            try:
+                yield True
+            finally:
+                unlock_file(fd)
+        finally:
+            lock.release()
+
+    @classmethod
+    def _lock_for(cls, path: str) -> threading.Lock:
+        """Per-mirror lock so concurrent requests don't clone or fetch the same repo twice"""
+        with cls._locks_guard:
+            return cls._locks.setdefault(path, threading.Lock())
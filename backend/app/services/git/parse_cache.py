@@ -0,0 +1,150 @@
+"""
+Parse Cache
+Persistent, size-bounded store of code parse results keyed by git blob SHA and parser version.
+"""
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import zlib
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from app.core.config import settings
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Keep evicting until usage drops to this fraction of the budget, so eviction runs rarely
+EVICT_TO = 0.9
+# Recency is only rewritten when it is older than this, to keep hits read-only
+TOUCH_INTERVAL_SECONDS = 3600
+
+CacheKey = Tuple[str, str]  # (blob SHA, parser key such as '.py@3')
+
+
+class ParseCache:
+    """SQLite-backed LRU of zlib-compressed JSON parse results"""
+
+    def __init__(self, path: Optional[str] = None, max_bytes: Optional[int] = None):
+        self.path = path or settings.PARSE_CACHE_PATH or os.path.join(
+            settings.REPO_CACHE_DIR or os.path.join(tempfile.gettempdir(), 'reposcope-cache'),
+            'parse-cache.sqlite3'
+        )
+        self.max_bytes = max_bytes if max_bytes is not None else settings.PARSE_CACHE_MB * 1024 * 1024
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        # Used from asyncio.to_thread workers, always under self._lock
+        self._db = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('PRAGMA synchronous=NORMAL')
+        self._db.execute(
+            'CREATE TABLE IF NOT EXISTS results ('
+            ' sha TEXT NOT NULL, parser TEXT NOT NULL, data BLOB NOT NULL,'
+            ' size INTEGER NOT NULL, last_used INTEGER NOT NULL,'
+            ' PRIMARY KEY (sha, parser)) WITHOUT ROWID'
+        )
+        self._db.execute('CREATE INDEX IF NOT EXISTS results_last_used ON results (last_used)')
+
+    def get_many(self, keys: Iterable[CacheKey]) -> Dict[CacheKey, Dict[str, Any]]:
+        """
+        Look up many results at once
+
+        Args:
+            keys: (blob SHA, parser key) pairs
+
+        Returns:
+            Decoded results for the keys that are cached; callers get their own copies
+        """
+        keys = set(keys)
+        shas = list({sha for sha, _ in keys})
+        found: Dict[CacheKey, Dict[str, Any]] = {}
+        stale: List[CacheKey] = []
+        now = int(time.time())
+
+        with self._lock:
+            # Stay well under SQLite's bound-parameter limit
+            for start in range(0, len(shas), 500):
+                batch = shas[start:start + 500]
+                rows = self._db.execute(
+                    f"SELECT sha, parser, data, last_used FROM results WHERE sha IN ({','.join('?' * len(batch))})",
+                    batch
+                )
+                for sha, parser, data, last_used in rows:
+                    if (sha, parser) not in keys:
+                        continue
+                    found[(sha, parser)] = json.loads(zlib.decompress(data))
+                    if now - last_used > TOUCH_INTERVAL_SECONDS:
+                        stale.append((sha, parser))
+            if stale:
+                self._db.executemany(
+                    'UPDATE results SET last_used = ? WHERE sha = ? AND parser = ?',
+                    [(now, sha, parser) for sha, parser in stale]
+                )
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+        return found
+
+    def put_many(self, items: Iterable[Tuple[CacheKey, Dict[str, Any]]]):
+        """Store results, then evict least recently used ones if over budget"""
+        now = int(time.time())
+        rows = []
+        for (sha, parser), result in items:
+            data = zlib.compress(json.dumps(result, separators=(',', ':')).encode('utf-8'))
+            rows.append((sha, parser, data, len(data), now))
+        if not rows:
+            return
+
+        with self._lock:
+            self._db.execute('BEGIN')
+            try:
+                self._db.executemany('INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?)', rows)
+                self._db.execute('COMMIT')
+            except Exception:
+                self._db.execute('ROLLBACK')
+                raise
+            self._evict()
+
+    def metrics(self) -> Dict[str, Any]:
+        """Entry count, stored bytes and hit rate"""
+        with self._lock:
+            entries, stored = self._db.execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM results').fetchone()
+            lookups = self.hits + self.misses
+            return {
+                'entries': entries,
+                'bytes_used': stored,
+                'budget_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0
+            }
+
+    def _evict(self):
+        total = self._db.execute('SELECT COALESCE(SUM(size), 0) FROM results').fetchone()[0]
+        if total <= self.max_bytes:
+            return
+
+        target = total - int(self.max_bytes * EVICT_TO)
+        freed = 0
+        victims = []
+        for sha, parser, size in self._db.execute('SELECT sha, parser, size FROM results ORDER BY last_used'):
+            victims.append((sha, parser))
+            freed += size
+            if freed >= target:
+                break
+        self._db.executemany('DELETE FROM results WHERE sha = ? AND parser = ?', victims)
+        logger.info(f"Evicted {len(victims)} parse results ({freed} bytes) from {self.path}")
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+@lru_cache()
+def get_parse_cache() -> ParseCache:
+    """Get the process-wide parse cache"""
+    return ParseCache()
@@ -0,0 +1,163 @@
+"""
+Repository Stats Collector
+Accumulates repository statistics from a single history walk and a single tree walk.
+"""
+import hashlib
+import os
+from typing import Dict, List, Optional
+
+# Only count lines in common text file extensions
+TEXT_EXTENSIONS = frozenset([
+    '.py', '.js', '.ts', '.jsx', '.tsx', '.java', '.cpp', '.c',
+    '.h', '.hpp', '.cs', '.rb', '.go', '.rs', '.php', '.swift',
+    '.kt', '.scala', '.r', '.m', '.mm', '.vue', '.dart'
+])
+
+
+class RepositoryStatsCollector:
+    """Collect commit, contributor and file statistics in one pass over each source"""
+
+    def __init__(self):
+        self.total_commits = 0
+        self.contributors_by_name: Dict[str, Dict] = {}
+        self.file_types: Dict[str, int] = {}
+        self.total_lines = 0
+        self.total_files = 0
+        self.repository_size = 0
+        self.files: Dict[str, List[int]] = {}  # path -> [size, lines], so blobs can be removed again
+
+    def add_commit(self, author_name: str, author_email: str, additions: int, deletions: int):
+        """
+        Fold one commit into the commit count and contributor aggregates
+
+        Args:
+            author_name: Commit author name
+            author_email: Commit author email
+            additions: Lines added by the commit
+            deletions: Lines deleted by the commit
+        """
+        self.total_commits += 1
+
+        # Use name as the key to merge same person with different emails
+        contributor = self.contributors_by_name.get(author_name)
+        if contributor is None:
+            contributor = self._new_contributor(author_name, author_email)
+            self.contributors_by_name[author_name] = contributor
+        elif author_email not in contributor['emails']:
+            # Add email to the list if not already there
+            contributor['emails'].append(author_email)
+
+        contributor['commits'] += 1
+        contributor['additions'] += additions
+        contributor['deletions'] += deletions
+
+    @staticmethod
+    def counts_lines(path: str) -> bool:
+        """Whether the blob at path contributes to total_lines"""
+        return os.path.splitext(path)[1] in TEXT_EXTENSIONS
+
+    def add_blob(self, path: str, size: int, content: Optional[bytes] = None):
+        """
+        Fold one blob of the HEAD tree into the file statistics
+
+        Args:
+            path: Path of the blob in the tree
+            size: Blob size in bytes
+            content: Blob contents, only needed when counts_lines(path) is true
+        """
+        self._add_entry(path, size, content.count(b'\n') if content else 0)
+
+    def remove_blob(self, path: str):
+        """Undo add_blob for a path that was deleted or modified"""
+        entry = self.files.pop(path, None)
+        if entry is None:
+            return
+
+        ext = os.path.splitext(path)[1]
+        if ext:
+            self.file_types[ext] -= 1
+            if not self.file_types[ext]:
+                del self.file_types[ext]
+
+        size, lines = entry
+        self.total_lines -= lines
+        self.total_files -= 1
+        self.repository_size -= size
+
+    def contributors(self) -> Dict[str, Dict]:
+        """Contributors keyed by primary email for compatibility"""
+        return {data['email']: data for data in self.contributors_by_name.values()}
+
+    def to_dict(self) -> Dict:
+        """Statistics in the shape returned by GitService.get_repository_stats"""
+        return {
+            'total_commits': self.total_commits,
+            'total_lines': self.total_lines,
+            'total_files': self.total_files,
+            'repository_size': self.repository_size,  # in bytes
+            'contributors': self.contributors(),
+            'file_types': self.file_types,
+        }
+
+    def to_state(self) -> Dict:
+        """JSON-serializable aggregate state, restorable with from_state"""
+        return {
+            'total_commits': self.total_commits,
+            'contributors_by_name': self.contributors_by_name,
+            'files': self.files,
+        }
+
+    @classmethod
+    def from_state(cls, state: Dict, include_files: bool = True) -> 'RepositoryStatsCollector':
+        """
+        Restore a collector saved with to_state
+
+        Args:
+            state: Saved aggregate state
+            include_files: Restore file statistics as well as commit aggregates
+        """
+        collector = cls()
+        collector.total_commits = state['total_commits']
+        collector.contributors_by_name = state['contributors_by_name']
+        if include_files:
+            for path, (size, lines) in state['files'].items():
+                collector._add_entry(path, size, lines)
+        return collector
+
+    def _add_entry(self, path: str, size: int, lines: int):
+        ext = os.path.splitext(path)[1]
+        if ext:
+            self.file_types[ext] = self.file_types.get(ext, 0) + 1
+        self.files[path] = [size, lines]
+        self.total_lines += lines
+        self.total_files += 1
+        self.repository_size += size
+
+    @staticmethod
+    def _new_contributor(author_name: str, author_email: str) -> Dict:
+        """Build the initial contributor record, resolving an avatar URL"""
+        github_username = None
+
+        # Common GitHub email patterns
+        if 'users.noreply.github.com' in author_email:
+            # Extract username from noreply email
+            parts = author_email.split('@')[0].split('+')
+            github_username = parts[1] if len(parts) > 1 else parts[0]
+
+        if github_username:
+            avatar_url = f"https://avatars.githubusercontent.com/{github_username}"
+        else:
+            # Use Gravatar as fallback
+            email_hash = hashlib.md5(author_email.lower().encode('utf-8')).hexdigest()
+            avatar_url = f"https://www.gravatar.com/avatar/{email_hash}?d=identicon&s=100"
+
+        return {
+            'name': author_name,
+            'email': author_email,  # Primary email
+            'emails': [author_email],  # All emails used
+            'github_username': github_username,
+            'avatar_url': avatar_url,
+            'commits': 0,
+            'additions': 0,
+            'deletions': 0
+        }
@@ -0,0 +1,292 @@
+"""
+Symbol Index
+Persistent per-repository index of definitions and imports built from parser output,
+updated incrementally as files change between revisions.
+"""
+import asyncio
+import os
+import posixpath
+import sqlite3
+import tempfile
+import threading
+import time
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from app.core.config import settings
+from app.services.git.code_parser import CodeParser
+from app.services.git.tree_reader import TreeReader
+import logging
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS revisions ('
+    ' repo TEXT PRIMARY KEY, rev TEXT NOT NULL, commit_sha TEXT NOT NULL, files INTEGER NOT NULL,'
+    ' updated_at INTEGER NOT NULL)',
+    'CREATE TABLE IF NOT EXISTS files ('
+    ' repo TEXT NOT NULL, path TEXT NOT NULL, sha TEXT NOT NULL, language TEXT,'
+    ' PRIMARY KEY (repo, path)) WITHOUT ROWID',
+    'CREATE TABLE IF NOT EXISTS symbols ('
+    ' repo TEXT NOT NULL, name TEXT NOT NULL, kind TEXT NOT NULL, qualname TEXT NOT NULL,'
+    ' path TEXT NOT NULL, line INTEGER)',
+    'CREATE INDEX IF NOT EXISTS symbols_by_name ON symbols (repo, name, path, qualname)',
+    'CREATE INDEX IF NOT EXISTS symbols_by_path ON symbols (repo, path)',
+    'CREATE TABLE IF NOT EXISTS imports (repo TEXT NOT NULL, module TEXT NOT NULL, path TEXT NOT NULL)',
+    'CREATE INDEX IF NOT EXISTS imports_by_module ON imports (repo, module, path)',
+    'CREATE INDEX IF NOT EXISTS imports_by_path ON imports (repo, path)',
+)
+
+SymbolRow = Tuple[str, str, str, Optional[int]]  # (name, kind, qualified name, line)
+
+# Blob SHA recorded for files that could not be indexed; it matches no blob, so updates retry them
+FAILED_SHA = ''
+
+
+class SymbolIndex:
+    """SQLite index of where names are defined and which files import which modules"""
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or settings.SYMBOL_INDEX_PATH or os.path.join(
+            settings.REPO_CACHE_DIR or os.path.join(tempfile.gettempdir(), 'reposcope-cache'),
+            'symbol-index.sqlite3'
+        )
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        # Separate connections, so queries read the last committed state while an update writes
+        self._writer = self._connect()
+        for statement in SCHEMA:
+            self._writer.execute(statement)
+        self._reader = self._connect()
+        self._write_lock = threading.Lock()
+        self._read_lock = threading.Lock()
+        # One update at a time per repository, each diffing against the state the previous one left
+        self._update_locks: Dict[str, asyncio.Lock] = {}
+
+    def _connect(self) -> sqlite3.Connection:
+        db = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        db.execute('PRAGMA journal_mode=WAL')
+        db.execute('PRAGMA synchronous=NORMAL')
+        return db
+
+    async def update(self, repo: str, repo_path: str, rev: str = 'HEAD') -> Dict[str, Any]:
+        """
+        Bring the index of a repository to a revision, parsing only files whose blob changed
+
+        Args:
+            repo: Repository key, e.g. 'owner/name'
+            repo_path: Path to the repository, bare mirrors work
+            rev: Revision to index
+
+        Returns:
+            Commit indexed, number of indexed files, and how many were re-parsed or removed
+        """
+        async with self._update_locks.setdefault(repo, asyncio.Lock()):
+            return await self._update(repo, repo_path, rev)
+
+    async def _update(self, repo: str, repo_path: str, rev: str) -> Dict[str, Any]:
+        started = time.perf_counter()
+        commit = await asyncio.to_thread(TreeReader.resolve_commit, repo_path, rev)
+        state = await asyncio.to_thread(self.status, repo)
+        if state is not None and state['commit'] == commit and not state['failed']:
+            return {'repo': repo, 'commit': commit, 'files': state['files'], 'parsed': 0, 'removed': 0}
+
+        parser = CodeParser()
+        listing = await asyncio.to_thread(TreeReader(repo_path, commit).list_files)
+        current = {
+            entry['path']: entry['sha'] for entry in listing
+            if Path(entry['path']).suffix.lower() in parser.language_parsers
+        }
+        indexed = await asyncio.to_thread(self._indexed_files, repo)
+        changed = [path for path, sha in current.items() if indexed.get(path) != sha]
+        removed = [path for path in indexed if path not in current]
+
+        results = []
+        if changed:
+            async for result in parser.parse_repository(repo_path, commit, paths=changed):
+                results.append(result)
+
+        await asyncio.to_thread(self._apply, repo, rev, commit, current, changed + removed, results)
+        logger.info(
+            f"Indexed {repo} at {commit[:12]}: {len(changed)} files parsed, {len(removed)} removed "
+            f"in {time.perf_counter() - started:.2f}s"
+        )
+        return {'repo': repo, 'commit': commit, 'files': len(current), 'parsed': len(changed), 'removed': len(removed)}
+
+    def status(self, repo: str) -> Optional[Dict[str, Any]]:
+        """
+        Revision and commit a repository is indexed at, or None if it was never indexed
+
+        `files` counts the indexed files and `failed` those the last update could not
+        read or parse, which the next update retries.
+        """
+        with self._read_lock:
+            row = self._reader.execute(
+                'SELECT rev, commit_sha, files, updated_at FROM revisions WHERE repo = ?', (repo,)
+            ).fetchone()
+            if row is None:
+                return None
+            failed = self._reader.execute(
+                'SELECT COUNT(*) FROM files WHERE repo = ? AND sha = ?', (repo, FAILED_SHA)
+            ).fetchone()[0]
+        return {'rev': row[0], 'commit': row[1], 'files': row[2], 'failed': failed, 'updated_at': row[3]}
+
+    def definitions(self, repo: str, name: str, limit: int = 100) -> List[Dict[str, Any]]:
+        """
+        Where a name is defined
+
+        Args:
+            repo: Repository key
+            name: Plain name ('parse'), or qualified ('CodeParser.parse') to narrow it down
+            limit: Maximum number of results
+
+        Returns:
+            Dicts with name, kind (class, function or method), qualname, path and line
+        """
+        short = name.rsplit('.', 1)[-1]
+        with self._read_lock:
+            # The name index is already in path order, so the scan stops after `limit` matches,
+            # and the qualified filter runs on its entries
+            rows = self._reader.execute(
+                'SELECT name, kind, qualname, path, line FROM symbols INDEXED BY symbols_by_name'
+                ' WHERE repo = ? AND name = ? AND (? OR qualname = ? OR substr(qualname, -?) = ?)'
+                ' ORDER BY path LIMIT ?',
+                (repo, short, short == name, name, len(name) + 1, '.' + name, limit)
+            ).fetchall()
+        return [
+            {'name': row[0], 'kind': row[1], 'qualname': row[2], 'path': row[3], 'line': row[4]}
+            for row in rows
+        ]
+
+    def importers(self, repo: str, module: str, limit: int = 100) -> List[Dict[str, str]]:
+        """
+        Files importing a module or any of its submodules
+
+        Args:
+            repo: Repository key
+            module: Dotted module ('app.services'), header ('stdio.h') or path ('src/utils')
+            limit: Maximum number of results
+
+        Returns:
+            Dicts with the importing path and the module it imports, by module then path
+        """
+        with self._read_lock:
+            # One range scan of the module index over [module, module + '0'), which holds the module
+            # and everything under 'module.' and 'module/'; the module itself comes first
+            rows = self._reader.execute(
+                'SELECT path, module FROM imports INDEXED BY imports_by_module'
+                " WHERE repo = ? AND module >= ? AND module < ? AND (module = ? OR substr(module, ?, 1) IN ('.', '/'))"
+                ' ORDER BY module, path LIMIT ?',
+                (repo, module, module + '0', module, len(module) + 1, limit)
+            ).fetchall()
+        return [{'path': row[0], 'module': row[1]} for row in rows]
+
+    def file_symbols(self, repo: str, path: str) -> Dict[str, Any]:
+        """Definitions and imports of one file"""
+        with self._read_lock:
+            symbols = self._reader.execute(
+                'SELECT name, kind, qualname, line FROM symbols INDEXED BY symbols_by_path WHERE repo = ? AND path = ?',
+                (repo, path)
+            ).fetchall()
+            imports = self._reader.execute(
+                'SELECT module FROM imports INDEXED BY imports_by_path WHERE repo = ? AND path = ?', (repo, path)
+            ).fetchall()
+        return {
+            'path': path,
+            'symbols': [{'name': row[0], 'kind': row[1], 'qualname': row[2], 'line': row[3]} for row in symbols],
+            'imports': [row[0] for row in imports]
+        }
+
+    def close(self):
+        with self._write_lock, self._read_lock:
+            self._writer.close()
+            self._reader.close()
+
+    def _indexed_files(self, repo: str) -> Dict[str, str]:
+        with self._read_lock:
+            return dict(self._reader.execute('SELECT path, sha FROM files WHERE repo = ?', (repo,)))
+
+    def _apply(
+        self,
+        repo: str,
+        rev: str,
+        commit: str,
+        current: Dict[str, str],
+        stale: List[str],
+        results: List[Dict[str, Any]]
+    ):
+        """Replace the rows of stale paths with the new parse results in one transaction"""
+        files, symbols, imports = [], [], []
+        for result in results:
+            path = result['path']
+            if 'error' in result or result.get('skipped') in ('too_large', 'missing'):
+                # Timed out, unparseable, oversized or unreadable: recorded as failed so the next
+                # update tries again; parse errors of an unchanged blob come back from the parse cache
+                files.append((repo, path, FAILED_SHA, result.get('language')))
+                continue
+            files.append((repo, path, current[path], result.get('language')))
+            symbols.extend((repo, name, kind, qualname, path, line) for name, kind, qualname, line in _symbols(result))
+            imports.extend((repo, module, path) for module in _imports(path, result))
+
+        with self._write_lock:
+            db = self._writer
+            db.execute('BEGIN')
+            try:
+                for table in ('files', 'symbols', 'imports'):
+                    db.executemany(f'DELETE FROM {table} WHERE repo = ? AND path = ?', ((repo, path) for path in stale))
+                db.executemany('INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?)', files)
+                db.executemany('INSERT INTO symbols VALUES (?, ?, ?, ?, ?, ?)', symbols)
+                db.executemany('INSERT INTO imports VALUES (?, ?, ?)', imports)
+                # Stored with the revision, so status() never has to count a large repository
+                count = db.execute(
+                    'SELECT COUNT(*) FROM files WHERE repo = ? AND sha != ?', (repo, FAILED_SHA)
+                ).fetchone()[0]
+                db.execute(
+                    'INSERT OR REPLACE INTO revisions VALUES (?, ?, ?, ?, ?)',
+                    (repo, rev, commit, count, int(time.time()))
+                )
+                db.execute('COMMIT')
+            except Exception:
+                db.execute('ROLLBACK')
+                raise
+
+
+def _symbols(result: Dict[str, Any]) -> Iterable[SymbolRow]:
+    """Definitions in a parse result, whatever the language"""
+    for cls in result.get('classes', []):
+        qualname = cls.get('qualname', cls['name'])
+        yield cls['name'], 'class', qualname, cls.get('line')
+        for method in cls.get('methods', []):
+            yield method, 'method', f"{qualname}.{method}", None
+    for function in result.get('functions', []):
+        yield function['name'], 'function', function['name'], function.get('line')
+    for function in result.get('nested_functions', []):
+        yield function['name'], 'function', function['qualname'], function.get('line')
+
+
+def _imports(path: str, result: Dict[str, Any]) -> Iterable[str]:
+    """Imported modules, with relative imports resolved against the importing file"""
+    for module in result.get('imports') or result.get('includes') or []:
+        if not module.startswith('.'):
+            yield module
+        elif result.get('language') == 'python':
+            yield _resolve_python_import(path, module)
+        else:
+            # './utils' from src/app.js is src/utils
+            yield posixpath.normpath(posixpath.join(posixpath.dirname(path), module))
+
+
+def _resolve_python_import(path: str, module: str) -> str:
+    """'..models' imported from pkg/sub/views.py is pkg.models"""
+    name = module.lstrip('.')
+    level = len(module) - len(name)
+    package = path.split('/')[:-1]
+    if level - 1 > len(package):
+        return module
+    base = package[:len(package) - (level - 1)]
+    return '.'.join(base + [name] if name else base)
+
+
+@lru_cache()
+def get_symbol_index() -> SymbolIndex:
+    """Get the process-wide symbol index"""
+    return SymbolIndex()
@@ -0,0 +1,110 @@
+"""
+Tree Reader
+Lists and reads the files of any revision straight from the object database, without a checkout.
+"""
+import subprocess
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+from app.services.git.blob_reader import BlobReader
+from app.services.git.workspace_manager import reader_lease
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Regular and executable files; symlinks are blobs too, but hold a link target
+FILE_MODES = ('100644', '100755')
+
+
+class TreeReader:
+    """Read-only view of one revision of a repository, bare or not"""
+
+    def __init__(self, repo_path: str, rev: str = 'HEAD'):
+        self.repo_path = repo_path
+        self.rev = rev
+        self._files: Optional[List[Dict]] = None
+
+    def list_files(self, include_symlinks: bool = False) -> List[Dict]:
+        """
+        All regular files at the revision, recursively
+
+        Args:
+            include_symlinks: Also list symlinks, which git stores as blobs
+
+        Returns:
+            Dicts with path, sha, size and mode, from a single `git ls-tree` process
+        """
+        if self._files is None:
+            with reader_lease(self.repo_path):
+                result = subprocess.run(
+                    ['git', 'ls-tree', '-r', '-l', '-z', '--full-tree', self.rev],
+                    cwd=self.repo_path,
+                    capture_output=True,
+                    check=True
+                )
+            files = []
+            for entry in result.stdout.split(b'\0'):
+                if not entry:
+                    continue
+                meta, path = entry.split(b'\t', 1)
+                mode, obj_type, sha, size = meta.split()
+                if obj_type != b'blob':
+                    continue
+                files.append({
+                    'path': path.decode('utf-8', errors='replace'),
+                    'sha': sha.decode('ascii'),
+                    'size': int(size),
+                    'mode': mode.decode('ascii')
+                })
+            self._files = files
+        if include_symlinks:
+            return self._files
+        return [entry for entry in self._files if entry['mode'] in FILE_MODES]
+
+    def iter_contents(
+        self,
+        files: Optional[Iterable[Dict]] = None,
+        predicate: Optional[Callable[[Dict], bool]] = None,
+        max_size: Optional[int] = -1
+    ) -> Iterator[Tuple[Dict, Optional[bytes]]]:
+        """
+        Stream file contents in bulk through the shared cat-file processes
+
+        Args:
+            files: Entries from list_files, defaults to all of them
+            predicate: Only read entries for which this returns True
+            max_size: Size limit in bytes, see BlobReader.read_blobs
+
+        Yields:
+            (entry, contents); contents is None for oversized files
+        """
+        entries = [
+            entry for entry in (self.list_files() if files is None else files)
+            if predicate is None or predicate(entry)
+        ]
+        contents = BlobReader.for_repo(self.repo_path).read_blobs(
+            (entry['sha'] for entry in entries), max_size
+        )
+        for entry, (_, data) in zip(entries, contents):
+            yield entry, data
+
+    def read_text(self, path: str, max_size: Optional[int] = -1) -> Optional[str]:
+        """Decoded contents of a single file, or None if missing or too large"""
+        data = BlobReader.for_repo(self.repo_path).read_blob(f"{self.rev}:{path}", max_size)
+        return data.decode('utf-8', errors='ignore') if data is not None else None
+
+    @staticmethod
+    def resolve_commit(repo_path: str, rev: str = 'HEAD') -> str:
+        """
+        Full SHA of the commit a revision names, to pin results to it
+
+        Raises:
+            ValueError: If rev does not name a commit
+        """
+        result = subprocess.run(
+            ['git', 'rev-parse', '--verify', '--end-of-options', f'{rev}^{{commit}}'],
+            cwd=repo_path,
+            capture_output=True,
+            text=True
+        )
+        if result.returncode != 0:
+            raise ValueError(f"Unknown revision: {rev}")
+        return result.stdout.strip()
@@ -0,0 +1,370 @@
+"""
+Workspace Manager
+Tracks on-disk clones and worktrees with leases, a disk budget and LRU eviction of idle ones.
+Each workspace has a lease file locked by the owning process for as long as the workspace
+exists, so other processes can tell live workspaces from ones a crashed process left behind.
+"""
+import os
+import shutil
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from functools import lru_cache
+from typing import Callable, Dict, Iterator, List, Optional
+from app.core.config import settings
+import logging
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+logger = logging.getLogger(__name__)
+
+WORKSPACE_PREFIX = 'reposcope_'
+LEASE_SUFFIX = '.lease'
+# Beside a cached mirror; everything reading the mirror holds it shared, eviction exclusively
+READERS_SUFFIX = '.readers'
+# Byte ranges shared holders lock one each where the OS has no shared locks (Windows)
+_LOCK_SLOTS = 64
+
+
+def lock_file(path: str, blocking: bool = True, shared: bool = False, create: bool = True) -> Optional[int]:
+    """
+    Open a lock file and lock it, exclusively unless shared
+
+    The lock is dropped by the operating system when the process exits, however it exits.
+
+    Args:
+        path: Lock file path
+        blocking: Wait for another process's lock instead of giving up
+        shared: Take a shared lock, held alongside other shared locks but not an exclusive one
+        create: Create the lock file if it does not exist
+
+    Returns:
+        File descriptor holding the lock, or None if another process holds it,
+        or the file does not exist and create is False
+    """
+    while True:
+        try:
+            fd = os.open(path, os.O_RDWR | (os.O_CREAT if create else 0), 0o644)
+        except FileNotFoundError:
+            return None
+        if not _lock_fd(fd, blocking, shared):
+            os.close(fd)
+            return None
+        # Whoever held the lock may have deleted the file meanwhile; only the file at the path counts
+        try:
+            if os.fstat(fd).st_ino == os.stat(path).st_ino:
+                return fd
+        except FileNotFoundError:
+            pass
+        os.close(fd)
+
+
+def unlock_file(fd: int, remove_path: Optional[str] = None):
+    """Release a lock taken with lock_file, deleting the lock file first if a path is given"""
+    removed = remove_path is None
+    if not removed:
+        try:
+            os.unlink(remove_path)
+            removed = True
+        except OSError:
+            pass
+    os.close(fd)
+    if not removed:
+        # Windows refuses to delete open files
+        try:
+            os.unlink(remove_path)
+        except OSError:
+            pass
+
+
+@contextmanager
+def reader_lease(repo_path: str) -> Iterator[bool]:
+    """
+    Shared lease that keeps a cached mirror from being evicted while it is read
+
+    Yields whether a lease is held; repositories without a readers file, such as
+    clones and worktrees, are never evicted and need none.
+    """
+    fd = lock_file(repo_path + READERS_SUFFIX, shared=True, create=False)
+    try:
+        yield fd is not None
+    finally:
+        if fd is not None:
+            unlock_file(fd)
+
+
+def _lock_fd(fd: int, blocking: bool, shared: bool = False) -> bool:
+    if fcntl is not None:
+        try:
+            fcntl.flock(fd, (fcntl.LOCK_SH if shared else fcntl.LOCK_EX) | (0 if blocking else fcntl.LOCK_NB))
+            return True
+        except BlockingIOError:
+            return False
+    # Exclusive holders lock byte 0 and every slot, shared holders a single free slot each
+    ranges = [(slot, 1) for slot in range(1, _LOCK_SLOTS + 1)] if shared else [(0, _LOCK_SLOTS + 1)]
+    while True:
+        for offset, length in ranges:
+            os.lseek(fd, offset, os.SEEK_SET)
+            try:
+                msvcrt.locking(fd, msvcrt.LK_NBLCK, length)
+                return True
+            except OSError:
+                pass
+        if not blocking:
+            return False
+        time.sleep(0.1)
+
+
+def disk_usage(path: str) -> int:
+    """Bytes in the regular files under a directory"""
+    total = 0
+    stack = [path]
+    while stack:
+        try:
+            entries = list(os.scandir(stack.pop()))
+        except OSError:
+            continue
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                stack.append(entry.path)
+            elif entry.is_file(follow_symlinks=False):
+                total += entry.stat(follow_symlinks=False).st_size
+    return total
+
+
+class Workspace:
+    """One directory managed by the WorkspaceManager"""
+
+    def __init__(self, key: str, path: str, remove: Callable[[str], None], reusable: bool, lease_fd: int):
+        self.key = key
+        self.path = path
+        self.remove = remove
+        self.reusable = reusable
+        self.lease_fd = lease_fd
+        self.size = 0
+        self.leases = 0
+        self.last_used = time.monotonic()
+
+
+class WorkspaceManager:
+    """Disk-budgeted pool of clones and worktrees shared between requests"""
+
+    def __init__(self, root_dir: Optional[str] = None, budget_bytes: Optional[int] = None):
+        self.root_dir = root_dir or settings.WORKSPACE_DIR or tempfile.gettempdir()
+        self.budget_bytes = budget_bytes if budget_bytes is not None else settings.WORKSPACE_DISK_BUDGET_MB * 1024 * 1024
+        self._by_key: Dict[str, Workspace] = {}
+        self._by_path: Dict[str, Workspace] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def new_path(self, name: str) -> str:
+        """Fresh directory path for a workspace, recognizable by the orphan sweep"""
+        return os.path.join(self.root_dir, f"{WORKSPACE_PREFIX}{name}_{time.time()}")
+
+    def acquire(
+        self,
+        key: str,
+        create: Callable[[str], None],
+        remove: Optional[Callable[[str], None]] = None,
+        name: str = 'workspace',
+        reusable: bool = True
+    ) -> str:
+        """
+        Lease a workspace, creating it on a miss
+
+        Args:
+            key: Identity of the workspace contents; an idle workspace with the same
+                key is reused, so keys must change whenever contents would
+            create: Populates a new workspace at the given path
+            remove: Deletes a workspace, defaults to removing the directory
+            name: Human-readable part of the directory name
+            reusable: Keep the workspace after its last lease is released
+
+        Returns:
+            Path to the workspace; pass it to release when done
+        """
+        with self._lock:
+            workspace = self._by_key.get(key)
+            if workspace is not None:
+                workspace.leases += 1
+                workspace.last_used = time.monotonic()
+                self.hits += 1
+                return workspace.path
+            self.misses += 1
+
+        path = self.new_path(name)
+        # Locked before the directory exists, so the orphan sweep never sees it unleased
+        os.makedirs(self.root_dir, exist_ok=True)
+        lease_fd = lock_file(path + LEASE_SUFFIX)
+        try:
+            create(path)
+        except Exception:
+            shutil.rmtree(path, ignore_errors=True)
+            unlock_file(lease_fd, path + LEASE_SUFFIX)
+            raise
+
+        workspace = Workspace(key, path, remove or self._remove_dir, reusable, lease_fd)
+        workspace.size = disk_usage(path)
+        workspace.leases = 1
+
+        with self._lock:
+            existing = self._by_key.get(key)
+            if existing is not None:
+                # Another request created the same workspace meanwhile; use theirs
+                existing.leases += 1
+                duplicate, path = workspace, existing.path
+            else:
+                duplicate = None
+                self._by_key[key] = workspace
+                self._by_path[path] = workspace
+            evicted = self._select_evictions()
+
+        if duplicate is not None:
+            evicted.append(duplicate)
+        self._remove_all(evicted)
+        return path
+
+    def release(self, path: str) -> bool:
+        """
+        Release a lease taken with acquire
+
+        Returns:
+            False if the path is not a managed workspace
+        """
+        with self._lock:
+            workspace = self._by_path.get(path)
+            if workspace is None:
+                return False
+            workspace.leases = max(0, workspace.leases - 1)
+            workspace.last_used = time.monotonic()
+            evicted = []
+            if not workspace.leases and not workspace.reusable:
+                self._forget(workspace)
+                evicted.append(workspace)
+            evicted += self._select_evictions()
+
+        self._remove_all(evicted)
+        return True
+
+    @contextmanager
+    def lease(self, key: str, create: Callable[[str], None], **kwargs) -> Iterator[str]:
+        """Context manager around acquire and release"""
+        path = self.acquire(key, create, **kwargs)
+        try:
+            yield path
+        finally:
+            self.release(path)
+
+    def sweep_orphans(self) -> int:
+        """
+        Delete reposcope_* directories left behind by earlier processes
+
+        A workspace is an orphan when no process holds its lease file, however old
+        or recently modified it is; directories without a lease file were never
+        leased and are orphans too.
+
+        Returns:
+            Number of directories removed
+        """
+        with self._lock:
+            known = set(self._by_path)
+
+        removed = 0
+        try:
+            entries = list(os.scandir(self.root_dir))
+        except FileNotFoundError:
+            return 0
+        for entry in entries:
+            if not entry.name.startswith(WORKSPACE_PREFIX):
+                continue
+            path = entry.path[:-len(LEASE_SUFFIX)] if entry.name.endswith(LEASE_SUFFIX) else entry.path
+            if path in known:
+                continue
+            try:
+                if path == entry.path and not entry.is_dir(follow_symlinks=False):
+                    continue
+            except OSError:
+                continue
+            # A lease file whose directory is gone is only cleaned up
+            lease_fd = lock_file(path + LEASE_SUFFIX, blocking=False)
+            if lease_fd is None:
+                continue
+            if os.path.isdir(path):
+                shutil.rmtree(path, ignore_errors=True)
+                removed += 1
+            unlock_file(lease_fd, path + LEASE_SUFFIX)
+
+        if removed:
+            logger.info(f"Removed {removed} orphaned workspaces from {self.root_dir}")
+        return removed
+
+    def metrics(self) -> Dict:
+        """Occupancy and hit-rate metrics"""
+        with self._lock:
+            workspaces = list(self._by_key.values())
+            lookups = self.hits + self.misses
+            bytes_used = sum(w.size for w in workspaces)
+            return {
+                'workspaces': len(workspaces),
+                'in_use': sum(1 for w in workspaces if w.leases),
+                'bytes_used': bytes_used,
+                'budget_bytes': self.budget_bytes,
+                'occupancy': bytes_used / self.budget_bytes if self.budget_bytes else 0.0,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'evictions': self.evictions
+            }
+
+    def _select_evictions(self) -> List[Workspace]:
+        """Pick idle workspaces, least recently used first, until usage fits the budget"""
+        used = sum(w.size for w in self._by_key.values())
+        if used <= self.budget_bytes:
+            return []
+
+        evicted = []
+        idle = sorted((w for w in self._by_key.values() if not w.leases), key=lambda w: w.last_used)
+        for workspace in idle:
+            if used <= self.budget_bytes:
+                break
+            self._forget(workspace)
+            evicted.append(workspace)
+            used -= workspace.size
+            self.evictions += 1
+
+        if used > self.budget_bytes:
+            logger.warning(f"Workspaces in use exceed the disk budget: {used} > {self.budget_bytes} bytes")
+        return evicted
+
+    def _forget(self, workspace: Workspace):
+        self._by_key.pop(workspace.key, None)
+        self._by_path.pop(workspace.path, None)
+
+    @staticmethod
+    def _remove_all(workspaces: List[Workspace]):
+        # Deleting happens outside the lock; it can take a while for large checkouts
+        for workspace in workspaces:
+            try:
+                workspace.remove(workspace.path)
+                logger.info(f"Removed workspace {workspace.path}")
+            except Exception as e:
+                # The lease goes regardless, so the next orphan sweep retries the deletion
+                logger.error(f"Failed to remove workspace {workspace.path}: {str(e)}")
+            unlock_file(workspace.lease_fd, workspace.path + LEASE_SUFFIX)
+
+    @staticmethod
+    def _remove_dir(path: str):
+        shutil.rmtree(path, ignore_errors=True)
+
+
+@lru_cache()
+def get_workspace_manager() -> WorkspaceManager:
+    """Get the process-wide workspace manager"""
+    return WorkspaceManager()
@@ -0,0 +1,6 @@
+"""
+Benchmarks for the git and analysis services
+
+Run from the backend directory, e.g. `python -m benchmarks.repository_stats --help`.
+Each script builds its own synthetic input, so no network or existing clone is needed.
+"""
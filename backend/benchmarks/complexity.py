@@ -0,0 +1,112 @@
+"""
+Complexity counting: the original eight keyword regexes against the one-pass lexer
+
+The original counter ran re.findall(rf'\b{keyword}\b') once per decision keyword
+over the whole file, so it also counted keywords in strings and comments. The
+lexer counts decision tokens in code only, for Python from the syntax tree. Its
+tokens also feed the structure scan and Halstead counts, and the Python tree the
+structure extraction, so for Python only the visitor pass over a parsed tree is
+timed. Generated files know their true decision count, printed as 'expected'.
+
+    python -m benchmarks.complexity --blocks 2000
+"""
+import argparse
+import ast
+import re
+from collections import Counter
+from app.services.git.code_lexer import count_decisions, tokenize
+from app.services.git.code_parser import _PythonStructureVisitor
+from benchmarks.synthetic import table, timed
+
+DECISION_KEYWORDS = ['if', 'elif', 'else', 'for', 'while', 'case', 'catch', 'except']
+
+# Each block holds 4 decision points in code and decision keywords in a comment and a string
+BLOCKS = {
+    'javascript': (
+        "// if the cache is cold, for each entry while loading, catch errors\n"
+        "function handler{i}(items, flag) {{\n"
+        "  const message = \"if this fails, retry for a while\";\n"
+        "  for (const item of items) {{\n"
+        "    if (item.ready && flag) {{ continue; }}\n"
+        "  }}\n"
+        "  try {{ load(items); }} catch (error) {{ log(message, error); }}\n"
+        "  return items.length;\n"
+        "}}\n"
+    ),
+    'java': (
+        "  /* if the cache is cold, for each entry while loading, catch errors */\n"
+        "  int handler{i}(List<Item> items, boolean flag) {{\n"
+        "    String message = \"if this fails, retry for a while\";\n"
+        "    for (Item item : items) {{\n"
+        "      if (item.ready() && flag) {{ continue; }}\n"
+        "    }}\n"
+        "    try {{ load(items); }} catch (Exception error) {{ log(message, error); }}\n"
+        "    return items.size();\n"
+        "  }}\n"
+    ),
+    'c': (
+        "/* if the cache is cold, for each entry while loading, catch errors */\n"
+        "int handler{i}(struct item *items, int count, int flag) {{\n"
+        "  const char *message = \"if this fails, retry for a while\";\n"
+        "  for (int i = 0; i < count; i++) {{\n"
+        "    if (items[i].ready && flag) {{ continue; }}\n"
+        "  }}\n"
+        "  while (count-- > 0) {{ log(message); }}\n"
+        "  return count;\n"
+        "}}\n"
+    ),
+    'python': (
+        "# if the cache is cold, for each entry while loading, except errors\n"
+        "def handler{i}(items, flag):\n"
+        "    message = \"if this fails, retry for a while\"\n"
+        "    for item in items:\n"
+        "        if item.ready and flag:\n"
+        "            continue\n"
+        "    try:\n"
+        "        load(items)\n"
+        "    except ValueError:\n"
+        "        log(message)\n"
+        "    return len(items)\n"
+    ),
+}
+EXPECTED_PER_BLOCK = 4
+
+
+def original_complexity(content: str) -> int:
+    complexity = 1
+    for keyword in DECISION_KEYWORDS:
+        complexity += len(re.findall(rf'\b{keyword}\b', content))
+    return complexity
+
+
+def lexer_complexity(content, language: str) -> int:
+    if language == 'python':
+        visitor = _PythonStructureVisitor()
+        visitor.visit(content)
+        return visitor.complexity
+    return count_decisions(Counter(tokenize(content, language)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--blocks', type=int, default=2000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    rows = []
+    for language, block in BLOCKS.items():
+        body = ''.join(block.format(i=index) for index in range(args.blocks))
+        content = f"class Handlers {{\n{body}}}\n" if language == 'java' else body
+        before, old_count = timed(lambda: original_complexity(content), args.repeat)
+        parsed = ast.parse(content) if language == 'python' else content
+        after, new_count = timed(lambda: lexer_complexity(parsed, language), args.repeat)
+        rows.append((
+            language, len(content) // 1024, before, after, f"{before / after:.1f}x",
+            old_count, new_count, 1 + EXPECTED_PER_BLOCK * args.blocks
+        ))
+
+    print(table(('language', 'KiB', 'regexes s', 'lexer s', 'speedup', 'regexes', 'lexer', 'expected'), rows))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+r"""
+Pathological and random inputs for the brace-language parsers
+
+Two parts:
+
+- scaling: each pathological input at size n, 2n and 4n, parsed by the lexer-based
+  parsers and matched by the original C/C++ function regex
+  `(?:\w+\s+)*(\w+)\s*\([^)]*\)\s*{`. Linear work doubles per step; the regex's
+  backtracking grows about 4x per step on the inputs built against it.
+- fuzz: random soups of comment, string, template and bracket fragments for every
+  language, checking that parsing never raises and recording the worst time per KiB.
+
+    python -m benchmarks.lexer_fuzz --size 2000 --cases 300
+"""
+import argparse
+import random
+import re
+import time
+from app.services.git.code_parser import CodeParser
+from benchmarks.synthetic import table, timed
+
+ORIGINAL_FUNCTION = re.compile(r'(?:\w+\s+)*(\w+)\s*\([^)]*\)\s*{')
+
+PATHOLOGICAL = {
+    # Words never followed by '(': the regex retries every split of the run
+    'words without a call': lambda n: 'word ' * n,
+    # Calls never closed: '[^)]*' scans to the end from every '('
+    'unclosed calls': lambda n: 'f(' * n,
+    # Minified code: one long line of calls and blocks
+    'minified line': lambda n: ''.join(f'a{i}(b,c){{d{i}=e?f:g;}}' for i in range(n)),
+    'deep nesting': lambda n: '{(' * n + ')}' * n,
+    'unterminated comment': lambda n: '/*' + ' if (x) { y(); }' * n,
+    'unterminated string': lambda n: '"' + '\\" if (x) {' * n,
+    'many templates': lambda n: '`${`${a}`}` + ' * n,
+}
+
+FRAGMENTS = [
+    '/*', '*/', '//', '\n', '"', "'", '`', '${', '}', '{', '(', ')', '[', ']', '\\', '\\"', 'R"(', ')"',
+    '#include <a.h>', '#define X(a) (a)', 'if', 'for', 'while', 'case', 'catch', 'class', 'function',
+    'import', 'export', 'from', 'const', '=>', '&&', '||', '?', ':', ';', ',', '.', 'x', 'value', '42',
+    '0x1F', '1e9', ' ', '\t', '<T>', 'é', ' ', '@Override', '/regex/g', '::',
+]
+EXTENSIONS = {'javascript': 'js', 'typescript': 'ts', 'java': 'java', 'c': 'c', 'cpp': 'cpp'}
+
+
+def scaling(size: int, repeat: int, regex_limit: int):
+    parser = CodeParser()
+    rows = []
+    for name, make in PATHOLOGICAL.items():
+        for language, extension in EXTENSIONS.items():
+            times = []
+            for factor in (1, 2, 4):
+                content = make(size * factor)
+                seconds, result = timed(lambda: parser.parse_source(f'input.{extension}', content), repeat)
+                if 'error' in result:
+                    raise AssertionError(f"{name} ({language}) raised: {result['error']}")
+                times.append(seconds)
+            rows.append((name, language, len(make(size)) // 1024, *times, f"{times[2] / times[0]:.1f}x"))
+        if size <= regex_limit:
+            times = [timed(lambda: ORIGINAL_FUNCTION.findall(make(size * factor)), 1)[0] for factor in (1, 2, 4)]
+            rows.append((name, 'original regex', len(make(size)) // 1024, *times, f"{times[2] / times[0]:.1f}x"))
+    print(table(('input', 'parser', 'KiB at n', 'n s', '2n s', '4n s', 'growth 4n/n'), rows))
+
+
+def fuzz(cases: int, seed: int):
+    parser = CodeParser()
+    rng = random.Random(seed)
+    worst = {language: (0.0, None) for language in EXTENSIONS}
+    for case in range(cases):
+        content = ''.join(rng.choice(FRAGMENTS) for _ in range(rng.randrange(1, 4000)))
+        for language, extension in EXTENSIONS.items():
+            started = time.perf_counter()
+            result = parser.parse_source(f'fuzz.{extension}', content)
+            per_kib = (time.perf_counter() - started) / max(len(content) / 1024, 1)
+            if 'error' in result:
+                raise AssertionError(f"case {case} ({language}) raised: {result['error']}")
+            if per_kib > worst[language][0]:
+                worst[language] = (per_kib, case)
+    print(table(
+        ('language', 'cases', 'worst ms per KiB', 'worst case'),
+        [(language, cases, per_kib * 1000, case) for language, (per_kib, case) in worst.items()]
+    ))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--size', type=int, default=2000, help='Repetitions of each pathological unit at n')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--regex-limit', type=int, default=4000, help='Largest n the original regex is run at')
+    parser.add_argument('--cases', type=int, default=300)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    scaling(args.size, args.repeat, args.regex_limit)
+    print()
+    fuzz(args.cases, args.seed)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+"""
+Python structure extraction: the original nested ast.walk against the scope-tracking visitor
+
+The original parser decided whether a function was top-level by walking the whole
+tree again for every function, so a module of n functions cost O(n^2). Modules are
+generated with n top-level functions (each with a nested and an async helper) and
+a class at the end, where the nested walk finds it last.
+
+    python -m benchmarks.python_parser --sizes 250 500 1000 2000
+"""
+import argparse
+import ast
+from app.services.git.code_parser import CodeParser, _PythonStructureVisitor
+from benchmarks.synthetic import table, timed
+
+
+def make_module(functions: int) -> str:
+    parts = ['import os\nfrom typing import List\n']
+    for index in range(functions):
+        parts.append(
+            f"def function_{index}(a, b=1):\n"
+            f"    '''Function {index}'''\n"
+            f"    def helper_{index}(x):\n"
+            f"        return x + {index} if x else -x\n"
+            f"    async def fetch_{index}():\n"
+            f"        return [y for y in range(a) if y % 2]\n"
+            f"    if a and b:\n"
+            f"        return helper_{index}(a)\n"
+            f"    return b\n\n"
+        )
+    parts.append('class Last:\n    def method(self):\n        return 1\n')
+    return ''.join(parts)
+
+
+def original_structure(tree: ast.AST) -> dict:
+    """The original extraction loop; async functions were ignored"""
+    classes, functions = [], []
+    for node in ast.walk(tree):
+        if isinstance(node, ast.ClassDef):
+            classes.append({'name': node.name, 'methods': [n.name for n in node.body if isinstance(n, ast.FunctionDef)]})
+        elif isinstance(node, ast.FunctionDef):
+            if not any(isinstance(parent, ast.ClassDef) for parent in ast.walk(tree)):
+                functions.append({'name': node.name})
+    return {'classes': classes, 'functions': functions}
+
+
+def visitor_structure(tree: ast.AST) -> dict:
+    visitor = _PythonStructureVisitor()
+    visitor.visit(tree)
+    return {'classes': visitor.classes, 'functions': visitor.functions, 'nested': visitor.nested_functions}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[250, 500, 1000])
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    code_parser = CodeParser()
+    rows = []
+    for size in args.sizes:
+        source = make_module(size)
+        tree = ast.parse(source)
+        before, _ = timed(lambda: original_structure(tree), args.repeat)
+        after, found = timed(lambda: visitor_structure(tree), args.repeat)
+        full, _ = timed(lambda: code_parser.parse_source('module.py', source), args.repeat)
+        rows.append((
+            size, len(source.splitlines()), before, after, full,
+            len(found['functions']), len(found['nested']), sum(len(c['methods']) for c in found['classes'])
+        ))
+
+    print(table(
+        ('functions', 'lines', 'nested walk s', 'visitor s', 'full parse s', 'top-level', 'nested', 'methods'),
+        rows
+    ))
+    if len(rows) > 1:
+        growth = rows[-1][0] / rows[0][0]
+        print(f"{growth:.0f}x the functions: nested walk {rows[-1][2] / rows[0][2]:.0f}x slower, "
+              f"visitor {rows[-1][3] / rows[0][3]:.0f}x slower")
+
+
+if __name__ == '__main__':
+    main()
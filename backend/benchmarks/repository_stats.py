@@ -0,0 +1,101 @@
+"""
+Repository stats: the original GitPython walks against the single-pass collector
+
+The original implementation walked the history twice (contributors, then a commit
+count) and the HEAD tree twice (file types and lines, then size), computing
+commit.stats with one `git diff` per commit. The collector does one `git log`
+history walk and one tree walk.
+
+    python -m benchmarks.repository_stats --commits 2000 --files 400
+"""
+import argparse
+import os
+import tempfile
+from git import Repo
+from app.services.git.git_service import GitService
+from app.services.git.stats_collector import TEXT_EXTENSIONS
+from benchmarks.synthetic import counting_processes, make_history, table, timed
+
+
+def original_stats(repo_path: str) -> dict:
+    """The walks of the original get_repository_stats, without the avatar lookups"""
+    repo = Repo(repo_path)
+    passes = {'history': 0, 'tree': 0}
+
+    contributors = {}
+    passes['history'] += 1
+    for commit in repo.iter_commits():
+        entry = contributors.setdefault(commit.author.name, {'commits': 0, 'additions': 0, 'deletions': 0})
+        entry['commits'] += 1
+        entry['additions'] += commit.stats.total['insertions']
+        entry['deletions'] += commit.stats.total['deletions']
+
+    file_types = {}
+    total_lines = total_files = 0
+    passes['tree'] += 1
+    for item in repo.tree().traverse():
+        if item.type == 'blob':
+            ext = os.path.splitext(item.path)[1]
+            if ext:
+                file_types[ext] = file_types.get(ext, 0) + 1
+            if ext in TEXT_EXTENSIONS:
+                total_lines += item.data_stream.read().decode('utf-8', errors='ignore').count('\n')
+            total_files += 1
+
+    passes['tree'] += 1
+    repository_size = sum(item.size for item in repo.tree().traverse() if item.type == 'blob')
+    passes['history'] += 1
+    total_commits = len(list(repo.iter_commits()))
+    return {
+        'total_commits': total_commits,
+        'total_lines': total_lines,
+        'total_files': total_files,
+        'repository_size': repository_size,
+        'contributors': len(contributors),
+        'passes': passes
+    }
+
+
+def collector_stats(repo_path: str) -> dict:
+    stats = GitService().get_repository_stats(repo_path)
+    return {
+        'total_commits': stats['total_commits'],
+        'total_lines': stats['total_lines'],
+        'total_files': stats['total_files'],
+        'repository_size': stats['repository_size'],
+        'contributors': len(stats['contributors'])
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--commits', type=int, default=2000)
+    parser.add_argument('--files', type=int, default=400)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as root:
+        repo_path = os.path.join(root, 'repo')
+        make_history(repo_path, commits=args.commits, files=args.files)
+
+        rows = []
+        results = {}
+        for name, function in (('original', original_stats), ('single pass', collector_stats)):
+            with counting_processes() as processes:
+                seconds, result = timed(lambda: function(repo_path), args.repeat)
+            passes = result.pop('passes', None)
+            results[name] = result
+            if passes is None:
+                # One `git log` for the history; the tree is walked by one ls-tree and read by cat-file
+                passes = {'history': processes['log'] // args.repeat, 'tree': processes['ls-tree'] // args.repeat}
+            rows.append((name, seconds, passes['history'], passes['tree'], sum(processes.values()) // args.repeat))
+
+        print(f"{args.commits} commits, {args.files} files")
+        print(table(('implementation', 'seconds', 'history walks', 'tree walks', 'processes'), rows))
+        print(f"speedup: {rows[0][1] / rows[1][1]:.1f}x")
+        if results['original'] != results['single pass']:
+            print(f"results differ: {results}")
+
+
+if __name__ == '__main__':
+    main()
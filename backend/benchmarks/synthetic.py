@@ -0,0 +1,138 @@
+"""
+Synthetic inputs shared by the benchmarks: histories written with `git fast-import`
+"""
+import random
+import subprocess
+import time
+from collections import Counter
+from contextlib import contextmanager
+from typing import Callable, Iterator, Tuple, TypeVar
+
+T = TypeVar('T')
+
+EXTENSIONS = ('.py', '.js', '.ts', '.java', '.c', '.md', '.txt', '.json')
+START_TIME = 1_600_000_000
+
+
+def make_history(
+    path: str,
+    commits: int = 1000,
+    files: int = 200,
+    authors: int = 20,
+    lines: int = 40,
+    files_per_commit: int = 3,
+    merge_every: int = 0,
+    seed: int = 0
+) -> str:
+    """
+    Create a repository with a synthetic history on main
+
+    Args:
+        path: Directory to create the repository in
+        commits: Commits on the first-parent chain
+        files: Distinct files, spread over a few directories and EXTENSIONS
+        authors: Distinct authors, assigned round robin
+        lines: Lines per file version
+        files_per_commit: Files rewritten by each commit
+        merge_every: Add a side-branch commit merged in every this many commits, 0 for none
+        seed: Seed for the file contents
+
+    Returns:
+        SHA of the final commit
+    """
+    subprocess.run(['git', 'init', '-q', '-b', 'main', path], check=True)
+    rng = random.Random(seed)
+    paths = [f"dir{index % 16}/file{index}{EXTENSIONS[index % len(EXTENSIONS)]}" for index in range(files)]
+    process = subprocess.Popen(['git', 'fast-import', '--quiet'], cwd=path, stdin=subprocess.PIPE)
+    out = process.stdin
+
+    def data(payload: bytes):
+        out.write(b'data %d\n' % len(payload))
+        out.write(payload)
+        out.write(b'\n')
+
+    def commit(mark: int, number: int, parents: Tuple[int, ...], ref: str, changed):
+        author = number % authors
+        when = START_TIME + number * 600
+        out.write(f"commit {ref}\nmark :{mark}\n".encode())
+        identity = f"Author {author} <author{author}@example.com> {when} +0000\n"
+        out.write(f"author {identity}committer {identity}".encode())
+        data(f"Change {number}".encode())
+        if parents:
+            out.write(f"from :{parents[0]}\n".encode())
+        for parent in parents[1:]:
+            out.write(f"merge :{parent}\n".encode())
+        for file_path in changed:
+            body = ''.join(f"line {rng.randrange(1000)} of {file_path}\n" for _ in range(lines))
+            out.write(f"M 100644 inline {file_path}\n".encode())
+            data(body.encode())
+
+    mark = 0
+    head = None
+    for number in range(commits):
+        parents: Tuple[int, ...] = (head,) if head else ()
+        if merge_every and head and number % merge_every == 0:
+            mark += 1
+            commit(mark, number, (head,), 'refs/heads/side', rng.sample(paths, 1))
+            parents = (head, mark)
+        mark += 1
+        # The first commit adds every file, so later ones always modify
+        changed = paths if head is None else rng.sample(paths, min(files_per_commit, files))
+        commit(mark, number, parents, 'refs/heads/main', changed)
+        head = mark
+    out.close()
+    if process.wait() != 0:
+        raise RuntimeError("git fast-import failed")
+    subprocess.run(['git', 'branch', '-q', '-D', 'side'], cwd=path, capture_output=True)
+    return subprocess.run(
+        ['git', 'rev-parse', 'main'], cwd=path, check=True, capture_output=True, text=True
+    ).stdout.strip()
+
+
+def timed(function: Callable[[], T], repeat: int = 3) -> Tuple[float, T]:
+    """Best wall time of several runs, and the last result"""
+    best = float('inf')
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = function()
+        best = min(best, time.perf_counter() - started)
+    return best, result
+
+
+@contextmanager
+def counting_processes() -> Iterator[Counter]:
+    """Count the subprocesses started inside the block, by git subcommand"""
+    counts: Counter = Counter()
+    original = subprocess.Popen.__init__
+
+    def init(self, args, *rest, **kwargs):
+        if isinstance(args, (list, tuple)):
+            words = [str(word) for word in args]
+            # Skip git's own options such as -c name=value
+            rest_words = [word for index, word in enumerate(words[1:], 1)
+                          if not word.startswith('-') and words[index - 1] != '-c']
+            counts[rest_words[0] if rest_words else words[0]] += 1
+        else:
+            counts[str(args)] += 1
+        original(self, args, *rest, **kwargs)
+
+    subprocess.Popen.__init__ = init
+    try:
+        yield counts
+    finally:
+        subprocess.Popen.__init__ = original
+
+
+def table(headers, rows) -> str:
+    """Plain-text table with right-aligned numeric columns"""
+    cells = [[str(cell) for cell in headers]] + [[
+        f"{cell:.3f}" if isinstance(cell, float) else str(cell) for cell in row
+    ] for row in rows]
+    widths = [max(len(row[column]) for row in cells) for column in range(len(headers))]
+    lines = ['  '.join(
+        cell.ljust(width) if column == 0 else cell.rjust(width)
+        for column, (cell, width) in enumerate(zip(row, widths))
+    ) for row in cells]
+    lines.insert(1, '  '.join('-' * width for width in widths))
+    return '\n'.join(lines)
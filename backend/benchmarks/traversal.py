@@ -0,0 +1,83 @@
+"""
+History traversal with and without the commit-graph and reachability bitmaps
+
+Times the traversals GitService runs on cached mirrors, first on a freshly
+imported history, then after MirrorCache.write_traversal_indexes has written
+the commit-graph, multi-pack index and bitmaps:
+
+- counting every commit (count_commits)
+- an ancestry check between the oldest and newest commit (is_ancestor)
+- counting and walking a range A..B (count_commits, CommitLogReader)
+- a path-limited log, which the changed-path Bloom filters prune
+
+    python -m benchmarks.traversal --commits 100000
+"""
+import argparse
+import os
+import subprocess
+import tempfile
+import time
+from app.services.git.git_service import GitService
+from app.services.git.log_reader import CommitLogReader
+from app.services.git.mirror_cache import MirrorCache
+from benchmarks.synthetic import make_history, table, timed
+
+
+def traversals(repo_path: str, oldest: str, middle: str, newest: str):
+    service = GitService
+    return [
+        ('count all commits', lambda: service.count_commits(repo_path, newest)),
+        ('is_ancestor(oldest, newest)', lambda: service.is_ancestor(repo_path, oldest, newest)),
+        ('count middle..newest', lambda: service.count_commits(repo_path, f'{middle}..{newest}')),
+        ('walk middle..newest', lambda: sum(1 for _ in CommitLogReader(repo_path).iter_commits(
+            f'{middle}..{newest}', numstat=False
+        ))),
+        ('log -- dir3/file3.java', lambda: len(subprocess.run(
+            ['git', 'log', '--format=%H', newest, '--', 'dir3/file3.java'],
+            cwd=repo_path, capture_output=True, check=True
+        ).stdout.split())),
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--commits', type=int, default=100_000)
+    parser.add_argument('--files', type=int, default=2000)
+    parser.add_argument('--merge-every', type=int, default=20)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as root:
+        repo_path = os.path.join(root, 'repo')
+        started = time.perf_counter()
+        newest = make_history(
+            repo_path, commits=args.commits, files=args.files, lines=3,
+            files_per_commit=1, merge_every=args.merge_every
+        )
+        print(f"built {args.commits} commits in {time.perf_counter() - started:.1f}s")
+
+        def rev(expression: str) -> str:
+            return subprocess.run(
+                ['git', 'rev-parse', expression], cwd=repo_path, capture_output=True, text=True, check=True
+            ).stdout.strip()
+
+        # Side-branch commits are second parents, so the first-parent chain is exactly --commits long
+        oldest = rev(f'{newest}~{args.commits - 1}')
+        middle = rev(f'{newest}~{args.commits // 2}')
+
+        plain = [(name, timed(function, args.repeat)) for name, function in traversals(repo_path, oldest, middle, newest)]
+        started = time.perf_counter()
+        MirrorCache(cache_dir=root).write_traversal_indexes(repo_path)
+        print(f"wrote the commit-graph and bitmaps in {time.perf_counter() - started:.1f}s")
+        indexed = [(name, timed(function, args.repeat)) for name, function in traversals(repo_path, oldest, middle, newest)]
+
+        rows = []
+        for (name, (before, result)), (_, (after, indexed_result)) in zip(plain, indexed):
+            if result != indexed_result:
+                print(f"{name}: results differ, {result} != {indexed_result}")
+            rows.append((name, before, after, f"{before / after:.1f}x" if after else '-', result))
+        print(table(('traversal', 'plain s', 'indexed s', 'speedup', 'result'), rows))
+
+
+if __name__ == '__main__':
+    main()
@@ -5,8 +5,8 @@ import httpx
 import os
 from dotenv import load_dotenv
 
-# Import the security router
-from app.api import security
+# Import the analytics and security routers
+from app.api import analytics, security
 
 # Load environment variables
 load_dotenv()
@@ -30,7 +30,8 @@ GITHUB_CLIENT_ID = os.getenv("GITHUB_CLIENT_ID")
 GITHUB_CLIENT_SECRET = os.getenv("GITHUB_CLIENT_SECRET")
 GITHUB_REDIRECT_URI = os.getenv("GITHUB_REDIRECT_URI", "http://localhost:3000/auth/callback")
 
-# Include the security router
+# Include the analytics and security routers
+app.include_router(analytics.router, prefix="/api/analytics", tags=["Analytics"])
 app.include_router(security.router, prefix="/api/security", tags=["Security"])
 
 @app.get("/")
@@ -181,19 +182,6 @@ async def list_repositories(authorization: str = Header(None)):
             "total": len(repositories)
         }
 
-@app.get("/api/analytics/dashboard/{repo_id}")
-async def get_dashboard_metrics(repo_id: str):
-    """Get dashboard metrics for a repository"""
-    return {
-        "repository_id": repo_id,
-        "metrics": {
-            "commits": {"total": 0, "last_30_days": 0},
-            "contributors": {"total": 0, "active": 0},
-            "code_health": {"score": 0.0},
-            "activity": {"last_commit": None}
-        }
-    }
-
 @app.post("/api/repositories/{repo_owner}/{repo_name}/analyze")
 async def analyze_repository(
     repo_owner: str,
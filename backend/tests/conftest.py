@@ -0,0 +1,53 @@
+"""
+Shared fixtures: throwaway git repositories built commit by commit
+"""
+import os
+import subprocess
+from pathlib import Path
+from typing import Dict, Optional
+import pytest
+
+
+class GitRepo:
+    """A scratch repository with helpers to write files and commit them"""
+
+    def __init__(self, path: Path):
+        self.path = path
+        path.mkdir(parents=True)
+        self.clock = 1_700_000_000
+        self.git('init', '-q', '-b', 'main')
+
+    def git(self, *args: str, env: Optional[Dict[str, str]] = None) -> str:
+        return subprocess.run(
+            ['git', '-c', 'user.name=Test', '-c', 'user.email=test@example.com', *args],
+            cwd=self.path, check=True, capture_output=True, text=True, env=env
+        ).stdout
+
+    def write(self, path: str, content) -> None:
+        target = self.path / path
+        target.parent.mkdir(parents=True, exist_ok=True)
+        if isinstance(content, bytes):
+            target.write_bytes(content)
+        else:
+            # newline='' keeps the line endings a test spells out
+            with open(target, 'w', newline='') as handle:
+                handle.write(content)
+
+    def remove(self, path: str) -> None:
+        self.git('rm', '-q', path)
+
+    def commit(self, message: str = 'change', files: Optional[Dict[str, str]] = None, seconds: int = 3600) -> str:
+        """Write files, stage everything and commit one `seconds` after the previous commit"""
+        for path, content in (files or {}).items():
+            self.write(path, content)
+        self.git('add', '-A')
+        self.clock += seconds
+        date = f'@{self.clock} +0000'
+        env = dict(os.environ, GIT_AUTHOR_DATE=date, GIT_COMMITTER_DATE=date)
+        self.git('commit', '-q', '--allow-empty', '-m', message, env=env)
+        return self.git('rev-parse', 'HEAD').strip()
+
+
+@pytest.fixture
+def repo(tmp_path) -> GitRepo:
+    return GitRepo(tmp_path / 'repo')
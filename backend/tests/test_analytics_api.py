@@ -0,0 +1,79 @@
+"""
+Analytics endpoints served against a local repository
+"""
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from app.api import analytics
+from app.services.git import code_parser
+from app.services.git.git_service import GitService
+from app.services.git.parse_cache import ParseCache
+
+
+@pytest.fixture
+def client(repo, tmp_path, monkeypatch):
+    cache = ParseCache(path=str(tmp_path / 'parse-cache.sqlite3'))
+    monkeypatch.setattr(code_parser, 'get_parse_cache', lambda: cache)
+
+    async def clone_or_update_repo(self, repo_name, access_token=None, strategy=None):
+        return str(repo.path)
+
+    monkeypatch.setattr(GitService, 'clone_or_update_repo', clone_or_update_repo)
+    # Mounted as in app.main and server.py
+    app = FastAPI()
+    app.include_router(analytics.router, prefix="/api/analytics")
+    return TestClient(app)
+
+
+def test_dashboard_reports_code_health(repo, client):
+    repo.commit('add', {'a.py': 'def f(x):\n    if x:\n        return 1\n    return 0\n'})
+    response = client.get('/api/analytics/dashboard/owner/name')
+    assert response.status_code == 200
+    health = response.json()['metrics']['code_health']
+    assert health['score'] > 0 and health['code_complexity'] == 2
+
+
+def test_dashboard_rejects_bare_repository_names(client):
+    assert client.get('/api/analytics/dashboard/name').status_code == 400
+
+
+def test_trends_bucket_the_whole_history(repo, client):
+    repo.commit('add', {'a.py': 'x = 1\n', 'b.md': 'text\n'})
+    repo.commit('edit', {'a.py': 'x = 2\ny = 3\n'}, seconds=86400 * 40)
+    response = client.get('/api/analytics/trends/owner/name', params={'period': 'all', 'top': 1})
+    assert response.status_code == 200
+    trends = response.json()['trends']
+    assert sum(point['count'] for point in trends['commits']) == 2
+    assert sum(point['additions'] for point in trends['file_changes']) == 4
+    assert [top['path'] for top in trends['top_files']] == ['a.py']
+    assert {language['extension'] for language in trends['languages']} == {'py', 'md'}
+
+
+def test_trends_reject_unknown_periods(client):
+    assert client.get('/api/analytics/trends/owner/name', params={'period': '2w'}).status_code == 422
+
+
+def test_quality_trends_measure_each_sampled_commit(repo, client):
+    commits = [
+        repo.commit('add', {'a.py': 'x = 1\n'}),
+        repo.commit('branch', {'a.py': 'def f(x):\n    if x:\n        return 1\n    return 0\n'}),
+        repo.commit('more', {'b.py': 'def g(y):\n    return y\n'}),
+    ]
+    response = client.get(
+        '/api/analytics/quality-trends/owner/name', params={'sample': 'commits', 'every': 1}
+    )
+    assert response.status_code == 200
+    body = response.json()
+    assert [point['commit'] for point in body['points']] == commits
+    assert [point['files'] for point in body['points']] == [1, 1, 2]
+    assert body['points'][1]['average_complexity'] == 2
+    debt = body['technical_debt']
+    assert debt['repository_id'] == 'owner/name' and len(debt['debt_trend_graph']) == 3
+
+
+def test_quality_trends_of_untagged_repos_and_unknown_samples(client):
+    response = client.get('/api/analytics/quality-trends/owner/name', params={'sample': 'tags'})
+    assert response.status_code == 200 and response.json()['points'] == []
+    assert client.get(
+        '/api/analytics/quality-trends/owner/name', params={'sample': 'weekly'}
+    ).status_code == 422
@@ -0,0 +1,19 @@
+"""
+GitHub tokens passed to the API as is or base64-encoded
+"""
+import base64
+import pytest
+from app.api.repositories import decode_token
+
+
+@pytest.mark.parametrize('token, expected', [
+    (base64.b64encode(b'gho_abc').decode(), 'gho_abc'),
+    (base64.b64encode(b'ghp_abc').decode(), 'ghp_abc'),
+    ('ghp_plain', 'ghp_plain'),
+    (base64.b64encode(b'not a token').decode(), base64.b64encode(b'not a token').decode()),
+    ('%%%', '%%%'),
+    (None, None),
+    ('', ''),
+])
+def test_decode_token(token, expected):
+    assert decode_token(token) == expected
@@ -0,0 +1,89 @@
+"""
+Blob reader process pool and the parse skips it feeds
+"""
+import os
+import shutil
+import pytest
+from app.core.config import settings
+from app.services.git.blob_reader import BlobReader
+from app.services.git.code_parser import _parse_chunk
+from tests.conftest import GitRepo
+
+
+@pytest.fixture(autouse=True)
+def fresh_pool():
+    BlobReader.close_all()
+    yield
+    BlobReader.close_all()
+
+
+def make_repo(tmp_path_factory, name):
+    repo = GitRepo(tmp_path_factory.mktemp(name) / 'repo')
+    repo.commit('add', {'a.py': 'x = 1\n'})
+    return repo
+
+
+def live_processes(reader):
+    return [process for process in list(reader._idle.queue) if process.alive()]
+
+
+def test_least_recently_used_reader_is_closed(tmp_path_factory, monkeypatch):
+    monkeypatch.setattr(settings, 'BLOB_READER_REPOS', 2)
+    repos = [make_repo(tmp_path_factory, f'r{index}') for index in range(3)]
+    readers = []
+    for repo in repos[:2]:
+        reader = BlobReader.for_repo(str(repo.path))
+        assert reader.read_blob('HEAD:a.py') == b'x = 1\n'
+        readers.append(reader)
+    BlobReader.for_repo(str(repos[0].path))  # Now the most recent
+    idle = readers[1]._idle.queue[0]
+
+    BlobReader.for_repo(str(repos[2].path))
+    assert list(BlobReader._readers) == [str(repos[0].path), str(repos[2].path)]
+    assert not idle.alive()
+    assert live_processes(readers[0])
+
+
+def test_idle_readers_are_closed(tmp_path_factory):
+    repo = make_repo(tmp_path_factory, 'idle')
+    reader = BlobReader.for_repo(str(repo.path))
+    reader.read_blob('HEAD:a.py')
+    process = reader._idle.queue[0]
+
+    assert BlobReader.close_idle(idle_seconds=60) == 0
+    assert BlobReader.close_idle(idle_seconds=0) == 1
+    assert not process.alive()
+    assert not BlobReader._readers
+
+
+def test_processes_in_use_stop_when_released_after_close(tmp_path_factory):
+    repo = make_repo(tmp_path_factory, 'busy')
+    reader = BlobReader.for_repo(str(repo.path))
+    blobs = reader.read_blobs(['HEAD:a.py', 'HEAD:a.py'])
+    next(blobs)
+    reader.close()
+    assert next(blobs)[1] == b'x = 1\n'
+    blobs.close()
+    assert not live_processes(reader) and reader._created == 0
+
+
+def test_missing_blobs_are_not_reported_as_too_large(tmp_path_factory):
+    repo = make_repo(tmp_path_factory, 'missing')
+    repo.commit('grow', {'b.py': 'y = 2\n' * 100})
+    sha = repo.git('rev-parse', 'HEAD:b.py').strip()
+    results = _parse_chunk([('b.py', sha), ('c.py', 'f' * 40)], str(repo.path), 5.0, 10)
+    assert [result['skipped'] for result in results] == ['too_large', 'missing']
+
+
+def test_processes_started_before_a_reclone_are_replaced(tmp_path_factory):
+    repo = make_repo(tmp_path_factory, 'reclone')
+    reader = BlobReader.for_repo(str(repo.path))
+    assert reader.read_blob('HEAD:a.py') == b'x = 1\n'
+    [stale] = live_processes(reader)
+
+    # Evicted and cloned again at the same path: a new directory the old processes cannot see
+    os.rename(str(repo.path), str(repo.path) + '.old')
+    shutil.copytree(str(repo.path) + '.old', str(repo.path))
+    shutil.rmtree(str(repo.path) + '.old')
+    assert reader.read_blob('HEAD:a.py') == b'x = 1\n'
+    assert live_processes(reader) != [stale] and not stale.alive()
@@ -0,0 +1,58 @@
+"""
+Churn matrix built from the commit log
+"""
+import pytest
+from app.services.git.churn_matrix import DAY, MAX_BUCKETS, ChurnMatrix
+from app.services.git.log_reader import CommitLogReader
+
+
+def test_matrix_agrees_with_the_commit_log(repo):
+    repo.commit('one', {'a.py': 'one\n', 'b.py': 'x\n'}, seconds=DAY)
+    repo.commit('two', {'a.py': 'one\ntwo\n'}, seconds=DAY)
+    repo.commit('three', {'b.py': 'y\nz\n'}, seconds=3 * DAY)
+
+    matrix = ChurnMatrix.from_repository(str(repo.path), bucket_seconds=2 * DAY)
+    commits = list(CommitLogReader(str(repo.path)).iter_commits())
+
+    assert int(matrix.additions.sum()) == sum(commit['additions'] for commit in commits)
+    assert int(matrix.deletions.sum()) == sum(commit['deletions'] for commit in commits)
+    assert matrix.commits.tolist() == [2, 0, 1]
+    assert matrix.authors.tolist() == [1, 0, 1]
+    top = matrix.top_files(1)
+    assert top[0]['path'] == 'b.py' and top[0]['churn'] == 4
+
+
+def test_matrix_window_covers_since_until(repo):
+    repo.commit('old', {'a.py': 'one\n'}, seconds=DAY)
+    since = repo.clock + 1
+    repo.commit('new', {'a.py': 'two\n'}, seconds=DAY)
+
+    matrix = ChurnMatrix.from_repository(str(repo.path), bucket_seconds=DAY, since=since, until=since + DAY)
+
+    assert matrix.bucket_starts.tolist() == [since]
+    assert matrix.commits.tolist() == [1]
+    assert (int(matrix.additions.sum()), int(matrix.deletions.sum())) == (1, 1)
+
+
+def test_rolling_rejects_empty_windows(repo):
+    repo.commit('one', {'a.py': 'one\n'}, seconds=DAY)
+    repo.commit('two', {'a.py': 'one\ntwo\n'}, seconds=DAY)
+    matrix = ChurnMatrix.from_repository(str(repo.path), bucket_seconds=DAY)
+    assert matrix.rolling(1).tolist() == matrix.churn.tolist()
+    assert matrix.rolling(5)[:, -1].tolist() == matrix.churn.sum(axis=1).tolist()
+    for window in (0, -1):
+        with pytest.raises(ValueError):
+            matrix.rolling(window)
+
+
+def test_bucket_count_is_capped(repo):
+    # A commit dated decades before the rest stretches the span
+    repo.clock = 0
+    repo.commit('bogus date', {'a.py': 'one\n'})
+    repo.clock = 1_700_000_000
+    repo.commit('recent', {'a.py': 'one\ntwo\n'})
+
+    matrix = ChurnMatrix.from_repository(str(repo.path), bucket_seconds=DAY)
+    assert len(matrix.bucket_starts) <= MAX_BUCKETS
+    assert matrix.bucket_seconds % DAY == 0
+    assert matrix.commits.sum() == 2 and matrix.commits[0] == 1 and matrix.commits[-1] == 1
@@ -0,0 +1,84 @@
+"""
+Lexer tokens, source lines and decision counts
+"""
+from collections import Counter
+import random
+import time
+import pytest
+from app.services.git.code_lexer import count_decisions, lex, match_brackets, tokenize
+from app.services.git.code_parser import CodeParser
+
+
+@pytest.mark.parametrize('language, source, expected', [
+    ('javascript', '// if for while\nconst s = "if (a) for";\nconst t = `while ${x}`;\nif (a && b) { f(); }\n', 3),
+    ('typescript', '/* catch case */\nlet s: string = \'if\';\nfor (const x of xs) { g(x); }\n', 2),
+    ('java', '/** if for */\nString s = "while";\nwhile (ok || done) { step(); }\n', 3),
+    ('c', '#define IF_MACRO if\n/* for */\nconst char *s = "case";\nif (a) { b(); }\n', 2),
+    ('cpp', '// while\nauto s = R"(if for while)";\nif (a) { b(); }\n', 2),
+])
+def test_keywords_in_comments_and_strings_are_not_decisions(language, source, expected):
+    assert count_decisions(Counter(tokenize(source, language))) == expected
+
+
+def test_decision_tokens():
+    source = 'function f(a, b) { if (a && b || c) { return a ?? b; } switch (a) { case 1: return b ? 1 : 2; } }'
+    # if, &&, ||, ??, case, ?
+    assert count_decisions(Counter(tokenize(source, 'javascript'))) == 7
+
+
+def test_source_lines_skip_blank_and_comment_lines():
+    source = '\n// comment\nint a = 1;\n\n/* block\n   comment */\nint b = "x\\\ny";\n'
+    tokens, source_lines = lex(source, 'c')
+    assert source_lines == 2
+    assert tokens[:4] == ['int', 'a', '=', '1']
+
+
+def test_python_complexity_ignores_strings_and_comments():
+    source = (
+        '# if for while\n'
+        'def f(items):\n'
+        '    """if this, for that"""\n'
+        '    total = [x for x in items if x]\n'
+        '    if items and total:\n'
+        '        return 1\n'
+        '    return 0\n'
+    )
+    # The comprehension with its filter, the if and the and
+    assert CodeParser().parse_source('m.py', source)['complexity'] == 5
+
+
+
+@pytest.mark.parametrize('source', ['/* never closed', '"never closed', "'x", '`template ${', 'a = (((', '}}}'])
+@pytest.mark.parametrize('language', ['javascript', 'typescript', 'java', 'c', 'cpp'])
+def test_malformed_input_still_parses(language, source):
+    extension = {'javascript': 'js', 'typescript': 'ts', 'java': 'java', 'c': 'c', 'cpp': 'cpp'}[language]
+    result = CodeParser().parse_source(f'file.{extension}', source)
+    assert 'error' not in result and result['complexity'] >= 1
+
+
+def test_unbalanced_brackets_do_not_pair():
+    tokens = ['(', '[', ')', ']', '{', '}']
+    assert match_brackets(tokens) == [2, 3, 0, 1, 5, 4]
+    assert match_brackets([')', '(']) == [-1, -1]
+
+
+FRAGMENTS = ['/*', '*/', '//', '\n', '"', "'", '`', '${', '}', '{', '(', ')', '[', ']', '\\', 'R"(', ')"',
+             '#define X(a) (a)', 'if', 'case', '=>', '&&', '?', ':', ';', 'x', '42', ' ', 'é']
+
+
+@pytest.mark.parametrize('extension', ['js', 'ts', 'java', 'c', 'cpp'])
+def test_random_token_soup_never_raises(extension):
+    rng = random.Random(extension)
+    parser = CodeParser()
+    for _ in range(50):
+        source = ''.join(rng.choice(FRAGMENTS) for _ in range(rng.randrange(1, 500)))
+        assert 'error' not in parser.parse_source(f'fuzz.{extension}', source)
+
+
+@pytest.mark.parametrize('source', ['word ' * 40000, 'f(' * 40000])
+def test_backtracking_inputs_parse_in_linear_time(source):
+    # The original function regexes took minutes on these
+    started = time.perf_counter()
+    result = CodeParser().parse_source('input.c', source)
+    assert 'error' not in result
+    assert time.perf_counter() - started < 5
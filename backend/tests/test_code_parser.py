@@ -0,0 +1,94 @@
+"""
+Pool parsing: results map back to their own file, and input is consumed lazily
+"""
+import pytest
+from app.services.git import code_parser
+from app.services.git.code_parser import BATCH_FILES, CodeParser
+from app.services.git.parse_cache import ParseCache
+
+SIMPLE = 'x = 1\n'
+BRANCHY = 'def f(x):\n    if x:\n        return 1\n    while x:\n        x -= 1\n'
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    cache = ParseCache(path=str(tmp_path / 'parse-cache.sqlite3'))
+    monkeypatch.setattr(code_parser, 'get_parse_cache', lambda: cache)
+    return cache
+
+
+async def parse(files, **kwargs):
+    return [result async for result in CodeParser().parse_files(files, **kwargs)]
+
+
+def complexity_by_content(results):
+    return sorted(result['complexity'] for result in results)
+
+
+async def test_same_path_with_different_contents(cache):
+    expected = complexity_by_content([CodeParser().parse_source('a.py', content) for content in (SIMPLE, BRANCHY)])
+    files = [('a.py', SIMPLE), ('a.py', BRANCHY)]
+
+    assert complexity_by_content(await parse(files, use_cache=False)) == expected
+    assert complexity_by_content(await parse(files)) == expected
+    # Served from the cache, which must not have been poisoned by either entry
+    assert complexity_by_content(await parse(files)) == expected
+    assert complexity_by_content(await parse([('a.py', BRANCHY)])) == expected[1:]
+
+
+async def test_identical_contents_are_parsed_once(cache):
+    files = [(f'{name}.py', BRANCHY) for name in 'abc']
+    results = await parse(files)
+    assert sorted(result['path'] for result in results) == ['a.py', 'b.py', 'c.py']
+    assert cache.misses == 1
+
+
+async def test_input_is_consumed_lazily():
+    consumed = 0
+
+    def files():
+        nonlocal consumed
+        for index in range(100 * BATCH_FILES):
+            consumed += 1
+            yield f'f{index}.py', SIMPLE + f'y = {index}\n'
+
+    results = CodeParser().parse_files(files(), use_cache=False)
+    first = await anext(results)
+    await results.aclose()
+    assert first['path'].startswith('f')
+    assert consumed < 100 * BATCH_FILES // 2
+
+
+def test_python_scopes():
+    source = (
+        'import os\n'
+        'from ..models import Base\n'
+        'def top(a, /, b):\n'
+        '    def inner():\n'
+        '        pass\n'
+        'async def fetch():\n'
+        '    pass\n'
+        'class Model(Base):\n'
+        '    def method(self):\n'
+        '        def helper():\n'
+        '            pass\n'
+        '    async def load(self):\n'
+        '        pass\n'
+        '    class Meta:\n'
+        '        pass\n'
+    )
+    result = CodeParser().parse_source('module.py', source)
+
+    assert [(f['name'], f['args'], f['async']) for f in result['functions']] == [
+        ('top', ['a', 'b'], False), ('fetch', [], True)
+    ]
+    assert [f['qualname'] for f in result['nested_functions']] == ['top.inner', 'Model.method.helper']
+    assert [(c['qualname'], c['methods']) for c in result['classes']] == [
+        ('Model', ['method', 'load']), ('Model.Meta', [])
+    ]
+    assert result['imports'] == ['os', '..models']
+
+
+def test_python_syntax_errors_are_reported():
+    result = CodeParser().parse_source('broken.py', 'def broken(:\n')
+    assert result['language'] == 'python' and 'error' in result
@@ -0,0 +1,75 @@
+"""
+Cursor pagination of commit history
+"""
+import base64
+import json
+import pytest
+from app.services.git.git_service import GitService
+
+
+@pytest.fixture
+def history(repo):
+    for number in range(7):
+        repo.commit(f'commit {number}', {'file.txt': f'{number}\n'})
+    return repo
+
+
+def test_cursor_round_trip():
+    head, sha = 'a' * 40, 'b' * 40
+    cursor = GitService._encode_cursor(head, sha, 3, 10)
+    assert GitService._decode_cursor(cursor) == (head, sha, 3, 10)
+
+
+@pytest.mark.parametrize('payload', [
+    b'not base64 at all',
+    base64.urlsafe_b64encode(b'{"head": "x"}'),
+    base64.urlsafe_b64encode(json.dumps({'head': 'a' * 40, 'sha': 'b' * 40, 'pos': 0}).encode()),
+    base64.urlsafe_b64encode(json.dumps({'head': 'A' * 40, 'sha': 'b' * 40, 'pos': 1}).encode()),
+    base64.urlsafe_b64encode(json.dumps({'head': 'a' * 40, 'sha': 'b' * 40, 'pos': 1, 'total': 'x'}).encode()),
+])
+def test_invalid_cursors_are_rejected(payload):
+    with pytest.raises(ValueError):
+        GitService._decode_cursor(payload.decode('ascii', errors='replace'))
+
+
+def test_cursors_without_total_still_decode():
+    payload = json.dumps({'head': 'a' * 40, 'sha': 'b' * 40, 'pos': 2}).encode()
+    assert GitService._decode_cursor(base64.urlsafe_b64encode(payload).decode())[3] is None
+
+
+def test_pages_walk_the_history_counting_once(history, monkeypatch):
+    service = GitService()
+    counts = []
+    count_commits = GitService.count_commits
+    monkeypatch.setattr(GitService, 'count_commits', staticmethod(
+        lambda *args: counts.append(args) or count_commits(*args)
+    ))
+
+    seen, cursor = [], None
+    while True:
+        page = service.get_commit_page(str(history.path), cursor=cursor, limit=3)
+        assert page['total_commits'] == 7
+        seen += [commit['sha'] for commit in page['commits']]
+        cursor = page['next_cursor']
+        if not page['has_more']:
+            break
+    assert cursor is None
+    assert seen == history.git('rev-list', 'HEAD').split()
+    assert len(counts) == 1
+
+
+def test_single_page_needs_no_count(history, monkeypatch):
+    monkeypatch.setattr(GitService, 'count_commits', staticmethod(lambda *args: pytest.fail('counted')))
+    page = GitService().get_commit_page(str(history.path), limit=10, skip=2)
+    assert (len(page['commits']), page['total_commits'], page['has_more']) == (5, 7, False)
+
+
+def test_rewritten_history_invalidates_the_cursor(history):
+    service = GitService()
+    page = service.get_commit_page(str(history.path), limit=3)
+    history.git('reset', '-q', '--hard', 'HEAD~5')
+    history.commit('rewrite', {'file.txt': 'new\n'})
+    history.git('reflog', 'expire', '--expire=now', '--all')
+    history.git('gc', '-q', '--prune=now')
+    with pytest.raises(ValueError):
+        service.get_commit_page(str(history.path), cursor=page['next_cursor'], limit=3)
@@ -0,0 +1,26 @@
+"""
+Batched diff summaries across commit pairs
+"""
+from app.services.git.diff_analyzer import DiffAnalyzer
+
+
+def test_one_failing_pair_leaves_the_rest_of_the_batch(repo):
+    first = repo.commit('first', {'a.txt': 'one\n'})
+    second = repo.commit('second', {'a.txt': 'two\n'})
+    third = repo.commit('third', {'a.txt': 'one\n', 'b.txt': 'new\n'})
+    # The trees still resolve, but the blob the second commit added is gone
+    blob = repo.git('rev-parse', f'{second}:a.txt').strip()
+    (repo.path / '.git' / 'objects' / blob[:2] / blob[2:]).unlink()
+
+    broken, fine, unknown = DiffAnalyzer.analyze_pairs(
+        str(repo.path), [(first, second), (first, third), (first, 'no-such-branch')]
+    )
+    assert broken['commit_b'] == second and broken['error'].startswith('Diff failed')
+    assert fine['insertions'] == 1 and set(fine['files']) == {'b.txt'}
+    assert unknown['error'] == 'Unknown revision: no-such-branch'
+
+    # Failures are not cached: once the blob is back the pair succeeds
+    repo.write('restore.txt', 'two\n')
+    repo.git('hash-object', '-w', 'restore.txt')
+    [repaired] = DiffAnalyzer.analyze_pairs(str(repo.path), [(first, second)])
+    assert 'error' not in repaired and repaired['insertions'] == 1
@@ -0,0 +1,41 @@
+"""
+Patch streaming and numstat agree on what a line is
+"""
+import pytest
+from app.services.git.diff_analyzer import DiffAnalyzer
+from app.services.git.diff_reader import DiffReader
+
+
+def totals(changes):
+    return changes['insertions'], changes['deletions']
+
+
+@pytest.mark.parametrize('old, new', [
+    ('one\ntwo\n', 'one\rX\nthree\rY\ntwo\n'),
+    ('one\r\ntwo\r\n', 'one\r\nthree\r\ntwo\r\n'),
+    ('a\rb\rc\n', 'a\rb\rc\nd\n'),
+])
+def test_patch_counts_match_numstat(repo, old, new):
+    first = repo.commit('old', {'file.txt': old})
+    second = repo.commit('new', {'file.txt': new})
+    numstat = DiffAnalyzer.analyze_commits(str(repo.path), first, second)
+    patch = DiffAnalyzer.analyze_commits(str(repo.path), first, second, include_hunks=True)
+    assert totals(patch) == totals(numstat)
+    assert patch['files']['file.txt']['insertions'] == numstat['files']['file.txt']['insertions']
+
+
+def test_carriage_returns_stay_inside_lines(repo):
+    first = repo.commit('old', {'file.txt': 'one\ntwo\n'})
+    second = repo.commit('new', {'file.txt': 'one\rX\ntwo\r\n'})
+    lines = list(DiffReader(str(repo.path)).iter_lines(first, second))
+    assert '+one\rX' in lines and '+two\r' in lines
+    assert '-one' in lines and '-two' in lines
+
+
+def test_get_diff_reads_the_given_repository(repo):
+    first = repo.commit('old', {'file.txt': 'one\n'})
+    second = repo.commit('new', {'file.txt': 'two\n'})
+    lines = DiffAnalyzer.get_diff(str(repo.path), first, second)
+    assert '-one' in lines and '+two' in lines
+    with pytest.raises(TypeError):
+        DiffAnalyzer.get_diff(first, second)
@@ -0,0 +1,104 @@
+"""
+Count-only diffs from `git diff --raw --numstat -z`
+"""
+import pytest
+from app.services.git.diff_analyzer import DiffAnalyzer
+from app.services.git.diff_reader import DiffReader, parse_raw_numstat
+
+OLD = 'a' * 40
+NEW = 'b' * 40
+
+
+def raw(status, *paths, old_mode='100644', new_mode='100644'):
+    return f':{old_mode} {new_mode} {OLD} {NEW} {status}\0'.encode() + b''.join(p.encode() + b'\0' for p in paths)
+
+
+def test_parse_modify_add_delete():
+    output = (
+        raw('M', 'kept.py') + raw('A', 'new.py', old_mode='000000') + raw('D', 'gone.py', new_mode='000000')
+        + b'3\t1\tkept.py\0' + b'5\t0\tnew.py\0' + b'0\t7\tgone.py\0'
+    )
+    kept, new, gone = parse_raw_numstat(output)
+    assert kept == {
+        'path': 'kept.py', 'old_path': 'kept.py', 'status': 'M', 'similarity': None, 'binary': False,
+        'insertions': 3, 'deletions': 1, 'old_sha': OLD, 'new_sha': NEW, 'old_mode': '100644', 'new_mode': '100644'
+    }
+    assert (new['old_path'], new['old_sha'], new['old_mode'], new['insertions']) == (None, None, None, 5)
+    assert (gone['path'], gone['new_sha'], gone['new_mode'], gone['deletions']) == ('gone.py', None, None, 7)
+
+
+def test_parse_rename_and_copy_take_three_tokens():
+    output = (
+        raw('R087', 'old name.py', 'new name.py') + raw('C100', 'src.py', 'copy.py') + raw('M', 'after.py')
+        + b'2\t2\t\0old name.py\0new name.py\0' + b'0\t0\t\0src.py\0copy.py\0' + b'1\t0\tafter.py\0'
+    )
+    renamed, copied, after = parse_raw_numstat(output)
+    assert (renamed['path'], renamed['old_path'], renamed['status'], renamed['similarity']) == \
+        ('new name.py', 'old name.py', 'R', 87)
+    assert (renamed['insertions'], renamed['deletions']) == (2, 2)
+    assert (copied['path'], copied['old_path'], copied['status'], copied['similarity']) == \
+        ('copy.py', 'src.py', 'C', 100)
+    assert (after['path'], after['insertions']) == ('after.py', 1)
+
+
+def test_parse_binary_and_unusual_names():
+    name = 'tab\there\nnewline ü.py'
+    output = raw('M', 'image.png') + raw('M', name) + b'-\t-\timage.png\0' + f'1\t1\t{name}\0'.encode()
+    image, odd = parse_raw_numstat(output)
+    assert image['binary'] and (image['insertions'], image['deletions']) == (0, 0)
+    assert odd['path'] == name and not odd['binary'] and odd['insertions'] == 1
+
+
+def test_parse_mode_change_and_empty_output():
+    [entry] = parse_raw_numstat(raw('M', 'run.sh', new_mode='100755') + b'0\t0\trun.sh\0')
+    assert (entry['old_mode'], entry['new_mode'], entry['insertions']) == ('100644', '100755', 0)
+    assert parse_raw_numstat(b'') == []
+
+
+@pytest.fixture
+def history(repo):
+    body = ''.join(f'line {i}\n' for i in range(40))
+    first = repo.commit('first', {
+        'moved.py': body, 'edited.py': 'one\ntwo\n', 'deleted.py': 'x\n',
+        'image.png': b'\x89PNG\0\1', 'run.sh': 'echo\n'
+    })
+    repo.git('mv', 'moved.py', 'renamed.py')
+    repo.remove('deleted.py')
+    (repo.path / 'run.sh').chmod(0o755)
+    second = repo.commit('second', {
+        'renamed.py': body + 'line 40\n',
+        'edited.py': 'one\nthree\n',
+        'image.png': b'\x89PNG\0\2',
+        'tab\tand ü.py': 'new\n',
+    })
+    return repo, first, second
+
+
+def test_file_stats_reports_renames_binaries_and_modes(history):
+    repo, first, second = history
+    stats = {entry['path']: entry for entry in DiffReader(str(repo.path)).file_stats(first, second)}
+    assert set(stats) == {'renamed.py', 'edited.py', 'deleted.py', 'image.png', 'run.sh', 'tab\tand ü.py'}
+    renamed = stats['renamed.py']
+    assert (renamed['status'], renamed['old_path'], renamed['insertions'], renamed['deletions']) == \
+        ('R', 'moved.py', 1, 0)
+    assert stats['image.png']['binary']
+    assert (stats['edited.py']['insertions'], stats['edited.py']['deletions']) == (1, 1)
+    assert (stats['deleted.py']['status'], stats['deleted.py']['deletions']) == ('D', 1)
+    assert (stats['run.sh']['old_mode'], stats['run.sh']['new_mode']) == ('100644', '100755')
+    assert stats['tab\tand ü.py']['status'] == 'A'
+
+
+def test_file_stats_without_rename_detection(history):
+    repo, first, second = history
+    stats = {entry['path']: entry['status'] for entry in
+             DiffReader(str(repo.path)).file_stats(first, second, find_renames=False)}
+    assert stats['moved.py'] == 'D' and stats['renamed.py'] == 'A'
+
+
+def test_count_mode_matches_patch_mode(history):
+    repo, first, second = history
+    counted = DiffAnalyzer.analyze_commits(str(repo.path), first, second)
+    patched = DiffAnalyzer.analyze_commits(str(repo.path), first, second, include_hunks=True)
+    for entry in patched['files'].values():
+        del entry['hunks']
+    assert counted == patched
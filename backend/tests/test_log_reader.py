@@ -0,0 +1,73 @@
+import io
+import time
+from app.services.git.log_reader import CommitLogReader, iter_records
+
+
+class TrickleStream(io.BytesIO):
+    """Returns at most `size` bytes per read, to split records across chunks"""
+
+    def __init__(self, data: bytes, size: int):
+        super().__init__(data)
+        self.size = size
+
+    def read(self, n=-1):
+        return super().read(min(n, self.size))
+
+
+def test_iter_records_across_chunk_boundaries():
+    records = [b'first', b'', b'a\x1fb\nc', b'x' * 1000, b'last']
+    data = b''.join(b'\x1e' + record for record in records)
+    for size in (1, 2, 3, 7, 64, len(data)):
+        assert list(iter_records(TrickleStream(data, size))) == [r for r in records if r]
+
+
+def test_iter_records_multibyte_separator_straddling_chunks():
+    data = b'one--two----three'
+    for size in (1, 2, 3, 5):
+        assert list(iter_records(TrickleStream(data, size), separator=b'--')) == [b'one', b'two', b'three']
+
+
+def test_iter_records_one_huge_record_is_linear():
+    data = b'\x1e' + b'x' * (32 * 1024 * 1024) + b'\x1esmall'
+    started = time.perf_counter()
+    records = list(iter_records(io.BytesIO(data)))
+    # Rescanning the buffer per 64 KB chunk took seconds at this size
+    assert time.perf_counter() - started < 1.0
+    assert [len(record) for record in records] == [32 * 1024 * 1024, 5]
+
+
+def test_iter_commits_totals(repo):
+    repo.commit('add', {'a.py': 'one\ntwo\n', 'b.bin': b'\0\1\2'})
+    repo.commit('edit', {'a.py': 'one\nthree\nfour\n'})
+
+    commits = list(CommitLogReader(str(repo.path)).iter_commits())
+
+    assert [commit['message'] for commit in commits] == ['edit', 'add']
+    assert commits[0]['additions'] == 2 and commits[0]['deletions'] == 1
+    assert commits[0]['files'] == ['a.py']
+    # Binary files count as changed without lines
+    assert commits[1]['files_changed'] == 2 and commits[1]['additions'] == 2
+
+
+def test_iter_commits_skip_and_limit(repo):
+    for index in range(5):
+        repo.commit(f'c{index}', {'f.txt': f'{index}\n'})
+
+    commits = list(CommitLogReader(str(repo.path)).iter_commits(skip=1, max_count=2, numstat=False))
+
+    assert [commit['message'] for commit in commits] == ['c3', 'c2']
+
+
+def test_iter_commits_time_window_and_file_stats(repo):
+    repo.commit('first', {'a.py': 'one\n'})
+    middle = repo.clock + 3600
+    repo.commit('second', {'a.py': 'one\ntwo\n', 'b.bin': b'\0\1'})
+    repo.commit('third', {'a.py': 'two\n'})
+
+    commits = list(CommitLogReader(str(repo.path)).iter_commits(
+        since=middle, until=middle + 1, numstat=False, file_stats=True
+    ))
+
+    assert [commit['message'] for commit in commits] == ['second']
+    assert commits[0]['timestamp'] == middle
+    assert sorted(commits[0]['file_stats']) == [('a.py', 1, 0), ('b.bin', 0, 0)]
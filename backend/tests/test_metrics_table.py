@@ -0,0 +1,148 @@
+"""
+Patching a MetricsTable gives the same summary as rebuilding it
+"""
+import random
+import pytest
+from app.services.analysis.metrics_calculator import LANGUAGES, WORST_KEPT, MetricsCalculator, MetricsTable
+from app.services.git import code_parser
+from app.services.git.parse_cache import ParseCache
+
+
+def make_result(rng, path):
+    distinct_operators, distinct_operands = rng.randint(1, 30), rng.randint(1, 60)
+    source_lines = rng.randint(0, 800)
+    return {
+        'path': path,
+        'language': rng.choice(LANGUAGES),
+        'lines_of_code': source_lines + rng.randint(0, 200),
+        'complexity': rng.randint(1, 120),
+        'metrics': {
+            'source_lines': source_lines,
+            'halstead': [
+                distinct_operators, distinct_operands,
+                distinct_operators * rng.randint(1, 40), distinct_operands * rng.randint(1, 40)
+            ]
+        }
+    }
+
+
+def assert_close(patched, rebuilt, path='summary'):
+    """Equal up to the last rounded digit; running sums drift by float rounding as rows come and go"""
+    if isinstance(rebuilt, dict):
+        assert patched.keys() == rebuilt.keys(), path
+        for key in rebuilt:
+            assert_close(patched[key], rebuilt[key], f'{path}.{key}')
+    elif isinstance(rebuilt, list):
+        assert len(patched) == len(rebuilt), path
+        for index, (left, right) in enumerate(zip(patched, rebuilt)):
+            assert_close(left, right, f'{path}[{index}]')
+    elif isinstance(rebuilt, float):
+        assert patched == pytest.approx(rebuilt, abs=0.011), path
+    else:
+        assert patched == rebuilt, path
+
+
+@pytest.mark.parametrize('seed', range(5))
+@pytest.mark.parametrize('ranked', [False, True])
+def test_random_patches_match_a_rebuild(seed, ranked):
+    rng = random.Random(seed)
+    current = {f'src/file{i}.py': make_result(rng, f'src/file{i}.py') for i in range(300)}
+    table = MetricsTable.from_results(current.values(), commit='c0')
+    counter = len(current)
+
+    for step in range(1, 30):
+        paths = list(current)
+        removed = rng.sample(paths, rng.randint(0, 10))
+        for path in removed:
+            del current[path]
+
+        renamed = []
+        for old_path in rng.sample(list(current), rng.randint(0, 5)):
+            counter += 1
+            new_path = f'moved/file{counter}.py'
+            result = current.pop(old_path)
+            current[new_path] = dict(result, path=new_path)
+            renamed.append((old_path, new_path))
+
+        results = []
+        for path in rng.sample(list(current), rng.randint(0, 15)):
+            if rng.random() < 0.1:
+                # Now unparseable: the result drops the path
+                del current[path]
+                results.append({'path': path, 'language': 'python', 'error': 'syntax'})
+            else:
+                current[path] = make_result(rng, path)
+                results.append(current[path])
+        for _ in range(rng.randint(0, 10)):
+            counter += 1
+            path = f'new/file{counter}.py'
+            current[path] = make_result(rng, path)
+            results.append(current[path])
+
+        changes = table.patch(removed, results, renamed, commit=f'c{step}')
+        assert changes['renamed'] == len(renamed)
+        assert len(table) == len(current)
+        if ranked:
+            # Summarizing keeps the cached worst-files list alive, so later patches go through _rank
+            assert_close(table.summary(top=WORST_KEPT), rebuild(current))
+    assert_close(table.summary(top=WORST_KEPT), rebuild(current))
+    assert table.commit == 'c29'
+
+
+def rebuild(current):
+    return MetricsTable.from_results(current.values()).summary(top=WORST_KEPT)
+
+
+def test_removing_every_file_empties_the_summary():
+    rng = random.Random(0)
+    results = [make_result(rng, f'{i}.py') for i in range(20)]
+    table = MetricsTable.from_results(results)
+    table.summary()
+    assert table.patch([result['path'] for result in results], []) == {'removed': 20, 'added': 0, 'renamed': 0}
+    assert table.summary() == MetricsTable.from_results([]).summary()
+
+
+def test_rename_onto_an_existing_path_replaces_it():
+    rng = random.Random(1)
+    first, second = make_result(rng, 'a.py'), make_result(rng, 'b.py')
+    table = MetricsTable.from_results([first, second])
+    table.patch([], [], [('a.py', 'b.py')])
+    assert_close(table.summary(), MetricsTable.from_results([dict(first, path='b.py')]).summary())
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    cache = ParseCache(path=str(tmp_path / 'parse-cache.sqlite3'))
+    monkeypatch.setattr(code_parser, 'get_parse_cache', lambda: cache)
+    return cache
+
+
+async def test_update_repository_matches_a_full_measurement(repo, cache):
+    body = ''.join(f'def f{i}(x):\n    if x > {i}:\n        return x\n    return {i}\n\n' for i in range(10))
+    repo.commit('first', {
+        'kept.py': body, 'edited.py': 'x = 1\n', 'deleted.py': 'y = 2\n', 'moved.py': body,
+        'touched.py': body, 'to_text.py': 'z = 3\n', 'app.js': 'function g(a) { return a ? 1 : 2; }\n'
+    })
+    calculator = MetricsCalculator()
+    table = await calculator.calculate_repository(str(repo.path))
+
+    repo.remove('deleted.py')
+    repo.git('mv', 'moved.py', 'renamed.py')
+    repo.git('mv', 'touched.py', 'touched_and_moved.py')
+    repo.git('mv', 'to_text.py', 'notes.txt')
+    repo.commit('second', {
+        'edited.py': 'def h(x):\n    for i in x:\n        if i:\n            return i\n',
+        'touched_and_moved.py': body + 'extra = 1\n',
+        'added.py': 'import os\n',
+        'broken.py': 'def (:\n',
+        'app.ts': 'const k = (a: number) => a && 1;\n',
+    })
+
+    changes = await calculator.update_repository(str(repo.path), table)
+    full = await calculator.calculate_repository(str(repo.path))
+    assert changes['commit'] == full.commit == table.commit
+    assert changes['renamed'] == 1
+    assert sorted(path for path in table.paths if path) == sorted(path for path in full.paths if path)
+    assert_close(table.summary(), full.summary())
+
+    assert (await calculator.update_repository(str(repo.path), table))['parsed'] == 0
@@ -0,0 +1,48 @@
+"""
+Quality analysis within its time budget
+"""
+import time
+import pytest
+from app.services.analysis.code_quality_analyzer import CodeQualityAnalyzer
+from app.services.git import code_parser
+from app.services.git.code_parser import CodeParser, _parse_chunk
+from app.services.git.parse_cache import ParseCache
+
+BODY = ''.join(f'def f{i}(x):\n    if x > {i}:\n        return x\n    return {i}\n\n' for i in range(2000))
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    cache = ParseCache(path=str(tmp_path / 'parse-cache.sqlite3'))
+    monkeypatch.setattr(code_parser, 'get_parse_cache', lambda: cache)
+    return cache
+
+
+def test_chunk_stops_at_the_deadline():
+    chunk = [(f'{i}.py', BODY.encode()) for i in range(64)]
+    results = _parse_chunk(chunk, None, 10.0, None, deadline=time.time() + 0.1)
+    assert [result['path'] for result in results] == [path for path, _ in chunk]
+    assert results[-1]['skipped'] == 'deadline'
+    assert _parse_chunk(chunk[:2], None, 10.0, None, deadline=time.time() - 1) == [
+        {'path': '0.py', 'skipped': 'deadline'}, {'path': '1.py', 'skipped': 'deadline'}
+    ]
+
+
+async def test_deadline_skips_are_not_cached(cache):
+    files = [('a.py', 'x = 1\n')]
+    [skipped] = [result async for result in CodeParser().parse_files(files, deadline=time.time() - 1)]
+    assert skipped['skipped'] == 'deadline'
+    [parsed] = [result async for result in CodeParser().parse_files(files)]
+    assert 'skipped' not in parsed and parsed['complexity'] == 1
+
+
+async def test_spent_budget_reports_the_rest_as_skipped(repo, cache):
+    repo.commit('files', {f'{i}.py': BODY for i in range(8)})
+    report = await CodeQualityAnalyzer().analyze_repository(str(repo.path), time_budget=0)
+    assert report.analyzed_at.tzinfo is not None
+    assert not report.complete and report.total_files_analyzed == 0
+    assert {skipped.reason for skipped in report.skipped_files} == {'run_budget'}
+    assert len(report.skipped_files) == 8
+
+    report = await CodeQualityAnalyzer().analyze_repository(str(repo.path), time_budget=60)
+    assert report.complete and report.total_files_analyzed == 8
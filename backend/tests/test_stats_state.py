@@ -0,0 +1,25 @@
+"""
+Saved state of incremental repository stats
+"""
+import os
+from concurrent.futures import ThreadPoolExecutor
+from git import Repo
+from app.services.git.git_service import GitService
+
+
+def test_concurrent_saves_never_tear_the_state(repo):
+    repo.commit('first', {'file.txt': 'one\n'})
+    service = GitService()
+    git_repo = Repo(str(repo.path))
+    states = [{'head': str(writer) * 40, 'authors': {f'a{n}': n for n in range(2000)}} for writer in range(8)]
+
+    def save(state):
+        for _ in range(20):
+            service._save_stats_state(git_repo, state)
+            assert service._load_stats_state(git_repo) in states
+
+    with ThreadPoolExecutor(max_workers=len(states)) as pool:
+        list(pool.map(save, states))
+
+    assert service._load_stats_state(git_repo) in states
+    assert os.listdir(os.path.dirname(service._stats_state_path(git_repo))) == ['stats_state.json']
@@ -0,0 +1,49 @@
+"""
+Incremental symbol index updates
+"""
+import pytest
+from app.core.config import settings
+from app.services.git import code_parser
+from app.services.git.parse_cache import ParseCache
+from app.services.git.symbol_index import SymbolIndex
+
+
+@pytest.fixture
+def index(tmp_path, monkeypatch):
+    cache = ParseCache(path=str(tmp_path / 'parse-cache.sqlite3'))
+    monkeypatch.setattr(code_parser, 'get_parse_cache', lambda: cache)
+    index = SymbolIndex(path=str(tmp_path / 'symbol-index.sqlite3'))
+    yield index
+    index.close()
+
+
+def names(index, name):
+    return [row['path'] for row in index.definitions('o/r', name)]
+
+
+async def test_files_that_failed_are_retried(repo, index, monkeypatch):
+    repo.commit('first', {
+        'good.py': 'def good():\n    pass\n', 'big.py': 'def big():\n    pass\n', 'bad.py': 'def (:\n'
+    })
+
+    # Every file counts as too large on the first run, as after a transient read failure
+    monkeypatch.setattr(settings, 'MAX_FILE_SIZE_MB', 0)
+    first = await index.update('o/r', str(repo.path))
+    status = index.status('o/r')
+    assert (first['parsed'], status['files'], status['failed']) == (3, 0, 3)
+    assert names(index, 'big') == []
+
+    # Same commit, but failures remain, so the update runs again and only parses those
+    monkeypatch.setattr(settings, 'MAX_FILE_SIZE_MB', 10)
+    second = await index.update('o/r', str(repo.path))
+    status = index.status('o/r')
+    assert (second['parsed'], status['files'], status['failed']) == (3, 2, 1)
+    assert names(index, 'big') == ['big.py'] and names(index, 'good') == ['good.py']
+
+    # The syntax error stays failed until its blob changes
+    assert (await index.update('o/r', str(repo.path)))['parsed'] == 1
+    repo.commit('second', {'bad.py': 'def fixed():\n    pass\n'})
+    third = await index.update('o/r', str(repo.path))
+    status = index.status('o/r')
+    assert (third['parsed'], status['files'], status['failed']) == (1, 3, 0)
+    assert (await index.update('o/r', str(repo.path)))['parsed'] == 0
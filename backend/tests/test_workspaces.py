@@ -0,0 +1,107 @@
+"""
+Workspace leases, the orphan sweep and the mirror cache's disk budget
+"""
+import os
+import time
+from app.services.git.mirror_cache import MirrorCache
+from app.services.git.workspace_manager import (
+    LEASE_SUFFIX, READERS_SUFFIX, WorkspaceManager, lock_file, reader_lease, unlock_file
+)
+
+
+def make_dir(path, size=0):
+    os.makedirs(path)
+    with open(os.path.join(path, 'data'), 'wb') as handle:
+        handle.write(b'x' * size)
+    return path
+
+
+def test_workspaces_hold_a_lease_until_removed(tmp_path):
+    manager = WorkspaceManager(root_dir=str(tmp_path), budget_bytes=10 ** 9)
+    path = manager.acquire('key', create=make_dir, reusable=False)
+    assert os.path.isdir(path) and os.path.exists(path + LEASE_SUFFIX)
+    # Held by the manager, so nobody else can take it
+    assert lock_file(path + LEASE_SUFFIX, blocking=False) is None
+
+    manager.release(path)
+    assert not os.path.exists(path) and not os.path.exists(path + LEASE_SUFFIX)
+
+
+def test_sweep_removes_unleased_workspaces_whatever_their_age(tmp_path):
+    root = str(tmp_path)
+    live = WorkspaceManager(root_dir=root, budget_bytes=10 ** 9)
+    live_path = live.acquire('live', create=make_dir, name='live')
+
+    crashed = make_dir(os.path.join(root, 'reposcope_crashed_1'))
+    open(crashed + LEASE_SUFFIX, 'w').close()
+    unleased = make_dir(os.path.join(root, 'reposcope_unleased_1'))
+    stray_lease = os.path.join(root, 'reposcope_gone_1' + LEASE_SUFFIX)
+    open(stray_lease, 'w').close()
+    held = make_dir(os.path.join(root, 'reposcope_other_1'))
+    other_process = lock_file(held + LEASE_SUFFIX)
+    unrelated = make_dir(os.path.join(root, 'something_else'))
+
+    # A separate manager stands in for a freshly started worker
+    assert WorkspaceManager(root_dir=root).sweep_orphans() == 2
+    assert not os.path.exists(crashed) and not os.path.exists(crashed + LEASE_SUFFIX)
+    assert not os.path.exists(unleased) and not os.path.exists(stray_lease)
+    assert os.path.isdir(live_path) and os.path.isdir(held) and os.path.isdir(unrelated)
+    unlock_file(other_process)
+
+
+def test_mirrors_are_evicted_least_recently_used_first(tmp_path):
+    cache = MirrorCache(cache_dir=str(tmp_path), budget_bytes=2500)
+    mirrors = [make_dir(os.path.join(str(tmp_path), f'{name}.git'), 1000) for name in 'abcd']
+    with open(os.path.join(str(tmp_path), 'parse-cache.sqlite3'), 'wb') as handle:
+        handle.write(b'x' * 400)
+    for age, path in enumerate(reversed(mirrors)):
+        os.utime(path, (1_700_000_000 - age, 1_700_000_000 - age))
+    a, b, c, d = mirrors
+    # The oldest mirror has a worktree, the next one is being fetched elsewhere
+    make_dir(os.path.join(a, 'worktrees', 'checkout'))
+    busy = lock_file(b + '.lock')
+
+    assert cache.enforce_budget(keep=d) == [c]
+    assert cache.enforce_budget(keep=d) == []
+    unlock_file(busy)
+    assert cache.enforce_budget(keep=d) == [b]
+    assert os.path.isdir(a) and os.path.isdir(d)
+
+
+def test_mirrors_within_budget_are_kept(tmp_path):
+    cache = MirrorCache(cache_dir=str(tmp_path), budget_bytes=10 ** 6)
+    make_dir(os.path.join(str(tmp_path), 'a.git'), 1000)
+    assert cache.enforce_budget() == []
+
+
+def test_mirrors_being_read_or_just_used_are_kept(tmp_path):
+    cache = MirrorCache(cache_dir=str(tmp_path), budget_bytes=1500)
+    read, recent, idle = [make_dir(os.path.join(str(tmp_path), f'{name}.git'), 1000) for name in ('a', 'b', 'c')]
+    for path in (read, recent, idle):
+        open(path + READERS_SUFFIX, 'w').close()
+    old = time.time() - 3600
+    for path in (read, idle):
+        os.utime(path, (old, old))
+
+    with reader_lease(read) as leased:
+        assert leased
+        # Eviction cannot take the readers file exclusively while the lease is held
+        assert lock_file(read + READERS_SUFFIX, blocking=False) is None
+        assert cache.enforce_budget() == [idle]
+    assert cache.enforce_budget() == [read]
+    assert os.path.isdir(recent)
+
+
+def test_reader_leases_are_shared_and_optional(tmp_path):
+    mirror = make_dir(os.path.join(str(tmp_path), 'a.git'))
+    open(mirror + READERS_SUFFIX, 'w').close()
+    with reader_lease(mirror) as first, reader_lease(mirror) as second:
+        assert first and second
+    evicting = lock_file(mirror + READERS_SUFFIX, blocking=False)
+    assert evicting is not None
+    unlock_file(evicting)
+    # Clones and worktrees have no readers file, and get none
+    clone = make_dir(os.path.join(str(tmp_path), 'clone'))
+    with reader_lease(clone) as leased:
+        assert not leased
+    assert not os.path.exists(clone + READERS_SUFFIX)